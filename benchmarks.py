@@ -0,0 +1,177 @@
+import maya.cmds as cmds
+import copy
+import time
+import tracemalloc
+from collections import Counter
+from functools import partial
+from . import preset
+from . import widget as widg
+
+# Benchmarks of the widgets' Maya round trips, optionVars and memory, to run in Maya's script editor. i.e.
+#       from Command_UI import benchmarks
+#       benchmarks.benchmarkUIBatch()
+# The controls they need are made in a hidden window, which is deleted afterwards.
+# The benchmarks of fitting and lookup tables are with their code, in fitting.py and lookup.py
+
+# Counts the calls made to Maya through widget.py's cmds and mel while it's open, by command name, to show how many
+#   round trips into Maya the widgets make.  Use it as a context manager:
+#       with MayaCallCounter() as counter:
+#           ...
+#       print(counter.getTotal())
+class MayaCallCounter:
+
+    def __init__(self):
+
+        self.counts = Counter()
+        self.saved = None
+
+    def __enter__(self):
+
+        self.saved = (widg.cmds, widg.mel)
+        widg.cmds = CountingModule(widg.cmds, self.counts, "")
+        widg.mel = CountingModule(widg.mel, self.counts, "mel.")
+        return self
+
+    def __exit__(self, *_):
+
+        widg.cmds, widg.mel = self.saved
+
+    def getTotal(self):
+
+        return sum(self.counts.values())
+
+# Wraps a module so every call to one of its functions is counted
+class CountingModule:
+
+    def __init__(self, module, counts, prefix):
+
+        self.module = module
+        self.counts = counts
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+
+        function = getattr(self.module, name)
+
+        def countedFunction(*args, **kwargs):
+
+            self.counts[self.prefix + name] += 1
+            return function(*args, **kwargs)
+
+        return countedFunction
+
+# Set a gradient's value numSets times, to show the number of optionVars stays flat however often it's set.
+#   Returns the number of optionVars before the gradient is made, once it's made, and after it's been set, and the
+#   seconds taken to set it, and prints them
+def benchmarkGradientOptionVars(numSets=10000):
+
+    parent = cmds.setParent(q=True)
+    window = cmds.window(visible=False)
+    cmds.columnLayout()
+
+    try:
+        numBefore = len(cmds.optionVar(list=True) or [])
+        gradient = widg.Gradient(100, 200)
+        gradient.create()
+        numCreated = len(cmds.optionVar(list=True) or [])
+
+        start = time.perf_counter()
+        for i in range(numSets):
+            gradient.setVal("%.4g,0.,1,%.4g,1.,1" % ((i % 100) / 100., 1. - (i % 100) / 100.))
+        seconds = time.perf_counter() - start
+
+        numAfter = len(cmds.optionVar(list=True) or [])
+
+    finally:
+        cmds.deleteUI(window)
+        if parent:
+            cmds.setParent(parent)
+
+    print("optionVars: %d before, %d with the gradient, %d after %d sets  %.4fs"
+          % (numBefore, numCreated, numAfter, numSets, seconds))
+
+    return numBefore, numCreated, numAfter, seconds
+
+# Load alternating presets into numGroups CheckBoxGrps, each a checkbox enabling widgetsPerGroup float fields, numLoads
+#   times, with and without a UIBatch.  Returns a dictionary of "unbatched" and "batched" -> (Maya calls, seconds)
+#   and prints it
+def benchmarkUIBatch(numGroups=50, widgetsPerGroup=3, numLoads=10):
+
+    parent = cmds.setParent(q=True)
+    window = cmds.window(visible=False)
+    cmds.columnLayout()
+
+    groups = []
+    for _ in range(numGroups):
+
+        group = widg.CheckBoxGrp("enable")
+        group.widgets.append(group.nextCheckBox())
+        for _ in range(widgetsPerGroup):
+            group.widgets.append(group.nextWidget(widg.FloatFld(-10., 10., .1, 2)))
+
+        groups.append(group)
+
+    presets = []
+    for checked, value in ((1, "1.0"), (0, "2.0")):
+
+        values = {}
+        for i in range(numGroups):
+            values["g" + str(i) + "0"] = str(checked)
+            for j in range(1, widgetsPerGroup + 1):
+                values["g" + str(i) + str(j)] = value
+
+        presets.append(preset.PresetValues(values))
+
+    def loadPresets(batched):
+
+        for load in range(numLoads):
+
+            if batched:
+                with widg.UIBatch(suspendRefresh=True):
+                    for i, group in enumerate(groups):
+                        group.loadVal(presets[load % 2], "g" + str(i))
+            else:
+                for i, group in enumerate(groups):
+                    group.loadVal(presets[load % 2], "g" + str(i))
+
+    results = {}
+    try:
+        for name, batched in (("unbatched", False), ("batched", True)):
+
+            with MayaCallCounter() as counter:
+                start = time.perf_counter()
+                loadPresets(batched)
+                results[name] = (counter.getTotal(), time.perf_counter() - start)
+
+            print("%-9s %6d Maya calls  %.4fs" % (name, results[name][0], results[name][1]))
+
+    finally:
+        cmds.deleteUI(window)
+        if parent:
+            cmds.setParent(parent)
+
+    return results
+
+# Make numWidgets copies of a group of float fields, whose change command is bound to a list of 1000 floats standing
+#   in for the flag that owns them, with copy.deepcopy() and with clone().  Returns a dictionary of "deepcopy" and
+#   "clone" -> (seconds, peak bytes allocated), and prints it
+def benchmarkClone(numWidgets=10000):
+
+    owner = [ 0. ] * 1000
+    baseWidget = widg.EquiGrp(widg.FloatFld(-10., 10., .1, 2, partial(len, owner)), 3)
+
+    results = {}
+    for name, makeCopy in (("deepcopy", copy.deepcopy), ("clone", lambda widget: widget.clone())):
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        copies = [ makeCopy(baseWidget) for _ in range(numWidgets) ]
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del copies
+
+        results[name] = (seconds, peak)
+        print("%-8s %d widgets  %.4fs  %.1f MB peak" % (name, numWidgets, seconds, peak / 1e6))
+
+    return results
@@ -1,12 +1,18 @@
 import maya.cmds as cmds
+import maya.utils
 from functools import partial
+import hashlib
 import os
 import time
+from . import memo
+from . import preset
+from . import sweep
+from . import widget
 
 # An object of this type holds the name of a Maya command and a dictionary with all Flag objects
 #   corresponding to that command
 
-# The constructor will create a file to call the actual Maya command
+# The constructor will create a function to call the actual Maya command, and optionally a file defining the same
 
 class CmdUI:
 
@@ -14,7 +20,11 @@ class CmdUI:
     # scriptsPath: (string) the full path to your Maya scripts folder
     # settingsPath: (string) the full path to your settings folder for this command
     # flagUIs: (list) a list of Flag (from flag.py) objects for this command
-    def __init__(self, commandName, scriptsPath, settingsPath, flagList):
+    # writeCallerFile: (bool) whether to also write the <commandName>_call.py file to scriptsPath
+    # presetIndexCachePath: (string) optional path of a file to keep the list of presets in between sessions.
+    #   This should be outside of settingsPath
+    def __init__(self, commandName, scriptsPath, settingsPath, flagList, writeCallerFile=True,
+                 presetIndexCachePath=None):
 
         self.commandName = commandName
         self.scriptsPath = scriptsPath
@@ -22,6 +32,24 @@ class CmdUI:
         self.presetsMenu = None
         self.currentPreset = None
 
+        # The names of the preset files in settingsPath, created the first time they're needed
+        self.presetIndex = None
+        self.presetIndexCachePath = presetIndexCachePath
+
+        # Presets read and parsed in background threads, created the first time they're needed
+        self.presetCache = None
+
+        # Runs a function on Maya's main thread once it's idle.  Presets that finish parsing in the background are
+        # handed back to the main thread with this, so it can be replaced where there's no Maya event loop
+        self.executeDeferred = maya.utils.executeDeferred
+
+        # When True, loading a preset only sets the widgets whose values differ from the preset's
+        self.diffApply = False
+
+        # The CommandCache (from memo.py) results are reused from, or None to always call the command.  See
+        # enableMemo()
+        self.commandCache = None
+
         self.flagUIs = {}
         for f in flagList:
 
@@ -30,55 +58,306 @@ class CmdUI:
         # For various reasons, some commands require a name, specifying some object, as the first argument
         self.auxilaryName = None
 
-        self.createCommandCallerFile()
+        # The order the flags' values are passed to the command in
+        self.flagOrder = tuple(self.flagUIs)
+
+        self.commandCaller = self.createCommandCaller()
+
+        if writeCallerFile:
+            self.createCommandCallerFile()
+
+    # Changes whenever the value of any of the command's flags may have changed
+    def getVersion(self):
+
+        return sum([ self.flagUIs[key].getVersion() for key in self.flagUIs ])
+
+    # Returns a context in which the widgets of every flag that changed have been read from Maya together, with a
+    #   mel.eval() per value type, so that getting the flags' values doesn't query Maya once per widget. i.e.
+    #       with cmdUI.readVals():
+    #           ...
+    # See BatchRead in widget.py
+    def readVals(self):
+
+        dirtyWidgets = []
+        for key in self.flagUIs:
+            dirtyWidgets.extend(self.flagUIs[key].getDirtyWidgets())
+
+        return widget.BatchRead(dirtyWidgets)
+
+    # Calls the Maya command with the current values of the flags, and returns its result
+    def callCommand(self, *_):
+
+        return self.invoke()
+
+    # Calls the Maya command with values, in the order returned by resolveParamVals(), or with the current values of
+    #   the flags if it isn't given.  If memoization is enabled, the result of an earlier call with the same values
+    #   is used instead when there is one
+    def invoke(self, values=None):
+
+        if self.commandCache is None:
+            return self.commandCaller(self, values)
+
+        # The values are always hashed, since not every control a flag reads reports a version when it changes,
+        # i.e. range controls given by name
+        if values is None:
+            values = self.getParamVals()
+
+        return self.commandCache.call(partial(self.commandCaller, self), values)
+
+    # Reuse the results of earlier calls with the same values rather than calling the command again.  This is only
+    #   for commands that always give the same result for the same values.  See CommandCache in memo.py
+    # maxEntries: (int) the number of results kept
+    # duplicate: (bool) whether to duplicate the nodes of a reused result, rather than return the same nodes
+    def enableMemo(self, maxEntries=128, duplicate=False):
+
+        self.commandCache = memo.CommandCache(maxEntries, duplicate)
+
+    def disableMemo(self):
+
+        self.commandCache = None
+
+    # Returns the hits, misses, evictions, stale results and hit rate of the memoization, or None if it's disabled
+    def getMemoStats(self):
+
+        return None if self.commandCache is None else self.commandCache.getStats()
+
+    # Calls the Maya command with the values saved in a preset, without needing the GUI.  This works the same in
+    #   mayapy / maya.standalone as it does in an interactive session.  See resolveParamVals(), and headless.py for
+    #   running many presets in parallel
+    def runPreset(self, source):
+
+        return self.invoke(self.resolveParamVals(source))
+
+    # Returns the values the command would be called with if the preset were loaded, without creating or querying
+    #   any controls.  The first value is the auxilaryName, followed by each flag's value in the order of flagOrder.
+    # source can be a preset file name in settingsPath, the path of a preset file, a dictionary of
+    #   settingName -> value, or a PresetSource (from preset.py)
+    def resolveParamVals(self, source):
+
+        if isinstance(source, str) and not os.path.isfile(source):
+            source = self.settingsPath + (source if source.endswith(".txt") else source + ".txt")
+
+        # A preset file's values are looked up through its index, so only the ones the flags ask for are read
+        if isinstance(source, str):
+            with preset.PresetReader(source) as reader:
+                return self.resolveParamVals(reader)
+
+        presetSource = preset.getPresetSource(source)
+
+        values = [self.auxilaryName]
+        for key in self.flagOrder:
+            values.append(self.flagUIs[key].getPresetVal(presetSource))
+
+        return values
+
+    # Returns the current values of the flags, in the order returned by resolveParamVals()
+    def getParamVals(self):
+
+        values = [self.auxilaryName]
+        with self.readVals():
+            for key in self.flagOrder:
+                values.append(self.flagUIs[key].getParamVal())
+
+        return values
+
+    # Calls the command once for each combination of values of the flags named in flagNames, and yields each
+    #   combination (a dictionary of shortName -> value) with the command's result.  Combinations are generated as
+    #   they're needed, so the sweep can be stopped at any point.
+    # mode, count and seed choose the combinations.  See Sweep in sweep.py.
+    # Each flag's range is its widget's min, max and step, unless it's given in ranges as
+    #   shortName -> (min, max, step).  Only FlagSingle flags of IntFld, FloatFld and IntSliderFld widgets have ranges.
+    # The other flags keep their current values, or the values of base if it's given (anything resolveParamVals()
+    #   accepts).
+    # If checkpointPath is given, the number of combinations done is saved there after each one, and a sweep with
+    #   the same settings starts from where it left off.  Random and latinHypercube sweeps need to be given a seed
+    #   for their settings to be the same the next time
+    def sweep(self, flagNames, mode=sweep.CARTESIAN, count=None, seed=None, ranges=None, base=None,
+              checkpointPath=None):
+
+        parameterSweep = sweep.Sweep([ self.getSweepAxis(shortName, ranges) for shortName in flagNames ],
+                                     mode, count, seed)
+        settings = parameterSweep.getSettings()
+
+        done = 0
+        if checkpointPath is not None:
+            done = sweep.loadCheckpoint(checkpointPath, settings)
+            if done:
+                print("resuming sweep at combination " + str(done) + " of " + str(len(parameterSweep)))
+
+        baseValues = self.resolveParamVals(base) if base is not None else self.getParamVals()
+        valueIndices = dict([ (key, valueIndex) for valueIndex, key in enumerate(self.flagOrder, 1) ])
+
+        for combination in parameterSweep.iterate(done):
+
+            values = list(baseValues)
+            for shortName, value in combination.items():
+                values[valueIndices[shortName]] = value
+
+            result = self.invoke(values)
+
+            done += 1
+            if checkpointPath is not None:
+                sweep.saveCheckpoint(checkpointPath, settings, done)
+
+            yield combination, result
+
+    def getSweepAxis(self, shortName, ranges=None):
+
+        if ranges is not None and shortName in ranges:
+            minimum, maximum, step = ranges[shortName]
+            return sweep.SweepAxis(shortName, minimum, maximum, step,
+                                   all([ isinstance(v, int) for v in ranges[shortName] ]))
+
+        flagWidget = getattr(self.flagUIs[shortName], "widget", None)
+        if not isinstance(flagWidget, (widget.IntFld, widget.FloatFld, widget.IntSliderFld)):
+            cmds.error("Can't sweep " + shortName + " without a range. Only IntFld, FloatFld and IntSliderFld \
+                       flags have one")
+
+        # Sliders don't have a step, so they're swept over every integer
+        step = getattr(flagWidget, "step", 1)
+        return sweep.SweepAxis(shortName, flagWidget.min, flagWidget.max, step,
+                               not isinstance(flagWidget, widget.FloatFld))
+
+    # Builds the function that calls the actual Maya command in memory, without writing or importing a file.
+    # The function is compiled once, with the flags in the order of flagOrder, and returns the command's result.
+    def createCommandCaller(self):
+
+        namespace = {"cmds": cmds}
+        source = self.getCommandCallerSource(printValues=False)
+        exec(compile(source, "<" + self.commandName + "_call>", "exec"), namespace)
+
+        return namespace["call"]
+
+    # Returns the source code of a module defining a single function, call(), to which a CmdUI object can be
+    #   passed to invoke the actual Maya command.  call() can also be given the values to use, in the order
+    #   returned by resolveParamVals(), instead of getting them from the flags.
+    def getCommandCallerSource(self, printValues=True):
+
+        lines = [
+            "import maya.cmds as cmds",
+            "def call(c, values=None):",
+            "\tif c.commandName != \"" + self.commandName + "\":",
+            "\t\tprint(\"Error: command passed to call() does not match command in call file\")",
+            "\tif values is None:",
+            "\t\tvalues=[c.auxilaryName]",
+            "\t\twith c.readVals():",
+            "\t\t\tfor p in " + repr(self.flagOrder) + ":",
+            "\t\t\t\tvalues.append(c.flagUIs[p].getParamVal())" ]
+
+        if printValues:
+            lines.append("\tprint(\"Calling " + self.commandName + "() with values...\")")
+            lines.append("\tprint(values)")
+
+        lines.append("\treturn cmds." + self.commandName + "(")
+        lines.append("\t\tvalues[0],")
+        for valueIndex, key in enumerate(self.flagOrder, 1):
+
+            lines.append("\t\t" + self.flagUIs[key].shortName + "=values[" + str(valueIndex) + "],")
+
+        lines.append(")")
+
+        return "\n".join(lines) + "\n"
 
     # Creates a file named according to the command and with the suffix, "_call.py".
-    # This file defines a single function, call(), to which a CmdUI object can be passed to invoke the 
-    #   actual Maya command.
-    # Import this file into any code needing to call the command.
+    # This file defines the same call() function as createCommandCaller(), along with printing the values it's
+    #   called with. Import this file into any code needing to call the command.
+    # The file is only written if its contents would change, so it isn't rewritten every time the tool starts
     def createCommandCallerFile(self, *_):
 
-        commandCallFile = open(self.scriptsPath + self.commandName + "_call.py","w")
-        commandCallFile.write("import maya.cmds as cmds\n")
-        commandCallFile.write("def call(c):\n")
-        commandCallFile.write("\tif c.commandName != \"" + self.commandName + "\":\n")
-        commandCallFile.write("\t\tprint(\"Error: command passed to call() does not match command in call file\")\n")
-        commandCallFile.write("\tvalues=[c.auxilaryName]\n")
-        commandCallFile.write("\tfor p in c.flagUIs:\n")
-        commandCallFile.write("\t\tvalues.append(c.flagUIs[p].getParamVal())\n")
-        commandCallFile.write("\tprint(\"Calling " + self.commandName + "() with values...\")\n")
-        commandCallFile.write("\tprint(values)\n")
-        commandCallFile.write("\tcmds." + self.commandName + "(\n")
-        commandCallFile.write("\t\tvalues[0],\n") 
-        valueIndex = 1
-        for key in self.flagUIs:
+        callerFilePath = self.scriptsPath + self.commandName + "_call.py"
+        source = self.getCommandCallerSource()
+
+        if os.path.isfile(callerFilePath):
+            with open(callerFilePath, "rb") as existingFile:
+                existingHash = hashlib.sha1(existingFile.read()).hexdigest()
 
-            commandCallFile.write("\t\t" + self.flagUIs[key].shortName + "=values[" + str(valueIndex) + "],\n")
-            valueIndex += 1
+            if existingHash == hashlib.sha1(source.encode()).hexdigest():
+                return
 
-        commandCallFile.write(")\n")
+        # Write to a temporary file first so another Maya session sharing the scripts folder never imports a
+        # partially written file
+        tempFilePath = callerFilePath + "." + str(os.getpid()) + ".tmp"
+        commandCallFile = open(tempFilePath, "w", newline="\n")
+        commandCallFile.write(source)
         commandCallFile.close()
+        os.replace(tempFilePath, callerFilePath)
 
     # This popupMenu will occupy the space of the GUI component created just before it
     # The doSomething function will be triggered any time a new preset is selected
     def makePresetsPopupMenu(self, doSomething=None):
 
         self.presetsMenu = cmds.popupMenu(button=1) # button=1 means left mouse will open popup
-        for fileName in os.listdir(self.settingsPath):
-            if fileName.endswith(".txt"):
-                cmds.menuItem(fileName, l=fileName,command=partial(self.loadSettings, fileName, doSomething))
+        presetFileNames = self.getPresetIndex().getNames()
+        for fileName in presetFileNames:
+            cmds.menuItem(fileName, l=fileName,command=partial(self.loadSettings, fileName, doSomething))
+
+        # Start parsing the presets in the background, so they're ready by the time one is selected
+        self.getPresetCache().prefetch([ self.settingsPath + fileName for fileName in presetFileNames ])
+
+    def getPresetIndex(self):
+
+        if self.presetIndex is None:
+            self.presetIndex = preset.PresetIndex(self.settingsPath, self.presetIndexCachePath)
+
+        return self.presetIndex
+
+    def getPresetCache(self):
+
+        if self.presetCache is None:
+            self.presetCache = preset.PresetCache()
+
+        return self.presetCache
 
     # Called when a menuItem is selected from the presetsMenu
     def loadSettings(self, presetFileName, doSomething=None, someBool=False):
 
-        settingsFO = open(self.settingsPath + presetFileName,"r")
+        presetFuture = self.getPresetCache().load(self.settingsPath + presetFileName)
 
-        for key in self.flagUIs:
+        # The preset has usually been parsed in the background by now.  If not, it's applied on the main
+        # thread once it has been
+        if presetFuture.done():
+            self.applySettings(presetFileName, presetFuture, doSomething)
+        else:
+            presetFuture.add_done_callback(
+                lambda f: self.executeDeferred(partial(self.applySettings, presetFileName, f, doSomething)))
+
+    # Returns a context in which edits to the widgets' Maya controls are collected and made together when it
+    #   closes. i.e.
+    #       with cmdUI.batch():
+    #           ...
+    # See UIBatch in widget.py
+    def batch(self, suspendRefresh=False):
 
-            self.flagUIs[key].loadSettings(settingsFO)
+        return widget.UIBatch(suspendRefresh)
 
-        print("finished loading " + presetFileName + " preset")
-        settingsFO.close()
+    # Set the widgets' values from a preset.  presetFuture is a future of its PresetValues (from preset.py)
+    def applySettings(self, presetFileName, presetFuture, doSomething=None):
+
+        settingsFO = presetFuture.result()
+        if self.diffApply:
+            settingsFO = preset.DiffLoader(settingsFO)
+
+        # Each flag looks up its own values by name, so only the flags that have been instantiated are set.
+        # The edits are made together at the end, so widgets toggled more than once are only edited once.
+        # When only the changed values are set, the widgets' current values are read together first to compare with
+        with self.batch(suspendRefresh=True):
+
+            widgets = []
+            if self.diffApply:
+                for key in self.flagUIs:
+                    widgets.extend(self.flagUIs[key].getWidgets())
+
+            with widget.BatchRead(widgets):
+
+                for key in self.flagUIs:
+
+                    self.flagUIs[key].loadSettings(settingsFO)
+
+        if self.diffApply:
+            print("finished loading " + presetFileName + " preset (" + str(settingsFO.edits) + " values set, " +
+                  str(settingsFO.skipped) + " unchanged values skipped)")
+        else:
+            print("finished loading " + presetFileName + " preset")
 
         self.currentPreset = presetFileName[:-4]
         
@@ -96,7 +375,7 @@ class CmdUI:
 
         nameTaken = self.checkIfNameTaken(presetFileName)
 
-        overWriteWindowName = "OverwriteWindow" + str(round(time.clock()))
+        overWriteWindowName = "OverwriteWindow" + str(round(time.perf_counter()))
 
         if (nameTaken):
 
@@ -104,11 +383,14 @@ class CmdUI:
 
         else:
 
-            settingsFO = open(self.settingsPath + presetFileName,"w")
+            settingsFO = preset.PresetWriter()
 
             for key in self.flagUIs:
                 self.flagUIs[key].writeSettings(settingsFO)
 
+            settingsFO.save(self.settingsPath + presetFileName)
+            self.getPresetIndex().add(presetFileName)
+
             cmds.menuItem(presetFileName, l=presetFileName, p=self.presetsMenu,
                 command = partial(self.loadSettings, presetFileName))
 
@@ -116,11 +398,7 @@ class CmdUI:
 
     def checkIfNameTaken(self, presetFileName):
 
-        for presetFile in os.listdir(self.settingsPath):
-            if (presetFile == presetFileName):
-                return True
-
-        return False
+        return self.getPresetIndex().contains(presetFileName)
 
     def createOverWriteFileWindow(self, windowName, presetFileName):
 
@@ -145,6 +423,7 @@ class CmdUI:
         if overWrite:
 
             os.remove(self.settingsPath + presetFileName)
+            self.getPresetIndex().remove(presetFileName)
             print("Attempting to deleteUI with name: ", presetFileName)
 
             # Maya changes dots to underscores in its objects' names, so we must do the same to find them
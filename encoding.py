@@ -0,0 +1,67 @@
+import array
+import struct
+import numpy as np
+
+# Numeric output formats for the values the gradient flags compute, as an alternative to comma separated strings.
+# Each gradient's value is one buffer of float64s made of one or more parts, i.e. a FlagMultiGradiToPoly gradient's
+#   coefficients, limit intersections and min curves.  The buffer starts with a small header giving the length of
+#   each part, so the command receiving it can split it without parsing any text:
+#   ARRAY - an array.array('d'): [number of parts, length of each part..., values of each part...]
+#   NUMPY - a float64 NumPy array laid out the same way as ARRAY
+#   BYTES - packed little endian bytes: the header as 32 bit unsigned ints (number of parts, then each length),
+#       followed by the values as float64s
+# STRING keeps the flags' comma separated strings, and is the default.  encodeParts() makes it a tuple of one string
+#   per part, with each value written exactly
+
+STRING = "string"
+ARRAY = "array"
+NUMPY = "numpy"
+BYTES = "bytes"
+FORMATS = (STRING, ARRAY, NUMPY, BYTES)
+
+def checkFormat(outputFormat):
+
+    if outputFormat not in FORMATS:
+        raise ValueError("output format must be one of " + ", ".join(FORMATS) + ": " + str(outputFormat))
+
+# Encode the parts (1-D sequences of floats) of a gradient's value in one of the formats
+def encodeParts(parts, outputFormat):
+
+    parts = [ np.asarray(part, dtype=float).ravel() for part in parts ]
+    lengths = [ len(part) for part in parts ]
+
+    if outputFormat == STRING:
+        return tuple([ ",".join([ str(v) for v in part.tolist() ]) for part in parts ])
+
+    if outputFormat == BYTES:
+        header = struct.pack("<" + "I" * (len(parts) + 1), len(parts), *lengths)
+        return header + np.concatenate(parts).astype("<f8").tobytes()
+
+    values = np.concatenate([ np.array([len(parts)] + lengths, dtype=float) ] + parts)
+
+    if outputFormat == ARRAY:
+        return array.array("d", values.tobytes())
+
+    return values
+
+# Split a value made by encodeParts() back into its parts, as float64 NumPy arrays
+def decodeParts(value):
+
+    if isinstance(value, tuple):
+        return [ np.array([ float(v) for v in part.split(",") if v ], dtype=float) for part in value ]
+
+    if isinstance(value, bytes):
+
+        numParts = struct.unpack_from("<I", value)[0]
+        lengths = struct.unpack_from("<" + "I" * numParts, value, 4)
+        values = np.frombuffer(value, dtype="<f8", offset=4 * (numParts + 1))
+
+    else:
+
+        value = np.asarray(value, dtype=float)
+        numParts = int(value[0])
+        lengths = [ int(length) for length in value[1:numParts + 1] ]
+        values = value[numParts + 1:]
+
+    offsets = np.cumsum([0] + list(lengths))
+    return [ values[offsets[i]:offsets[i + 1]] for i in range(numParts) ]
@@ -5,11 +5,11 @@
 #   files should be in a subdirectory.  Here, the subdirectory is Command_UI
 
 import maya.cmds as cmds
-import importlib
 from Command_UI import ( flag as cf, cmdui, widget as widg)
 
 # Create the CmdUI object, specifying the name of the Maya command, Maya's scripts directory (should be
 #   the same as the directory for this file), directory for saving/loading, and list of Flags
+# The command is called through the CmdUI object itself, so there's no need for it to write a curve_call.py file
 # Here we are using the 'curve' command: https://download.autodesk.com/us/maya/2010help/CommandsPython/curve.html
 #   with only the 'p' (point) and 'd' (degree) parameters set
 curveCommand = cmdui.CmdUI(
@@ -19,13 +19,10 @@ curveCommand = cmdui.CmdUI(
     [
         cf.FlagSingle("d",widg.FloatFld(3.,100000.,.01,2)),
         cf.FlagMulti("p",widg.EquiGrp(widg.FloatFld(-10000., 10000.,.01,2),3)),
-    ]
+    ],
+    writeCallerFile=False
 )
 
-# Import the file just created by the curveCommand
-import curve_call
-importlib.reload(curve_call)
-
 class GUI:
 
     def __init__(self, *_):
@@ -82,7 +79,7 @@ class GUI:
 
     def callCurveCommand(self, *_):
 
-        curve_call.call(curveCommand)
+        curveCommand.callCommand()
 
     def setCurrentPreset(self, *_):
 
@@ -0,0 +1,659 @@
+import multiprocessing
+import multiprocessing.spawn
+import numpy as np
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Least squares polynomial fitting of gradient samples, and the root finding done on the fitted polynomials.
+# Gradients are always sampled on the same evenly spaced grid over [0, 1], so the pseudo-inverse of the
+#   design (Vandermonde) matrix only depends on the degree and the number of samples.  Those are computed
+#   once and cached, and then every gradient of a flag can be fit with a single matrix multiply.
+# Fitting over [0, 1] and scaling the coefficients to the range afterwards also keeps the design matrix
+#   well conditioned, where fitting directly against x values scaled by the range does not.
+
+class PolyFitter:
+
+    def __init__(self):
+
+        # (degree, numSamples) -> pseudo-inverse of the design matrix
+        self.pseudoInverses = {}
+
+    # Returns the pseudo-inverse for a degree and number of samples, computing it on first use.
+    # Columns are ordered highest power first, to match np.polyfit and np.polyval
+    def getPseudoInverse(self, degree, numSamples):
+
+        key = (degree, numSamples)
+        if key not in self.pseudoInverses:
+            xValues = np.linspace(0., 1., numSamples)
+            self.pseudoInverses[key] = np.linalg.pinv(np.vander(xValues, degree + 1))
+
+        return self.pseudoInverses[key]
+
+    # Fit each row of yValues (one gradient per row, sampled evenly over [0, 1]) to a polynomial of the given
+    # degree.  rangeValues holds one range per row (or a single range for all of them), and the returned
+    # coefficients are for the curves stretched over [0, range], as if they were fit against x * range.
+    # Returns a 2-D array with one row of coefficients per gradient, highest power first.
+    def fit(self, yValues, degree, rangeValues=1.):
+
+        yValues = np.atleast_2d(np.asarray(yValues, dtype=float))
+        pseudoInverse = self.getPseudoInverse(degree, yValues.shape[1])
+
+        coefficients = yValues @ pseudoInverse.T
+
+        return scaleCoefficients(coefficients, rangeValues)
+
+    # Same as fit(), except each gradient has its own degree.  Gradients are grouped by degree so each group
+    # is still fit with one matrix multiply.  Returns a list of coefficient arrays in the order of yValues
+    def fitEach(self, yValues, degrees, rangeValues):
+
+        yValues = np.atleast_2d(np.asarray(yValues, dtype=float))
+        degrees = np.asarray(degrees)
+        rangeValues = np.broadcast_to(np.asarray(rangeValues, dtype=float), (len(yValues),))
+
+        coefficients = [None] * len(yValues)
+        for degree in np.unique(degrees):
+            rows = np.nonzero(degrees == degree)[0]
+            for row, c in zip(rows, self.fit(yValues[rows], int(degree), rangeValues[rows])):
+                coefficients[row] = c
+
+        return coefficients
+
+# Coefficients fit over [0, 1] describe p(x / range) once the curve is stretched over [0, range], so the
+# coefficient of x^k is divided by range^k
+def scaleCoefficients(coefficients, rangeValues):
+
+    coefficients = np.atleast_2d(coefficients)
+    rangeValues = np.asarray(rangeValues, dtype=float).reshape(-1, 1)
+    powers = np.arange(coefficients.shape[1] - 1, -1, -1)
+
+    return coefficients / rangeValues ** powers
+
+# Shared by the gradient flags so the cached pseudo-inverses are reused between calls
+defaultFitter = PolyFitter()
+
+# Compare fitting numGradients random gradients (see gradient.getRandomValueStrings()) with a np.polyfit() call per
+#   gradient, against x values scaled by its range as the flags used to, and with PolyFitter.fitEach(), for each
+#   number of gradients in gradientCounts.  Also checks that the two agree: the largest difference between their
+#   coefficients relative to the largest coefficient, and between the fitted curves over the range.
+#   The pseudo-inverses are computed before timing, since they're cached for the whole session.
+#   Returns a list of (gradients, polyfit seconds, fitEach seconds, coefficient difference, curve difference) and
+#   prints it
+def benchmarkFitting(gradientCounts=(10, 100, 1000), repeats=3, seed=0):
+
+    import warnings
+    from . import gradient as gr
+
+    results = []
+    for numGradients in gradientCounts:
+
+        valueStrings = gr.getRandomValueStrings(numGradients, seed)
+        xGrid = np.linspace(0., 1., 101)
+        yValues = gr.evaluateMany(valueStrings, xGrid)
+        degrees = [ max(len(valueString.split(",")) // 3, 8) for valueString in valueStrings ]
+        rangeValues = np.random.default_rng(seed).uniform(.5, 5., numGradients)
+
+        def fitLoop():
+
+            # np.polyfit warns that fits against the scaled x values are poorly conditioned
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                return [ np.polyfit(xGrid * rangeValue, y, degree)
+                         for y, degree, rangeValue in zip(yValues, degrees, rangeValues) ]
+
+        def fitBatched():
+
+            return defaultFitter.fitEach(yValues, degrees, rangeValues)
+
+        fitBatched()
+
+        timings = []
+        for fit in (fitLoop, fitBatched):
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                coefficients = fit()
+
+            timings.append(((time.perf_counter() - start) / repeats, coefficients))
+
+        (loopTime, loopCoefficients), (batchedTime, batchedCoefficients) = timings
+
+        coefficientDifference = max([ np.max(np.abs(a - b)) / np.max(np.abs(a))
+                                      for a, b in zip(loopCoefficients, batchedCoefficients) ])
+        curveDifference = max([ np.max(np.abs(np.polyval(a, xGrid * r) - np.polyval(b, xGrid * r)))
+                                for a, b, r in zip(loopCoefficients, batchedCoefficients, rangeValues) ])
+
+        results.append((numGradients, loopTime, batchedTime, coefficientDifference, curveDifference))
+        print("%5d gradients: polyfit %.4fs  fitEach %.4fs  (%.1fx)  coefficient difference %.1e  curve difference "
+              "%.1e" % (numGradients, loopTime, batchedTime, loopTime / batchedTime, coefficientDifference,
+                        curveDifference))
+
+    return results
+
+# A bounded least recently used cache of gradient fit results.
+# Keys are (gradient value string, range value, degree) tuples, so a gradient is only refit when one of those changes.
+# Values are whatever the fitting code stores for a gradient, i.e. its coefficients, limit intersections and min
+#   curves strings.  Entries are evicted, least recently used first, once the estimated size of the cache goes over
+#   maxBytes or the number of entries goes over maxEntries (if given)
+class FitCache:
+
+    def __init__(self, maxBytes=16 * 1024 * 1024, maxEntries=None):
+
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.numBytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Returns the cached value for key, or None if it isn't cached
+    def get(self, key):
+
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, value):
+
+        if key in self.entries:
+            self.numBytes -= self.entries.pop(key)[1]
+
+        size = self.getSize(key) + self.getSize(value)
+        self.entries[key] = (value, size)
+        self.numBytes += size
+
+        while self.entries and (self.numBytes > self.maxBytes or
+                                (self.maxEntries is not None and len(self.entries) > self.maxEntries)):
+            _, (_, evictedSize) = self.entries.popitem(last=False)
+            self.numBytes -= evictedSize
+            self.evictions += 1
+
+    def clear(self):
+
+        self.entries.clear()
+        self.numBytes = 0
+
+    # Estimated memory used by a key or value, counting the strings and arrays in (nested) tuples and lists
+    def getSize(self, item):
+
+        if isinstance(item, (tuple, list)):
+            return sys.getsizeof(item) + sum([ self.getSize(i) for i in item ])
+        elif isinstance(item, np.ndarray):
+            return sys.getsizeof(item) + (0 if item.flags.owndata else item.nbytes)
+
+        return sys.getsizeof(item)
+
+    def getStats(self):
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hits / lookups if lookups else 0.,
+            "entries": len(self.entries),
+            "bytes": self.numBytes,
+            "maxBytes": self.maxBytes }
+
+# Shared by the gradient flags, since gradients with the same content give the same fit regardless of the flag
+defaultFitCache = FitCache()
+
+# The thread pool gradients are fit in off the main thread while they're being edited, created the first time it's
+#   needed.  NumPy releases the GIL for most of the fitting, so it doesn't hold up Maya's UI
+fitExecutor = None
+
+def getFitExecutor():
+
+    global fitExecutor
+
+    if fitExecutor is None:
+        fitExecutor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gradientFit")
+
+    return fitExecutor
+
+# Evaluate a batch of polynomials with Horner's method.  coefficients has one row per polynomial (highest power
+# first) and xValues has one row of x values per polynomial
+def polyvalEach(coefficients, xValues):
+
+    coefficients = np.atleast_2d(coefficients)
+    xValues = np.asarray(xValues, dtype=float)
+    if xValues.ndim == 1:
+        xValues = xValues.reshape(-1, 1)
+
+    yValues = np.zeros(xValues.shape)
+    for c in coefficients.T:
+        yValues = yValues * xValues + c.reshape(-1, 1)
+
+    return yValues
+
+# Find the real roots of each polynomial within [lower, upper] where the polynomial changes sign.
+# Each interval is split into numBrackets pieces, the pieces where the sign changes are kept as brackets, and
+#   all brackets of all polynomials are then narrowed together by bisection until they are within tolerance.
+# Roots where the curve only touches zero without crossing are not reported, and neither are pairs of roots
+#   closer together than one bracket, since the curve ends up on the same side of zero after them.  This is what
+#   the limit intersections need, since they only mark where the curve crosses the limit.  The exception is a curve
+#   touching zero exactly at the end of a bracket, which is reported as two equal roots, marking an empty crossing.
+# coefficients is a 2-D array with one row per polynomial, or a list of rows of differing degree.
+# Returns a list with one ascending array of roots per polynomial
+def findRealRoots(coefficients, lower, upper, numBrackets=256, tolerance=1e-12):
+
+    coefficients = padCoefficients(coefficients)
+    numPolys = len(coefficients)
+    lower = np.broadcast_to(np.asarray(lower, dtype=float), (numPolys,)).reshape(-1, 1)
+    upper = np.broadcast_to(np.asarray(upper, dtype=float), (numPolys,)).reshape(-1, 1)
+
+    grid = lower + (upper - lower) * np.linspace(0., 1., numBrackets + 1)
+    above = polyvalEach(coefficients, grid) > 0.
+
+    polyIndex, bracketIndex = np.nonzero(above[:, 1:] != above[:, :-1])
+    a = grid[polyIndex, bracketIndex]
+    b = grid[polyIndex, bracketIndex + 1]
+    aAbove = above[polyIndex, bracketIndex]
+    bracketCoefficients = coefficients[polyIndex]
+
+    # Each bisection halves the brackets, so this many are needed to get them all within tolerance
+    width = np.max(b - a) if len(a) else 0.
+    iterations = int(np.ceil(np.log2(width / tolerance))) if width > tolerance else 0
+
+    for _ in range(iterations):
+        mid = .5 * (a + b)
+        midAbove = polyvalEach(bracketCoefficients, mid)[:, 0] > 0.
+        sameAsA = midAbove == aAbove
+        a = np.where(sameAsA, mid, a)
+        b = np.where(sameAsA, b, mid)
+
+    roots = .5 * (a + b)
+
+    # np.nonzero returns the brackets ordered by polynomial, then by x, so the roots are already ascending
+    splits = np.searchsorted(polyIndex, np.arange(1, numPolys))
+    return np.split(roots, splits)
+
+# Pad rows of coefficients with leading zeros so polynomials of different degrees can be stacked
+def padCoefficients(coefficients):
+
+    if isinstance(coefficients, np.ndarray):
+        return np.atleast_2d(coefficients).astype(float)
+
+    numColumns = max(len(c) for c in coefficients)
+    padded = np.zeros((len(coefficients), numColumns))
+    for i, c in enumerate(coefficients):
+        padded[i, numColumns - len(c):] = c
+
+    return padded
+
+# The limit intersections of each polynomial over [0, rangeValue]: x values where the curve crosses y = limit.
+# Going above and going below the limit naturally alternate, so 0. is inserted first when the curve starts
+#   above the limit, and then each pair of values is the start and end of a portion of the curve above it.
+# Only crossings are found (see findRealRoots()).  A curve that just touches the limit, or goes over it and back
+#   within rangeValue / 256, has no intersections there, so that sliver isn't clipped.  np.roots would report a
+#   tangent root, or a pair of close ones, but they'd clip nothing either
+# Returns a list with one list of x values per polynomial
+def getLimitIntersections(coefficients, limit, rangeValues):
+
+    shiftedCurves = padCoefficients(coefficients).copy()
+    shiftedCurves[:, -1] -= limit
+
+    intersections = []
+    for shiftedCurve, roots in zip(shiftedCurves, findRealRoots(shiftedCurves, 0., rangeValues)):
+
+        roots = roots.tolist()
+        if shiftedCurve[-1] > 0.:
+            roots.insert(0, 0.)
+
+        intersections.append(roots)
+
+    return intersections
+
+# Min curves are used to clip the curves at their running minimum while integrating.  Each row of the returned
+# arrays is a point on the curve (x, y, direction) where the curve either just started going up from a new minimum
+# y value (direction 1), or just started going down from the previous minimum (direction -1).  Ranges from a -1 to
+# a 1 should be integrated while ranges from a 1 to a -1 should only take the area under the y value at the start
+# of the range.  The first row is always the first sample.
+# yValues is a 2-D array with one row of samples per curve, and xValues is either the x values shared by all rows
+#   or a 2-D array the same shape as yValues.
+# This does the same as getMinCurvesReference() for all curves at once.  After the first sample, the curve is going
+#   down exactly when the next sample is a new running minimum, so the points are where that changes.
+# Returns a list with one (number of points, 3) array per curve
+def getMinCurves(xValues, yValues):
+
+    yValues = np.atleast_2d(np.asarray(yValues, dtype=float))
+    xValues = np.broadcast_to(np.asarray(xValues, dtype=float), yValues.shape)
+
+    runningMin = np.minimum.accumulate(yValues, axis=1)
+    goingDown = yValues[:, 1:] < runningMin[:, :-1]
+
+    changes = np.ones(goingDown.shape, dtype=bool)
+    changes[:, 1:] = goingDown[:, 1:] != goingDown[:, :-1]
+
+    curveIndex, sampleIndex = np.nonzero(changes)
+    points = np.column_stack((
+        xValues[curveIndex, sampleIndex],
+        yValues[curveIndex, sampleIndex],
+        np.where(goingDown[curveIndex, sampleIndex], -1., 1.)))
+
+    splits = np.searchsorted(curveIndex, np.arange(1, len(yValues)))
+    return np.split(points, splits)
+
+# Loop based version of getMinCurves() for a single curve, returning a flat list of x, y, direction values.
+# Kept as the reference that getMinCurves() must agree with
+def getMinCurvesReference(xVals, yVals):
+
+    # min_curves is used to clip the curve at the running minimum while integrating.  Each set of 3 elements
+    # represents a point on the curve where we either just started going up from a new minimum y value, or
+    # just started going down from the previous minimum. Whether it is up or down is indicated by the 
+    # third in the set; 1 for up and -1 for down.  Ranges from a -1 to a 1 should be integrated
+    # while ranges from a 1 to a -1 should only take the area under the y value at the start of the range.
+    # Note that we're directly using the x and y values of the gradient, which may be slightly different than
+    # the fitted curve, but I think this will be a sufficient approximation.
+    min_curves = [ xVals[0], yVals[0], 1 if yVals[1] >= yVals[0] else -1  ]
+
+    for i in range(1, len(xVals) - 1):
+        if yVals[i+1] >= yVals[i] and min_curves[-1] == -1:
+            min_curves.extend([xVals[i], yVals[i], 1])
+        elif yVals[i+1] < yVals[i] and min_curves[-1] == 1 and yVals[i+1] < min_curves[-2]:
+            min_curves.extend([xVals[i], yVals[i], -1])
+
+    return min_curves
+
+    # Below is another method for getting min curves which uses the minima of the curve.  Results were funny.
+
+    # min_curves is used to clip the curve at the running minimum while integrating. As with the limit
+    # intersections list, this one will also mark points on the curve which are the start or end of an x
+    # range which need not be integrated. Both x and y values are included since the y value is used as
+    # the constant with which to multiply over the ranges that are above the running minimum.
+    # first_derivative = np.polyder(coeffs)
+    # critical_points = np.roots(first_derivative)
+    # critical_points = critical_points[np.isreal(critical_points)].real
+    # second_derivative = np.polyder(first_derivative)
+
+    # # If the curve is moving up at x = 0., then this is the start of a range above the running minimum, so include it
+    # upAtZero = np.polyval(coeffs, 0.) < np.polyval(coeffs, rangeValue / 50)
+    # minima = [] if not upAtZero else [ 0., np.polyval(coeffs, 0.) ]
+    # for x in reversed(critical_points):
+    #     if x > rangeValue or x <= 0.:
+    #         continue
+
+    #     second_deriv_value = np.polyval(second_derivative, x)
+    #     #print("second dderiv val: " + str(second_deriv_value))
+    #     if second_deriv_value > 0:
+    #         y = np.polyval(coeffs, x)
+    #         if len(minima) == 0 or y < minima[-1]:
+    #             #if (len(minima) > 0):
+    #                 #print("is " + str(y) + " less than " + str(minima[-1]))
+    #             minima.extend([x, y])
+
+    # print("minima for " + self.shortName, minima)
+    # # Now we have the running minimum minima (not a typo), these are the minima whose y values are lower than any
+    # # previous minima on the curve.  These mark the starts of a range above the running minimum, but we still need
+    # # a little more.  We need to find any points on the curve which begin to fall below their relative most recent minima.
+    # # These will mark the end of a range above the running minimum.  To find these, we just need to find the point
+    # # between each two minima that intersects with the y value of the first.  Note that for each subsequent pair of
+    # # minima there will be just one of these points, and that the curve is always sloping down at this point.
+    # min_curves = []
+    # for i in range(0, len(minima), 2):
+    #     x, y = minima[i], minima[i + 1]
+    #     shiftedCurve = coeffs.copy()
+    #     shiftedCurve[-1] -= y
+    #     runningMinIntersections = np.roots(shiftedCurve)
+    #     runningMinIntersections = [r.real for r in runningMinIntersections if np.isclose(r.imag, 0)]
+    #     nextMinimaX = rangeValue if len(minima) <= i + 2 else minima[i + 2] 
+    #     print("next minima x: " + str(nextMinimaX))
+    #     runningMinIntersections = [num for num in reversed(runningMinIntersections) if num > x and num <= nextMinimaX] 
+    #     if len(runningMinIntersections) > 1:
+    #         print("multiple intersections between minima?: ", runningMinIntersections)
+    #         rangeAboveMin = [x,y,runningMinIntersections[0]]
+    #     elif len(runningMinIntersections) == 0:
+    #         print("No min intersections? ")
+    #         rangeAboveMin = [x,y,rangeValue]
+    #     else:
+    #         rangeAboveMin = [x,y,runningMinIntersections[0]]
+
+    #     min_curves.extend(rangeAboveMin)
+
+# The results of fitPipeline() for a batch of gradients.  Each gradient's coefficients, limit intersections and min
+#   curve points have a different length, so each kind is kept as one flat array along with the offset each
+#   gradient's part starts at, rather than as lists of arrays.  This keeps them compact to send between processes.
+class FitResults:
+
+    def __init__(self, coefficients, limitIntersections, minCurves):
+
+        # Each is a (flat array, offsets) pair, where gradient i's part is flat[offsets[i]:offsets[i + 1]]
+        self.coefficients = coefficients
+        self.limitIntersections = limitIntersections
+        self.minCurves = minCurves
+
+    def __len__(self):
+
+        return len(self.coefficients[1]) - 1
+
+    # Highest power first
+    def getCoefficients(self, index):
+
+        return getPackedRow(self.coefficients, index)
+
+    def getLimitIntersections(self, index):
+
+        return getPackedRow(self.limitIntersections, index)
+
+    # A (number of points, 3) array.  See getMinCurves()
+    def getMinCurves(self, index):
+
+        return getPackedRow(self.minCurves, index)
+
+# Pack a list of arrays into a (flat array, offsets) pair.  Arrays are joined along their first axis
+def packRows(rows, columns=None):
+
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([ len(row) for row in rows ])
+
+    shape = (0,) if columns is None else (0, columns)
+    flat = np.concatenate(rows) if rows else np.empty(shape)
+    return flat, offsets
+
+def getPackedRow(packed, index):
+
+    flat, offsets = packed
+    return flat[offsets[index]:offsets[index + 1]]
+
+# Join packed rows from several batches, in order
+def mergePackedRows(packedList):
+
+    flats = [ flat for flat, _ in packedList ]
+    offsets = [np.zeros(1, dtype=np.int64)]
+    start = 0
+    for flat, batchOffsets in packedList:
+        offsets.append(batchOffsets[1:] + start)
+        start += batchOffsets[-1]
+
+    return np.concatenate(flats), np.concatenate(offsets)
+
+def mergeFitResults(resultsList):
+
+    return FitResults(
+        mergePackedRows([ results.coefficients for results in resultsList ]),
+        mergePackedRows([ results.limitIntersections for results in resultsList ]),
+        mergePackedRows([ results.minCurves for results in resultsList ]))
+
+# Fit each gradient, find where it crosses the limit, and find its min curves.
+# yValues: (2-D array) one row of samples per gradient, taken at the x values in xGrid (spread evenly over [0, 1])
+# degrees, rangeValues: (1-D arrays) each gradient's polynomial degree and range
+# This only takes and returns NumPy arrays, so it can run in another process.  Returns a FitResults
+def fitPipeline(yValues, xGrid, degrees, rangeValues, limit=1.):
+
+    # Fit all the curves to polynomials at once, with the x axis scaled to each gradient's range
+    coefficients = defaultFitter.fitEach(yValues, degrees, rangeValues)
+
+    # Used to clip the curves at the limit when integrating
+    limitIntersections = getLimitIntersections(coefficients, limit, rangeValues)
+
+    # Note that this directly uses the x and y values of the gradients, which may be slightly different than the
+    # fitted curves
+    minCurves = getMinCurves(np.outer(rangeValues, xGrid), yValues)
+
+    return FitResults(
+        packRows(coefficients),
+        packRows([ np.asarray(intersections, dtype=float) for intersections in limitIntersections ]),
+        packRows(minCurves, 3))
+
+# Execution backends run fitPipeline() for a batch of gradients.  The serial backend runs it on the calling thread.
+#   The others split the gradients into one block per worker and run the blocks in a thread pool or a process pool.
+#   Threads help where NumPy releases the GIL (the matrix multiplies); processes also spread the Python parts of the
+#   pipeline over cores, at the cost of sending the samples and results between processes.
+# Blocks are never smaller than minRowsPerTask gradients, so small batches run serially
+class SerialBackend:
+
+    def run(self, yValues, xGrid, degrees, rangeValues, limit=1.):
+
+        return fitPipeline(yValues, xGrid, degrees, rangeValues, limit)
+
+    def shutdown(self):
+
+        pass
+
+class ExecutorBackend(SerialBackend):
+
+    def __init__(self, executorType, maxWorkers=None, minRowsPerTask=32):
+
+        self.executorType = executorType
+        self.maxWorkers = maxWorkers or os.cpu_count() or 1
+        self.minRowsPerTask = minRowsPerTask
+        self.executor = None
+
+    def run(self, yValues, xGrid, degrees, rangeValues, limit=1.):
+
+        numTasks = min(self.maxWorkers, len(yValues) // self.minRowsPerTask)
+        if numTasks < 2:
+            return fitPipeline(yValues, xGrid, degrees, rangeValues, limit)
+
+        if self.executor is None:
+            self.executor = self.createExecutor()
+
+        yValues = np.ascontiguousarray(yValues, dtype=float)
+        degrees = np.asarray(degrees, dtype=np.int64)
+        rangeValues = np.asarray(rangeValues, dtype=float)
+        xGrid = np.asarray(xGrid, dtype=float)
+
+        futures = [ self.executor.submit(fitPipeline, yValues[rows], xGrid, degrees[rows], rangeValues[rows], limit)
+                    for rows in np.array_split(np.arange(len(yValues)), numTasks) ]
+
+        return mergeFitResults([ future.result() for future in futures ])
+
+    def createExecutor(self):
+
+        return self.executorType(max_workers=self.maxWorkers)
+
+    def shutdown(self):
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+class ThreadBackend(ExecutorBackend):
+
+    def __init__(self, maxWorkers=None, minRowsPerTask=32):
+
+        ExecutorBackend.__init__(self, ThreadPoolExecutor, maxWorkers, minRowsPerTask)
+
+# The workers are spawned rather than forked, since forking Maya's process copies the whole session, and they run
+#   the interpreter getWorkerExecutable() returns
+class ProcessBackend(ExecutorBackend):
+
+    def __init__(self, maxWorkers=None, minRowsPerTask=32):
+
+        ExecutorBackend.__init__(self, ProcessPoolExecutor, maxWorkers, minRowsPerTask)
+
+    def createExecutor(self):
+
+        return ProcessPoolExecutor(max_workers=self.maxWorkers, mp_context=getSpawnContext())
+
+# Returns the multiprocessing context every pool of worker processes is made with, here and in headless.py.
+# multiprocessing has one executable for all the processes it spawns, so this is the only place it's changed, and
+#   only when it isn't getWorkerExecutable() already.  That's under Maya's GUI, where it would be Maya itself, which
+#   no spawned process can run, so every process spawned in the session afterwards runs mayapy instead
+def getSpawnContext():
+
+    context = multiprocessing.get_context("spawn")
+    executable = getWorkerExecutable()
+    if os.fsdecode(multiprocessing.spawn.get_executable()) != executable:
+        context.set_executable(executable)
+
+    return context
+
+# Returns the Python executable worker processes should run.  In Maya's GUI, sys.executable is Maya itself, which
+#   can't run as a worker, so it's mayapy from Maya's bin directory instead.  Raises RuntimeError if there isn't one
+def getWorkerExecutable():
+
+    executable = sys.executable
+    name = os.path.basename(executable).lower()
+    if not name.startswith("maya") or name.startswith("mayapy"):
+        return executable
+
+    # bin is next to the executable, except on macOS, where it's Maya.app/Contents/bin
+    directories = [ os.path.dirname(executable), os.path.join(os.path.dirname(os.path.dirname(executable)), "bin") ]
+    if os.environ.get("MAYA_LOCATION"):
+        directories.append(os.path.join(os.environ["MAYA_LOCATION"], "bin"))
+
+    for directory in directories:
+        for fileName in ("mayapy", "mayapy.exe"):
+            if os.path.isfile(os.path.join(directory, fileName)):
+                return os.path.join(directory, fileName)
+
+    raise RuntimeError("can't find mayapy to run fitting processes with, next to " + executable +
+                       " or in $MAYA_LOCATION/bin")
+
+BACKENDS = { "serial": SerialBackend, "threads": ThreadBackend, "processes": ProcessBackend }
+
+# The backend used by gradient flags that aren't given their own
+defaultBackend = SerialBackend()
+
+# Make the backend with the given name ("serial", "threads" or "processes") the default for all gradient flags.
+#   Keyword arguments are passed to the backend's constructor, i.e. setDefaultBackend("processes", maxWorkers=8)
+def setDefaultBackend(name, **kwargs):
+
+    global defaultBackend
+
+    defaultBackend.shutdown()
+    defaultBackend = BACKENDS[name](**kwargs)
+    return defaultBackend
+
+# Time each backend fitting numGradients random gradients, with each number of workers in workerCounts, to choose
+#   a backend for the machine it's run on.  Returns a list of (backend name, workers, seconds) and prints it
+def benchmarkBackends(numGradients=1024, workerCounts=None, degree=16, repeats=3):
+
+    if workerCounts is None:
+        workerCounts = sorted(set([ 1, 2, 4, os.cpu_count() or 1 ]))
+
+    rng = np.random.default_rng(0)
+    xGrid = np.linspace(0., 1., 101)
+    yValues = np.cumsum(rng.normal(0., .05, (numGradients, len(xGrid))), axis=1) + .5
+    degrees = np.full(numGradients, degree)
+    rangeValues = rng.uniform(.5, 5., numGradients)
+
+    backends = [ ("serial", 1, SerialBackend()) ]
+    for workers in workerCounts:
+        backends.append(("threads", workers, ThreadBackend(workers)))
+        backends.append(("processes", workers, ProcessBackend(workers)))
+
+    timings = []
+    for name, workers, backend in backends:
+
+        # The first run starts the workers, so it isn't timed
+        backend.run(yValues, xGrid, degrees, rangeValues)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            backend.run(yValues, xGrid, degrees, rangeValues)
+
+        timings.append((name, workers, (time.perf_counter() - start) / repeats))
+        backend.shutdown()
+        print(name + " x" + str(workers) + ": " + str(round(timings[-1][2], 4)) + "s")
+
+    return timings
@@ -1,7 +1,12 @@
 
 import maya.cmds as cmds
-import copy
 import numpy as np
+from functools import partial
+from . import encoding
+from . import gradient as gr
+from . import lookup
+from . import fitting
+from . import widget as widg
 
 # These classes bind a Maya command's parameter's 'short name' to one or more associated GUI elements
 # The purpose is to simplify saving and loading of GUI's associated with commands with lots of parameters,
@@ -16,6 +21,24 @@ class Flag:
     def __init__(self, shortName):
 
         self.shortName = shortName
+
+    # Changes whenever the flag's parameter value may have changed, so callers can tell when nothing needs
+    # to be recomputed.  See Widget.version
+    def getVersion(self):
+
+        return 0
+
+    # Returns the widgets whose values getParamVal() will read from Maya, so they can be read together.
+    # See BatchRead in widget.py
+    def getDirtyWidgets(self):
+
+        return []
+
+    # Returns the widgets loadSettings() sets from a preset, so their current values can be read together when
+    # they're compared with the preset's
+    def getWidgets(self):
+
+        return []
     
     def writeSettings(self, file):
 
@@ -25,6 +48,12 @@ class Flag:
 
         pass
 
+    # Returns the parameter value getParamVal() would return if the flag's widgets were loaded with the values in
+    # file (a PresetSource from preset.py), without needing any of the widgets' controls to exist
+    def getPresetVal(self, file):
+
+        return None
+
 class FlagSingle(Flag):
 
     def __init__(self, shortName, widget):
@@ -32,13 +61,33 @@ class FlagSingle(Flag):
         Flag.__init__(self, shortName)
         self.widget = widget
 
+        # The last value read from the widget, and the widget's version when it was read
+        self.paramVal = None
+        self.readVersion = None
+
     def createUI(self, val=None):
 
         return self.widget.create(val)
 
     def getParamVal(self, *_):
 
-        return self.widget.getVal()
+        if self.readVersion != self.widget.version:
+            self.readVersion = self.widget.version
+            self.paramVal = self.widget.getVal()
+
+        return self.paramVal
+
+    def getVersion(self):
+
+        return self.widget.version
+
+    def getDirtyWidgets(self):
+
+        return [self.widget] if self.readVersion != self.widget.version else []
+
+    def getWidgets(self):
+
+        return [self.widget]
     
     def enable(self, enabled):
 
@@ -52,6 +101,10 @@ class FlagSingle(Flag):
 
         self.widget.loadVal(file, self.shortName)
 
+    def getPresetVal(self, file):
+
+        return self.widget.getPresetVal(file, self.shortName)
+
 class FlagMulti(Flag):
 
     def __init__(self, shortName, baseWidget):
@@ -60,20 +113,49 @@ class FlagMulti(Flag):
         self.baseWidget = baseWidget
         self.widgets = []
 
+        # The last values computed for each widget, and the widgets' versions when they were read
+        self.paramVals = []
+        self.readVersions = []
+
     def createUI(self, val=None):
 
-        self.widgets.append(copy.deepcopy(self.baseWidget))
+        self.widgets.append(self.baseWidget.clone())
 
         return self.widgets[-1].create(val)
 
     def getParamVal(self, *_):
 
-        value = []
-        for widget in self.widgets:
+        with widg.BatchRead(self.getDirtyWidgets()):
+
+            for i in self.getDirtyIndices():
+
+                self.readVersions[i] = self.widgets[i].version
+                self.paramVals[i] = self.widgets[i].getVal()
+
+        return list(self.paramVals)
+
+    # Returns the indices of the widgets that changed since their values were last read.  Subclasses computing
+    # their own values from the widgets should store them in paramVals and update readVersions
+    def getDirtyIndices(self):
 
-            value.append(widget.getVal())
+        newWidgets = len(self.widgets) - len(self.readVersions)
+        self.paramVals.extend([None] * newWidgets)
+        self.readVersions.extend([None] * newWidgets)
 
-        return value
+        return [ i for i in range(len(self.widgets)) if self.widgets[i].version != self.readVersions[i] ]
+
+    def getDirtyWidgets(self):
+
+        return [ self.widgets[i] for i in self.getDirtyIndices() ]
+
+    def getWidgets(self):
+
+        return list(self.widgets)
+
+    # Widgets are only ever added, so counting them keeps this increasing when one is
+    def getVersion(self):
+
+        return len(self.widgets) + sum([ widget.version for widget in self.widgets ])
 
     def getWidget(self, index):
 
@@ -95,37 +177,275 @@ class FlagMulti(Flag):
 
             self.widgets[i].loadVal(file, self.shortName + str(i))
 
+    # Without widgets there's no telling how many rows the flag has, so every row saved in the preset is used
+    def getPresetVal(self, file):
+
+        return self.getPresetRows(file)
+
+    # Returns the value saved for each row, as the base widget's getVal() would return it
+    def getPresetRows(self, file):
+
+        rows = []
+        row = self.baseWidget.getPresetVal(file, self.shortName + "0")
+        while row is not None:
+            rows.append(row)
+            row = self.baseWidget.getPresetVal(file, self.shortName + str(len(rows)))
+
+        return rows
+
+# A FlagMulti for flags with many rows, i.e. hundreds of points.  The rows' values are kept in a NumPy array, and
+#   Maya controls are only created for the page of rows being shown, rather than one for every row.
+# The base widget must be numeric (FloatFld, IntFld, IntSliderFld or CheckBox), or an EquiGrp of a numeric widget.
+# createUI() adds a row without creating any controls.  showPage() shows a page of rows, creating pageSize widgets
+#   in the current layout the first time it's called and reusing them for every page after that.
+# getParamVal(), writeSettings() and loadSettings() work on the array, and save the same setting names as FlagMulti.
+class FlagMultiPaged(FlagMulti):
+
+    def __init__(self, shortName, baseWidget, pageSize=20):
+
+        FlagMulti.__init__(self, shortName, baseWidget)
+        self.pageSize = pageSize
+
+        # Groups have one column per widget in the group
+        self.isGroup = isinstance(baseWidget, widg.EquiGrp)
+        self.valueWidget = baseWidget.baseWidget if self.isGroup else baseWidget
+        self.valuesPerRow = baseWidget.widgetsPerGrp if self.isGroup else 1
+        self.isInt = isinstance(self.valueWidget, (widg.IntFld, widg.IntSliderFld, widg.CheckBox))
+
+        self.values = np.zeros((16, self.valuesPerRow))
+        self.numRows = 0
+
+        # Incremented whenever the array changes
+        self.valuesVersion = 0
+
+        # The page being shown, and the row each of self.widgets is showing
+        self.page = None
+        self.widgetRows = []
+
+    # Add a row.  val is its initial value, as it would be passed to the base widget's create().
+    # Returns the row's index
+    def createUI(self, val=None):
+
+        if self.numRows == len(self.values):
+            self.values = np.concatenate((self.values, np.zeros(self.values.shape)))
+
+        self.values[self.numRows] = self.getInitialRow(val)
+        self.numRows += 1
+        self.valuesVersion += 1
+
+        return self.numRows - 1
+
+    # The values the base widget's create() would start a row with
+    def getInitialRow(self, val):
+
+        if self.isGroup:
+            initValues = val if isinstance(val, list) and len(val) == self.valuesPerRow else [None] * self.valuesPerRow
+        else:
+            initValues = [val]
+
+        isGood = lambda v: (hasattr(self.valueWidget, "min") and
+                            self.valueWidget.initValIsGood(v, "int" if self.isInt else "float"))
+
+        return [ v if isGood(v) else getattr(self.valueWidget, "min", 0) for v in initValues ]
+
+    def getNumPages(self):
+
+        return (self.numRows + self.pageSize - 1) // self.pageSize
+
+    # Show the rows of a page in the widgets, creating the widgets the first time
+    def showPage(self, page):
+
+        self.syncPage()
+        self.page = page
+        self.refreshPage()
+
+    # Copy the values of the shown widgets that changed into the array
+    def syncPage(self):
+
+        with widg.BatchRead(self.getDirtyWidgets()):
+
+            for i in self.getDirtyIndices():
+
+                self.readVersions[i] = self.widgets[i].version
+                if i < len(self.widgetRows) and self.widgetRows[i] is not None:
+                    # A group's getVal() can be a single string, so the row comes from its widgets' values
+                    if self.isGroup:
+                        self.values[self.widgetRows[i]] = [ w.getVal() for w in self.widgets[i].widgets ]
+                    else:
+                        self.values[self.widgetRows[i]] = self.widgets[i].getVal()
+                    self.valuesVersion += 1
+
+    # Set the shown widgets from the array.  Widgets past the last row are hidden
+    def refreshPage(self):
+
+        if self.page is None:
+            return
+
+        rows = list(range(self.page * self.pageSize, min((self.page + 1) * self.pageSize, self.numRows)))
+        self.widgetRows = rows + [None] * (len(self.widgets) - len(rows))
+
+        for i, row in enumerate(rows):
+
+            rowValue = self.getRowVal(row)
+            if i >= len(self.widgets):
+                FlagMulti.createUI(self, rowValue if self.isGroup else rowValue[0])
+                continue
+
+            self.setVisible(self.widgets[i], True)
+            if self.isGroup:
+                for widget, value in zip(self.widgets[i].widgets, rowValue):
+                    widget.setVal(value)
+            else:
+                self.widgets[i].setVal(rowValue[0])
+
+        for widget in self.widgets[len(rows):]:
+            self.setVisible(widget, False)
+
+        # The widgets now match the array, so they only need reading again once the user changes them
+        self.readVersions = [ widget.version for widget in self.widgets ]
+        self.paramVals = [ None ] * len(self.widgets)
+
+    def setVisible(self, widget, visible):
+
+        for w in (widget.widgets if self.isGroup else [widget]):
+            cmds.control(w.uiID, e=True, visible=visible)
+
+    # A row's values as Python numbers
+    def getRowVal(self, row):
+
+        rowValues = self.values[row].tolist()
+        return [ int(v) for v in rowValues ] if self.isInt else rowValues
+
+    def getParamVal(self, *_):
+
+        self.syncPage()
+
+        if not self.isGroup:
+            return [ self.getRowVal(row)[0] for row in range(self.numRows) ]
+        elif self.baseWidget.paramType == "string":
+            return [ "".join([ str(v) + "," for v in self.getRowVal(row) ]) for row in range(self.numRows) ]
+
+        return [ self.getRowVal(row) for row in range(self.numRows) ]
+
+    def getVersion(self):
+
+        self.syncPage()
+        return self.valuesVersion
+
+    def getWidget(self, index):
+
+        if index in self.widgetRows:
+            return self.widgets[self.widgetRows.index(index)]
+
+        return None
+
+    def enable(self, index, enabled):
+
+        widget = self.getWidget(index)
+        if widget is not None:
+            widget.enable(enabled)
+
+    def getSettingNames(self, row):
+
+        if self.isGroup:
+            return [ self.shortName + str(row) + str(i) for i in range(self.valuesPerRow) ]
+
+        return [ self.shortName + str(row) ]
+
+    def writeSettings(self, file):
+
+        self.syncPage()
+
+        for row in range(self.numRows):
+            for settingName, value in zip(self.getSettingNames(row), self.getRowVal(row)):
+                file.writeVal(settingName, value)
+
+    def loadSettings(self, file):
+
+        self.syncPage()
+
+        for row in range(self.numRows):
+            for i, settingName in enumerate(self.getSettingNames(row)):
+
+                value = file.readVal(settingName)
+                if value is None:
+                    print("WARNING:  NO VALUE SAVED FOR - " + settingName)
+                else:
+                    self.values[row, i] = float(value)
+
+        self.valuesVersion += 1
+        self.refreshPage()
+
 # Need to override getParamVal() for gradients because there is a discrepancy between a gradient's 
 #   stored settings value and its command parameter value, unlike other widgets
 class FlagMultiGradi(FlagMulti):
 
-    def __init__(self, shortName, baseWidget, valuesPerGradient):
+    # outputFormat is one of the formats in encoding.py.  By default each gradient's values are a comma separated
+    # string, otherwise they're a single numeric buffer with one part
+    # sampleTolerance is how far from the curve the values of gradients evaluated in Maya may be.  See
+    # gradient.sampleManyAdaptive()
+    def __init__(self, shortName, baseWidget, valuesPerGradient, outputFormat=encoding.STRING, sampleTolerance=1e-4):
         
         FlagMulti.__init__(self, shortName, baseWidget)
 
+        encoding.checkFormat(outputFormat)
         self.valuesPerGradient = valuesPerGradient
+        self.outputFormat = outputFormat
+        self.sampleTolerance = sampleTolerance
 
     def getParamVal(self, *_):
 
-        increment = 1. / self.valuesPerGradient
-        valuesAsStrings = []
-        
-        for gradient in self.widgets:
+        # The gradients are evaluated from their value strings with gradient.sampleManyAdaptive(), locally or by Maya.
+        # Only the gradients that changed since the last call are evaluated again
+        with widg.BatchRead(self.getDirtyWidgets()):
+
+            for i in self.getDirtyIndices():
+
+                gradient = self.widgets[i]
+                self.readVersions[i] = gradient.version
+                self.paramVals[i] = self.getGradientVal(gradient.getVal())
+
+        valuesAsStrings = list(self.paramVals)
+
+        return valuesAsStrings if (len(valuesAsStrings) > 1) else valuesAsStrings[0]
 
-            valuesAsStrings.append("")
+    def getPresetVal(self, file):
 
-            xValue = 0.0
-            while xValue <= 1.:
-                valuesAsStrings[-1] += (str(cmds.gradientControlNoAttr(gradient.uiID, q=True, vap=xValue))) + ","
-                xValue += increment
+        valuesAsStrings = [ self.getGradientVal(valueString) for valueString in self.getPresetRows(file) ]
+        if not valuesAsStrings:
+            return None
 
         return valuesAsStrings if (len(valuesAsStrings) > 1) else valuesAsStrings[0]
 
+    # Returns the parameter value for a gradient's value string: its values at valuesPerGradient even intervals
+    def getGradientVal(self, valueString):
+
+        y_values = gr.sampleManyAdaptive([valueString], gr.getUniformXValues(self.valuesPerGradient),
+                                         self.sampleTolerance)[0]
+
+        if self.outputFormat != encoding.STRING:
+            return encoding.encodeParts([y_values], self.outputFormat)
+
+        return "".join([str(y) + "," for y in y_values.tolist()])
+
 # Same purpose as a FlagMultiGradi, except instead of just getting all of the gradients' values,
-# we fit the curves to polynomial functions
+# we fit the curves to polynomial functions (or encode them as lookup tables, see lookup.py)
 class FlagMultiGradiToPoly(FlagMulti):
 
-    def __init__(self, shortName, baseWidget):
+    # outputFormat is one of the formats in encoding.py.  By default the flag's value is a list of strings, three
+    # per gradient (see getParamVal()), otherwise it's a list with one numeric buffer per gradient, made of three
+    # parts: the coefficients, the limit intersections, and the min curves' (x, y, direction) values
+    # representation is one of the representations in lookup.py.  By default the gradients are fit to polynomials,
+    # otherwise they're encoded as lookup tables: uniform tables of tableSize entries, or adaptive tables sampled where
+    # the gradient's control points need it to stay within tableTolerance of it (see gradient.getSampleXValues()).
+    # A table's three strings, or the three parts of its buffer, are its x positions, its values with the limit and
+    # running minimum clipping applied, and the integrals up to each x
+    # defaultRange is the range value of gradients whose range isn't saved in a preset, i.e. legacy presets
+    # sampleTolerance is how far from the curve the samples polynomials and uniform tables are made from may be, when
+    # the gradients are evaluated in Maya.  See gradient.sampleManyAdaptive()
+    def __init__(self, shortName, baseWidget, fitCache=None, asyncFit=True, fitBackend=None,
+                 outputFormat=encoding.STRING, representation=lookup.POLYNOMIAL, tableSize=101, tableTolerance=1e-3,
+                 defaultRange=1., sampleTolerance=1e-4):
         
         # Range widgets are those that define the range of the gradient. These are used to scale the x axis
         # values so that the polynomials represent the correct range. It might be better to couple these 
@@ -133,11 +453,102 @@ class FlagMultiGradiToPoly(FlagMulti):
         # with self.widgets in this class
         self.rangeWidgets = []
         FlagMulti.__init__(self, shortName, baseWidget)
+
+        # The getFitKey() key each gradient was last fit with, and the range widgets'
+        # versions when they were read.  paramVals holds the fits
+        self.fitKeys = []
+        self.rangeReadVersions = []
+
+        # Fit results are cached by content, so gradients that haven't changed since the last call aren't refit.
+        # By default the cache is shared by all gradient flags
+        self.fitCache = fitCache if fitCache is not None else fitting.defaultFitCache
+
+        # If asyncFit is True, each gradient is fit in a background thread as soon as it's created or edited, so
+        # getParamVal() only has to collect the fits.  Gradients evaluated in Maya (see gradient.EVALUATORS) are still
+        # sampled on the main thread.  pendingFits holds the (key, future) of each gradient's latest submitted fit, by
+        # index
+        self.asyncFit = asyncFit
+        self.pendingFits = {}
+
+        # The execution backend (from fitting.py) that fits the gradients, or None to use fitting.defaultBackend
+        self.fitBackend = fitBackend
+
+        encoding.checkFormat(outputFormat)
+        self.outputFormat = outputFormat
+
+        if representation not in lookup.REPRESENTATIONS:
+            cmds.error(self.shortName + " representation must be one of " + ", ".join(lookup.REPRESENTATIONS))
+
+        self.representation = representation
+        self.tableSize = tableSize
+        self.tableTolerance = tableTolerance
+        self.defaultRange = defaultRange
+        self.sampleTolerance = sampleTolerance
     
     def createUI(self, rangeWidget, val=None):
 
         if rangeWidget: self.rangeWidgets.append(rangeWidget)
-        return FlagMulti.createUI(self, val)
+        uiID = FlagMulti.createUI(self, val)
+
+        if self.asyncFit:
+            gradient = self.widgets[-1]
+            gradient.changeCommand = partial(self.handleGradientChange, len(self.widgets) - 1, gradient.changeCommand)
+            self.submitFit(len(self.widgets) - 1)
+
+        return uiID
+
+    # Called by a gradient's change and drag callbacks.  changeCommand is the gradient's own changeCommand, if it had one
+    def handleGradientChange(self, index, changeCommand, *args):
+
+        self.submitFit(index)
+        if changeCommand is not None:
+            changeCommand(*args)
+
+    # Start fitting the gradient at index in the background, with a snapshot of its control points and range value.
+    # While the user keeps dragging, each edit supersedes the last: a fit that hasn't started is cancelled, and one
+    # that's running is ignored when it finishes, since its key no longer matches
+    def submitFit(self, index):
+
+        # The range widget may not have been created yet
+        if index >= len(self.rangeWidgets) or not hasattr(self.rangeWidgets[index], "uiID") and \
+                not isinstance(self.rangeWidgets[index], str):
+            return
+
+        valueString = self.widgets[index].getVal()
+        key = self.getFitKey(valueString, self.__getRangeValue(self.rangeWidgets[index]))
+
+        pending = self.pendingFits.get(index)
+        if pending is not None:
+            if pending[0] == key:
+                return
+
+            pending[1].cancel()
+
+        # Gradients evaluated by Maya have to be sampled on the main thread, which may be waiting for the fit in
+        # joinFit(), so they're sampled here and only the fit is done in the background
+        if gr.usesMaya():
+            future = fitting.getFitExecutor().submit(self.__fitSamples, [key], self.__sampleGradients([key]))
+        else:
+            future = fitting.getFitExecutor().submit(self.__fitGradients, [key])
+
+        self.pendingFits[index] = (key, future)
+
+    # Returns the fit for key if it was submitted for the gradient at index, waiting for it to finish if needed, or
+    # None if it wasn't.  Fits submitted for other keys are dropped
+    def joinFit(self, index, key):
+
+        pending = self.pendingFits.pop(index, None)
+        if pending is None:
+            return None
+
+        if pending[0] != key:
+            pending[1].cancel()
+            return None
+
+        if pending[1].cancelled():
+            return None
+
+        return pending[1].result()[0]
     
     def addRangeWidget(self, rangeWidget):
 
@@ -156,51 +567,57 @@ class FlagMultiGradiToPoly(FlagMulti):
             cmds.error("The number of gradients for " + self.shortName + "(" + str(len(self.widgets)) + ") \
                        does not match the number of range values (" + str(len(self.rangeWidgets)) + ")")
 
+        dirtyIndices = set(self.getDirtyIndices())
+        newWidgets = len(self.widgets) - len(self.fitKeys)
+        self.fitKeys.extend([None] * newWidgets)
+        self.rangeReadVersions.extend([None] * newWidgets)
+
+        # Only re-read the gradients and range widgets that changed since the last call, together.  Range widgets given
+        # as control names rather than widget objects can't report changes, so their values are always queried
+        changedIndices = []
+        with widg.BatchRead(self.getDirtyWidgets()):
+
+            for i, (gradientWidget, rangeWidget) in enumerate(zip(self.widgets, self.rangeWidgets)):
+
+                rangeVersion = getattr(rangeWidget, "version", None)
+                if i not in dirtyIndices and rangeVersion is not None and rangeVersion == self.rangeReadVersions[i]:
+                    continue
+
+                if i in dirtyIndices or self.fitKeys[i] is None:
+                    # getVal() returns all optionVars (control points) for the gradient represented as a string which is a
+                    # concatenation of the values (y, x, and curve type) that make up individual option vars.
+                    self.readVersions[i] = gradientWidget.version
+                    valueString = gradientWidget.getVal()
+                else:
+                    valueString = self.fitKeys[i][0]
+
+                self.rangeReadVersions[i] = rangeVersion
+                key = self.getFitKey(valueString, self.__getRangeValue(rangeWidget))
+
+                if key != self.fitKeys[i]:
+                    self.fitKeys[i] = key
+                    self.paramVals[i] = self.fitCache.get(key)
+
+                    if self.paramVals[i] is None:
+                        self.paramVals[i] = self.joinFit(i, key)
+                        if self.paramVals[i] is None:
+                            changedIndices.append(i)
+                        else:
+                            self.fitCache.put(key, self.paramVals[i])
+
+        # Fit the gradients that changed and aren't in the cache all at once
+        if changedIndices:
+            refits = self.__fitGradients([ self.fitKeys[i] for i in changedIndices ])
+            for i, fit in zip(changedIndices, refits):
+                self.fitCache.put(self.fitKeys[i], fit)
+                self.paramVals[i] = fit
+
         gradientsAsStrings = []
-        
-        for gradientWidget, rangeWidget in zip(self.widgets, self.rangeWidgets):
+        for fit in self.paramVals:
+            gradientsAsStrings.extend(fit)
 
-            # Check that the widget holding the range value is of the right type
-            if cmds.objectTypeUI(rangeWidget) == 'floatField':
-                rangeValue = cmds.floatField(rangeWidget, query=True, v=True)
-            elif cmds.objectTypeUI(rangeWidget) == 'intField':
-                rangeValue = cmds.intField(rangeWidget, query=True, v=True)
-            else:
-                cmds.error(self.shortName + " range widget must be floatField or intField")
-
-            # Gather the values on the gradient at intervals of .01. (100 values total)
-            xValue = 0.0
-            y_values = []
-            x_values = []
-            while round(xValue, 2) <= 1.:
-                y_values.append(cmds.gradientControlNoAttr(gradientWidget.uiID, q=True, vap=xValue))
-                x_values.append(xValue * rangeValue)
-                xValue += .01
-            
-            # Get the number of optionVars (control points) on the gradient.
-            # getVal() returns all optionVars for the gradient represented as a string which is a concatenation of 
-            # the values (y, x, and curve type) that make up individual option vars.  Since there are 3 per optionVar, divide by 3.
-            numOptionVars = len(gradientWidget.getVal().split(',')) // 3
-
-            # Fit the curve to a polynomial, then convert it to a string representing the coefficients.
-            # Getting an accurate representation of the curve can be tricky, and I'm not sure it's possible
-            # to get it perfect.  One thing I've noticed is that the degree needs to be sufficiently high, and
-            # even curves that appear to be low degree will tend to fit better with a higher degree setting. So
-            # let's use the value based on the optionVars but only if its greater than 8.
-            npCoefficients = np.polyfit(x_values, y_values, max(numOptionVars, 8))
-            
-            # Print a nice string of the funcion that can be copied into a graphing calculator
-            # print("coefficients for " + self.shortName + " with y values: ", y_values, "\n",
-            #       self.__getCopyableCoefficientString(npCoefficients))
-            
-            coefficients = ",".join([ str(float(c)) for c in npCoefficients])
-            gradientsAsStrings.append(coefficients)
-
-            gradientsAsStrings.append(self.__getLimitIntersections(npCoefficients, 1., rangeValue))
-                
-            
-            
-            gradientsAsStrings.append(self.__getMinCurves(x_values, y_values))
+        if self.outputFormat != encoding.STRING or self.representation != lookup.POLYNOMIAL:
+            return gradientsAsStrings
         
         print("\ngradientsAsStrings for " + self.shortName + " " + str(len(gradientsAsStrings)) + "\n")
         for i in range(0, len(gradientsAsStrings), 3):
@@ -209,97 +626,178 @@ class FlagMultiGradiToPoly(FlagMulti):
             print("min curves " + gradientsAsStrings[i+2])
 
         return gradientsAsStrings
+
+    # The range values are saved along with the gradients, under <shortName>Range<index>, so the flag's value can be
+    # computed from a preset without the range widgets.  They're only read by getPresetVal(), since the range widgets
+    # load their own values.  Presets saved without them use defaultRange
+    def writeSettings(self, file):
+
+        FlagMulti.writeSettings(self, file)
+
+        for i in range(len(self.rangeWidgets)):
+            file.writeVal(self.shortName + "Range" + str(i), self.__getRangeValue(self.rangeWidgets[i]))
+
+    def getPresetVal(self, file):
+
+        keys = []
+        for i, valueString in enumerate(self.getPresetRows(file)):
+
+            rangeValue = file.readVal(self.shortName + "Range" + str(i))
+            if rangeValue is None:
+                print("WARNING:  NO VALUE SAVED FOR - " + self.shortName + "Range" + str(i) + ", USING " +
+                      str(self.defaultRange))
+                rangeValue = self.defaultRange
+
+            keys.append(self.getFitKey(valueString, float(rangeValue)))
+
+        fits = [ self.fitCache.get(key) for key in keys ]
+        missingIndices = [ i for i in range(len(keys)) if fits[i] is None ]
+        if missingIndices:
+            refits = self.__fitGradients([ keys[i] for i in missingIndices ])
+            for i, fit in zip(missingIndices, refits):
+                self.fitCache.put(keys[i], fit)
+                fits[i] = fit
+
+        gradientsAsStrings = []
+        for fit in fits:
+            gradientsAsStrings.extend(fit)
+
+        return gradientsAsStrings
+
+    # Range widgets can be FloatFld or IntFld objects, or the names of floatField or intField controls
+    def __getRangeValue(self, rangeWidget):
+
+        if hasattr(rangeWidget, "getVal"):
+            return rangeWidget.getVal()
+
+        # Check that the widget holding the range value is of the right type
+        if cmds.objectTypeUI(rangeWidget) == 'floatField':
+            return cmds.floatField(rangeWidget, query=True, v=True)
+        elif cmds.objectTypeUI(rangeWidget) == 'intField':
+            return cmds.intField(rangeWidget, query=True, v=True)
+        else:
+            cmds.error(self.shortName + " range widget must be floatField or intField")
+
+    # Range widgets given as control names aren't widgets, so they're read by getParamVal() on their own
+    def getDirtyWidgets(self):
+
+        readVersions = self.rangeReadVersions + [None] * (len(self.rangeWidgets) - len(self.rangeReadVersions))
+        dirtyRangeWidgets = [ rangeWidget for rangeWidget, readVersion in zip(self.rangeWidgets, readVersions)
+                              if hasattr(rangeWidget, "version") and rangeWidget.version != readVersion ]
+
+        return FlagMulti.getDirtyWidgets(self) + dirtyRangeWidgets
+
+    def getVersion(self):
+
+        rangeVersions = [ getattr(rangeWidget, "version", 0) for rangeWidget in self.rangeWidgets ]
+        return FlagMulti.getVersion(self) + len(self.rangeWidgets) + sum(rangeVersions)
+
+    # The key a gradient's fit is cached by.  Fits in the numeric formats are cached separately from the strings, since
+    # the fit cache can be shared by flags with different formats
+    def getFitKey(self, valueString, rangeValue):
+
+        key = (valueString, rangeValue, self.getDegree(valueString))
+        if self.outputFormat != encoding.STRING:
+            key += (self.outputFormat,)
+        if self.representation == lookup.UNIFORM:
+            key += (self.representation, self.tableSize)
+        elif self.representation == lookup.ADAPTIVE:
+            key += (self.representation, self.tableTolerance)
+
+        return key
+
+    # Getting an accurate representation of the curve can be tricky, and I'm not sure it's possible
+    # to get it perfect.  One thing I've noticed is that the degree needs to be sufficiently high, and
+    # even curves that appear to be low degree will tend to fit better with a higher degree setting. So
+    # let's use the number of optionVars (control points) but only if its greater than 8.
+    # Since there are 3 values per optionVar in the gradient's value string, divide by 3.
+    def getDegree(self, valueString):
+
+        return max(len(valueString.split(',')) // 3, 8)
+
+    # Fit the gradients given as keys from getFitKey() and return a tuple of (coefficients, limit intersections,
+    # min curves) strings for each one, or a tuple of one numeric buffer in the other output formats
+    def __fitGradients(self, gradients):
+
+        return self.__fitSamples(gradients, self.__sampleGradients(gradients))
+
+    # Sample the gradients given as keys from getFitKey() where __fitSamples() needs them.  This is the only part of a
+    # fit that may call Maya (see gradient.sampleManyAdaptive()).  Returns an array with a row of values per gradient,
+    # or for adaptive tables, a list of (x values, values) per gradient
+    def __sampleGradients(self, gradients):
+
+        # Polynomials are fit to the values at intervals of .01 (101 values, including both ends).  Uniform tables are
+        # sampled on their own grid, which includes both ends exactly.  Adaptive tables are sampled at the x values each
+        # gradient's control points need
+        if self.representation == lookup.POLYNOMIAL:
+            return gr.sampleManyAdaptive([ key[0] for key in gradients ], gr.getUniformXValues(100),
+                                         self.sampleTolerance)
+
+        if self.representation == lookup.UNIFORM:
+            return gr.sampleManyAdaptive([ key[0] for key in gradients ], np.linspace(0., 1., self.tableSize),
+                                         self.sampleTolerance)
+
+        samples = []
+        for key in gradients:
+            xValues = gr.getSampleXValues(key[0], self.tableTolerance)
+            samples.append((xValues, gr.sample(key[0], xValues)))
+
+        return samples
+
+    # Fit the gradients given as keys from getFitKey() to their samples from __sampleGradients().  Only uses NumPy, so
+    # it can run on any thread.  Returns the same as __fitGradients()
+    def __fitSamples(self, gradients, samples):
+
+        if self.representation != lookup.POLYNOMIAL:
+            return self.__getTables(gradients, samples)
+
+        rangeValues = np.array([ key[1] for key in gradients ], dtype=float)
+        degrees = np.array([ key[2] for key in gradients ])
+
+        # Fit the curves to polynomials with the x axis scaled to each gradient's range, find their intersections with
+        # the limit of 1 (used to clip the curves at 1 when integrating), and find the points on the curves used to
+        # clip them at the running minimum while integrating
+        backend = self.fitBackend if self.fitBackend is not None else fitting.defaultBackend
+        results = backend.run(samples, gr.getUniformXValues(100), degrees, rangeValues, 1.)
+
+        fits = []
+        for i in range(len(results)):
+
+            npCoefficients = results.getCoefficients(i)
+            limitIntersections = results.getLimitIntersections(i)
+            minCurves = results.getMinCurves(i)
+
+            # Print a nice string of the funcion that can be copied into a graphing calculator
+            # print("coefficients for " + self.shortName + " with y values: ", y_values, "\n",
+            #       self.__getCopyableCoefficientString(npCoefficients))
+
+            if self.outputFormat != encoding.STRING:
+                fits.append((encoding.encodeParts([npCoefficients, limitIntersections, minCurves], self.outputFormat),))
+                continue
+
+            fits.append((
+                ",".join([ str(float(c)) for c in npCoefficients ]),
+                ",".join([ str(float(cx)) for cx in limitIntersections ]),
+                ",".join([ str(x) + "," + str(y) + "," + str(int(d)) for x, y, d in minCurves.tolist() ])))
+
+        return fits
     
-    def __getLimitIntersections(self, coeffs, limit, rangeValue):
-
-        # Shift the curve vertically by 1 and find the roots within 0 and rangeValue, these are the curve's 
-        # intersections with y = 1 and they are used to clip the curve at 1 when integrating
-        shiftedCurve = coeffs.copy()
-        shiftedCurve[-1] -= limit
-        limitIntersections = np.roots(shiftedCurve)
-        limitIntersections = [r.real for r in limitIntersections if np.isclose(r.imag, 0)]
-        limitIntersections = [num for num in reversed(limitIntersections) if num >= 0 and num <= rangeValue]
-        # Now we have the limit intersections and we want this list to show where the curve goes above and below the limit.
-        # Since 'going above' and 'going below' will naturally alternate, we can just check the y value at 0., and call
-        # it a 'going above' point if it is above the limit.
-        if np.polyval(coeffs, 0.) > 1.:
-            limitIntersections.insert(0,0.)
-        
-        return ",".join([ str(float(cx)) for cx in limitIntersections ])
-
-    def __getMinCurves(self, xVals, yVals):
-
-        # min_curves is used to clip the curve at the running minimum while integrating.  Each set of 3 elements
-        # represents a point on the curve where we either just started going up from a new minimum y value, or
-        # just started going down from the previous minimum. Whether it is up or down is indicated by the 
-        # third in the set; 1 for up and -1 for down.  Ranges from a -1 to a 1 should be integrated
-        # while ranges from a 1 to a -1 should only take the area under the y value at the start of the range.
-        # Note that we're directly using the x and y values of the gradient, which may be slightly different than
-        # the fitted curve, but I think this will be a sufficient approximation.
-        min_curves = [ xVals[0], yVals[0], 1 if yVals[1] >= yVals[0] else -1  ]
-
-        for i in range(1, len(xVals) - 1):
-            if yVals[i+1] >= yVals[i] and min_curves[-1] == -1:
-                min_curves.extend([xVals[i], yVals[i], 1])
-            elif yVals[i+1] < yVals[i] and min_curves[-1] == 1 and yVals[i+1] < min_curves[-2]:
-                min_curves.extend([xVals[i], yVals[i], -1])
-
-        return ",".join([ str(m) for m in min_curves ])
-    
-        # Below is another method for getting min curves which uses the minima of the curve.  Results were funny.
-
-        # min_curves is used to clip the curve at the running minimum while integrating. As with the limit
-        # intersections list, this one will also mark points on the curve which are the start or end of an x
-        # range which need not be integrated. Both x and y values are included since the y value is used as
-        # the constant with which to multiply over the ranges that are above the running minimum.
-        # first_derivative = np.polyder(coeffs)
-        # critical_points = np.roots(first_derivative)
-        # critical_points = critical_points[np.isreal(critical_points)].real
-        # second_derivative = np.polyder(first_derivative)
-        
-        # # If the curve is moving up at x = 0., then this is the start of a range above the running minimum, so include it
-        # upAtZero = np.polyval(coeffs, 0.) < np.polyval(coeffs, rangeValue / 50)
-        # minima = [] if not upAtZero else [ 0., np.polyval(coeffs, 0.) ]
-        # for x in reversed(critical_points):
-        #     if x > rangeValue or x <= 0.:
-        #         continue
-
-        #     second_deriv_value = np.polyval(second_derivative, x)
-        #     #print("second dderiv val: " + str(second_deriv_value))
-        #     if second_deriv_value > 0:
-        #         y = np.polyval(coeffs, x)
-        #         if len(minima) == 0 or y < minima[-1]:
-        #             #if (len(minima) > 0):
-        #                 #print("is " + str(y) + " less than " + str(minima[-1]))
-        #             minima.extend([x, y])
-
-        # print("minima for " + self.shortName, minima)
-        # # Now we have the running minimum minima (not a typo), these are the minima whose y values are lower than any
-        # # previous minima on the curve.  These mark the starts of a range above the running minimum, but we still need
-        # # a little more.  We need to find any points on the curve which begin to fall below their relative most recent minima.
-        # # These will mark the end of a range above the running minimum.  To find these, we just need to find the point
-        # # between each two minima that intersects with the y value of the first.  Note that for each subsequent pair of
-        # # minima there will be just one of these points, and that the curve is always sloping down at this point.
-        # min_curves = []
-        # for i in range(0, len(minima), 2):
-        #     x, y = minima[i], minima[i + 1]
-        #     shiftedCurve = coeffs.copy()
-        #     shiftedCurve[-1] -= y
-        #     runningMinIntersections = np.roots(shiftedCurve)
-        #     runningMinIntersections = [r.real for r in runningMinIntersections if np.isclose(r.imag, 0)]
-        #     nextMinimaX = rangeValue if len(minima) <= i + 2 else minima[i + 2] 
-        #     print("next minima x: " + str(nextMinimaX))
-        #     runningMinIntersections = [num for num in reversed(runningMinIntersections) if num > x and num <= nextMinimaX] 
-        #     if len(runningMinIntersections) > 1:
-        #         print("multiple intersections between minima?: ", runningMinIntersections)
-        #         rangeAboveMin = [x,y,runningMinIntersections[0]]
-        #     elif len(runningMinIntersections) == 0:
-        #         print("No min intersections? ")
-        #         rangeAboveMin = [x,y,rangeValue]
-        #     else:
-        #         rangeAboveMin = [x,y,runningMinIntersections[0]]
-
-        #     min_curves.extend(rangeAboveMin)
+    # Encode the gradients given as keys from getFitKey() as lookup tables of their samples instead.  Returns the same
+    # kind of tuples as __fitGradients()
+    def __getTables(self, gradients, samples):
+
+        rangeValues = np.array([ key[1] for key in gradients ], dtype=float)
+
+        if self.representation == lookup.UNIFORM:
+            tables = lookup.buildTables(samples, np.linspace(0., 1., self.tableSize), rangeValues, 1.)
+        else:
+            tables = [ lookup.buildTable(xValues, yValues, rangeValue, 1.)
+                       for (xValues, yValues), rangeValue in zip(samples, rangeValues) ]
+
+        if self.outputFormat != encoding.STRING:
+            return [ (encoding.encodeParts(table, self.outputFormat),) for table in tables ]
+
+        return [ encoding.encodeParts(table, encoding.STRING) for table in tables ]
 
     def __getCopyableCoefficientString(self, coeffs):
 
@@ -328,12 +826,21 @@ class FlagMulti_NoWidget(Flag):
         
         Flag.__init__(self, shortName)
         self.paramVal = None
+        self.version = 0
 
     def setParamVal(self, val):
 
         self.paramVal = val
+        self.version += 1
         
     def getParamVal(self, *_):
 
         return self.paramVal
-    
\ No newline at end of file
+
+    def getPresetVal(self, file):
+
+        return self.paramVal
+
+    def getVersion(self):
+
+        return self.version
@@ -0,0 +1,384 @@
+import json
+import threading
+import numpy as np
+
+# Functions for evaluating gradientControlNoAttr curves without querying Maya.
+# A gradient's value, as returned by Gradient.getVal(), is a single string of comma separated triples:
+#   y value, x position, interpolation type - i.e. '.5,0.,3,1.,.6,1'
+# Evaluating the parsed control points here replaces the per-x cmds.gradientControlNoAttr(q=True, vap=x)
+#   queries, which cost one round trip into Maya for every sample.  See EVALUATORS below.
+
+# Interpolation types, as stored in the third value of each control point.  The type of a point applies
+#   to the segment between it and the next point
+NONE = 0
+LINEAR = 1
+SMOOTH = 2
+SPLINE = 3
+
+# The absolute tolerance values evaluated here must agree with cmds.gradientControlNoAttr(uiID, q=True, vap=x)
+#   within.  Maya keeps the control points as single precision floats, so they can't agree more closely than this.
+#   Whether they do is checked with checkSamples()
+TOLERANCE = 1e-5
+
+# How the gradient flags evaluate gradients:
+#   LOCAL - with evaluate(), from the control points
+#   MAYA - by loading the control points into a hidden gradientControlNoAttr and querying it at each x value, one
+#       Maya call per value, as the flags did before there was a local evaluator
+# LOCAL is the default.  It's checked against samples in the format recordSamples() writes by tests/test_gradient.py.
+#   setEvaluator(MAYA) goes back to querying Maya, i.e. to compare the two in a new version of Maya.
+# Without Maya's UI (mayapy / maya.standalone) there's no control to query, so gradients are always evaluated locally
+LOCAL = "local"
+MAYA = "maya"
+EVALUATORS = (LOCAL, MAYA)
+
+evaluator = LOCAL
+
+# Whether Maya's UI is available to evaluate gradients with, found the first time it's needed
+mayaHasUI = None
+
+# The optionVars MayaGradientControl loads control points from are named with this and "0" or "1"
+MAYA_OPTION_VAR_PREFIX = "cmdUIGradientEvaluator"
+
+# Parse a gradient's value string into three arrays sorted by x position: x positions, y values and
+#   interpolation types. Maya does not keep the points in x order, so they are sorted here.
+def parseControlPoints(valueString):
+
+    values = [v for v in valueString.split(",") if v.strip() != ""]
+    if len(values) < 3 or len(values) % 3 != 0:
+        raise ValueError("gradient value string must be a list of (y, x, interpolation) triples: " + valueString)
+
+    points = np.array(values, dtype=float).reshape(-1, 3)
+    order = np.argsort(points[:, 1], kind="stable")
+
+    return points[order, 1], points[order, 0], points[order, 2].astype(int)
+
+# Evaluate a gradient at each of the x values (expected to be within 0 and 1).
+# controlPoints is either the value string from Gradient.getVal() or the tuple returned by parseControlPoints().
+# Returns a float64 array the same shape as xValues.
+def evaluate(controlPoints, xValues):
+
+    if isinstance(controlPoints, str):
+        controlPoints = parseControlPoints(controlPoints)
+
+    xs, ys, interps = controlPoints
+    xValues = np.asarray(xValues, dtype=float)
+
+    # Outside of the control points the curve holds the value of the nearest point
+    if len(xs) == 1:
+        return np.full(xValues.shape, ys[0])
+
+    # Index of the segment each x falls in, i.e. the last control point at or before x
+    seg = np.clip(np.searchsorted(xs, xValues, side="right") - 1, 0, len(xs) - 2)
+    x0, x1 = xs[seg], xs[seg + 1]
+    y0, y1 = ys[seg], ys[seg + 1]
+
+    width = x1 - x0
+    safeWidth = np.where(width > 0., width, 1.)
+    t = np.clip((xValues - x0) / safeWidth, 0., 1.)
+    t = np.where(width > 0., t, 1.)
+
+    slopes = getSlopes(xs, ys)
+
+    t2 = t * t
+    t3 = t2 * t
+    h00 = 2. * t3 - 3. * t2 + 1.
+    h10 = t3 - 2. * t2 + t
+    h01 = -2. * t3 + 3. * t2
+    h11 = t3 - t2
+
+    linear = y0 + (y1 - y0) * t
+    smooth = h00 * y0 + h01 * y1
+    spline = h00 * y0 + h10 * width * slopes[seg] + h01 * y1 + h11 * width * slopes[seg + 1]
+
+    values = np.select(
+        [interps[seg] == NONE, interps[seg] == LINEAR, interps[seg] == SMOOTH],
+        [np.where(t < 1., y0, y1), linear, smooth],
+        spline)
+
+    values = np.where(xValues <= xs[0], ys[0], values)
+    values = np.where(xValues >= xs[-1], ys[-1], values)
+
+    return values
+
+# Spline segments are Catmull-Rom style cubic Hermite curves. The slope at each point comes from its
+#   neighbors, and the end points are treated as if they were duplicated.  Needs at least two points
+def getSlopes(xs, ys):
+
+    slopes = np.empty(len(xs))
+    slopes[1:-1] = (ys[2:] - ys[:-2]) / np.where(xs[2:] > xs[:-2], xs[2:] - xs[:-2], 1.)
+    slopes[0] = (ys[1] - ys[0]) / (xs[1] - xs[0]) if xs[1] > xs[0] else 0.
+    slopes[-1] = (ys[-1] - ys[-2]) / (xs[-1] - xs[-2]) if xs[-1] > xs[-2] else 0.
+
+    return slopes
+
+# Returns evenly spaced x values over [0, 1] splitting it into numIntervals, with both ends exact.  Accumulating
+#   the step instead drifts, and can drop the sample at 1
+def getUniformXValues(numIntervals):
+
+    return np.linspace(0., 1., int(numIntervals) + 1)
+
+# Returns x values over [0, 1] to sample a gradient at, placed according to its control points so that linear
+#   interpolation between the samples stays within tolerance of the curve:
+#   - 0, 1 and every control point are always sampled, exactly
+#   - linear segments, and the flat parts before the first point and after the last, need no other samples
+#   - step (NONE) segments get one more sample just before the step, so it isn't interpolated as a ramp
+#   - smooth and spline segments are cubic, and linear interpolation over a width h is within h^2 * max|y''| / 8
+#     of a curve, so each gets just enough evenly spaced samples for that to be within tolerance
+# controlPoints is either the value string from Gradient.getVal() or the tuple returned by parseControlPoints().
+# Adaptive lookup tables are built from these samples.  See lookup.py
+def getSampleXValues(controlPoints, tolerance=1e-3):
+
+    if isinstance(controlPoints, str):
+        controlPoints = parseControlPoints(controlPoints)
+
+    xs, ys, interps = controlPoints
+    inside = (xs > 0.) & (xs < 1.)
+    samples = [ np.array([0., 1.]), xs[inside] ]
+
+    if len(xs) > 1:
+
+        x0, x1 = np.maximum(xs[:-1], 0.), np.minimum(xs[1:], 1.)
+        width = np.diff(xs)
+        segments = (x1 > x0) & (width > 0.)
+
+        steps = segments & (interps[:-1] == NONE)
+        samples.append(x0[steps] + (x1[steps] - x0[steps]) * (1. - 1e-6))
+
+        spline = interps[:-1] == SPLINE
+        cubic = np.nonzero(segments & (spline | (interps[:-1] == SMOOTH)))[0]
+        if len(cubic):
+
+            slopes = getSlopes(xs, ys)
+            m0 = np.where(spline, slopes[:-1], 0.)[cubic]
+            m1 = np.where(spline, slopes[1:], 0.)[cubic]
+            dy = np.diff(ys)[cubic]
+            w = width[cubic]
+
+            # The second derivative of a cubic Hermite segment is linear, so it's largest at one of the ends
+            curvature = np.maximum(np.abs(6. * dy - 4. * w * m0 - 2. * w * m1),
+                                   np.abs(-6. * dy + 2. * w * m0 + 4. * w * m1)) / w ** 2
+
+            # Each segment's evenly spaced samples, not counting its ends.  k numbers them within their segment
+            start, span = x0[cubic], (x1 - x0)[cubic]
+            numIntervals = np.ceil(span * np.sqrt(curvature / (8. * tolerance))).astype(int)
+            numInside = np.maximum(numIntervals - 1, 0)
+            segment = np.repeat(np.arange(len(cubic)), numInside)
+            k = np.arange(len(segment)) - np.repeat(np.cumsum(numInside) - numInside, numInside) + 1.
+            samples.append(start[segment] + span[segment] * k / numIntervals[segment])
+
+    return np.unique(np.concatenate(samples))
+
+# Evaluate several gradients at the same x values. Returns a 2-D array with one row per gradient
+def evaluateMany(controlPointsList, xValues):
+
+    xValues = np.asarray(xValues, dtype=float)
+    values = np.empty((len(controlPointsList), len(xValues)))
+
+    for i, controlPoints in enumerate(controlPointsList):
+        values[i] = evaluate(controlPoints, xValues)
+
+    return values
+
+def setEvaluator(name):
+
+    global evaluator
+
+    if name not in EVALUATORS:
+        raise ValueError("gradient evaluator must be one of " + ", ".join(EVALUATORS) + ": " + str(name))
+
+    evaluator = name
+
+# Whether the gradient flags are evaluating gradients by querying Maya
+def usesMaya():
+
+    global mayaHasUI
+
+    if evaluator != MAYA:
+        return False
+
+    if mayaHasUI is None:
+        try:
+            import maya.cmds as cmds
+            mayaHasUI = not cmds.about(batch=True)
+        except ImportError:
+            mayaHasUI = False
+
+        if not mayaHasUI:
+            print("WARNING:  NO MAYA UI TO EVALUATE GRADIENTS WITH, EVALUATING THEM LOCALLY")
+
+    return mayaHasUI
+
+# Evaluate a gradient with the current evaluator.  See EVALUATORS
+def sample(valueString, xValues):
+
+    if usesMaya():
+        return evaluateInMaya(valueString, xValues)
+
+    return evaluate(valueString, xValues)
+
+# Evaluate several gradients at the same x values with the current evaluator. Returns a 2-D array with one row per
+#   gradient
+def sampleMany(valueStrings, xValues):
+
+    if usesMaya():
+        return evaluateManyInMaya(valueStrings, xValues)
+
+    return evaluateMany(valueStrings, xValues)
+
+# Like sampleMany(), but when Maya evaluates the gradients, each is only queried at its getSampleXValues() and
+#   interpolated linearly onto xValues, which stays within tolerance of the curve.  Every value Maya evaluates is a
+#   query, and most gradients need far fewer than a fine grid has.  Evaluating locally costs about the same however
+#   many x values there are, so xValues are evaluated exactly
+def sampleManyAdaptive(valueStrings, xValues, tolerance=1e-4):
+
+    if not usesMaya():
+        return evaluateMany(valueStrings, xValues)
+
+    sampleXValues = [ getSampleXValues(valueString, tolerance) for valueString in valueStrings ]
+    values = evaluateEachInMaya(valueStrings, sampleXValues)
+
+    return np.array([ np.interp(xValues, x, y) for x, y in zip(sampleXValues, values) ]).reshape(
+        (len(valueStrings),) + np.shape(xValues))
+
+# Evaluate a gradient by querying a gradientControlNoAttr loaded with its control points, once for each x value
+def evaluateInMaya(valueString, xValues):
+
+    return evaluateManyInMaya([valueString], xValues)[0]
+
+# Evaluate several gradients at the same x values by querying Maya.  Returns a 2-D array with one row per gradient
+def evaluateManyInMaya(valueStrings, xValues):
+
+    values = evaluateEachInMaya(valueStrings, [ np.ravel(xValues) ] * len(valueStrings))
+    return np.array(values, dtype=float).reshape((len(valueStrings),) + np.shape(xValues))
+
+# Evaluate each gradient at its own x values by querying Maya, with one hidden control for all of them.
+#   Maya's UI can only be used from the main thread, so from any other thread this waits for the main thread to do it.
+#   Returns a list of arrays, one per gradient
+def evaluateEachInMaya(valueStrings, xValuesList):
+
+    def query():
+
+        import maya.cmds as cmds
+        with MayaGradientControl() as control:
+            values = []
+            for valueString, xValues in zip(valueStrings, xValuesList):
+                control.load(valueString)
+                values.append(np.array([ cmds.gradientControlNoAttr(control.name, q=True, vap=float(x))
+                                         for x in xValues ], dtype=float))
+
+        return values
+
+    if threading.current_thread() is threading.main_thread():
+        return query()
+
+    import maya.utils
+    return maya.utils.executeInMainThreadWithResult(query)
+
+# A gradientControlNoAttr in a hidden window, to load value strings into and query.  The window and the optionVars
+#   the control points are loaded from are deleted when it's closed.  Use it as a context manager:
+#       with MayaGradientControl() as control:
+#           control.load(valueString)
+#           cmds.gradientControlNoAttr(control.name, q=True, vap=.5)
+class MayaGradientControl:
+
+    def __init__(self):
+
+        self.window = None
+        self.name = None
+        self.optionVarIndex = 0
+
+    def __enter__(self):
+
+        import maya.cmds as cmds
+
+        # Creating the window changes the parent of new controls, so it's put back for the caller's UI
+        parent = cmds.setParent(q=True)
+        self.window = cmds.window(visible=False)
+        cmds.columnLayout()
+        self.name = cmds.gradientControlNoAttr()
+        if parent:
+            cmds.setParent(parent)
+
+        return self
+
+    def __exit__(self, *_):
+
+        import maya.cmds as cmds
+
+        cmds.deleteUI(self.window)
+        for i in range(2):
+            cmds.optionVar(remove=MAYA_OPTION_VAR_PREFIX + str(i))
+
+    def load(self, valueString):
+
+        import maya.cmds as cmds
+        import maya.mel as mel
+
+        # Like Gradient.setOptionVar() in widget.py, the control only reloads its points from a different optionVar
+        # than the one it has
+        self.optionVarIndex = 1 - self.optionVarIndex
+        ovName = MAYA_OPTION_VAR_PREFIX + str(self.optionVarIndex)
+
+        values = [ v.strip() for v in valueString.split(",") if v.strip() != "" ]
+        points = [ ",".join(values[i:i + 3]) for i in range(0, len(values), 3) ]
+
+        command = 'optionVar -stringValue "' + ovName + '" "' + points[0] + '"'
+        for point in points[1:]:
+            command += ' -stringValueAppend "' + ovName + '" "' + point + '"'
+        mel.eval(command + ";")
+
+        cmds.gradientControlNoAttr(self.name, e=True, optionVar=ovName)
+
+# Returns numGradients random gradient value strings with 1 to maxPoints control points of every interpolation type,
+#   for testing and benchmarks
+def getRandomValueStrings(numGradients, seed=0, maxPoints=11):
+
+    rng = np.random.default_rng(seed)
+    valueStrings = []
+    for _ in range(numGradients):
+
+        numPoints = int(rng.integers(1, maxPoints + 1))
+        points = zip(rng.random(numPoints).tolist(), rng.random(numPoints).tolist(),
+                     rng.integers(0, 4, numPoints).tolist())
+        valueStrings.append(",".join([ str(y) + "," + str(x) + "," + str(i) for y, x, i in points ]))
+
+    return valueStrings
+
+# Record the values Maya gives the gradients at xValues to a JSON file, for checkSamples() to check the local
+#   evaluation against.  Must be run in an interactive Maya session.  By default, 200 random gradients (see
+#   getRandomValueStrings()) are recorded at 201 evenly spaced x values, including both ends
+def recordSamples(path, valueStrings=None, xValues=None):
+
+    if valueStrings is None:
+        valueStrings = getRandomValueStrings(200)
+    if xValues is None:
+        xValues = getUniformXValues(200)
+
+    xValues = [ float(x) for x in xValues ]
+    values = evaluateManyInMaya(valueStrings, xValues).tolist()
+    samples = [ [valueString, xValues, gradientValues] for valueString, gradientValues in zip(valueStrings, values) ]
+
+    with open(path, "w") as samplesFile:
+        json.dump({ "samples": samples }, samplesFile)
+
+# Compare the local evaluation with samples recorded by recordSamples().  Prints and returns the largest difference,
+#   and the number of gradients with a difference larger than tolerance
+def checkSamples(path, tolerance=TOLERANCE):
+
+    with open(path, "r") as samplesFile:
+        samples = json.load(samplesFile)["samples"]
+
+    maxError = 0.
+    numFailed = 0
+    for valueString, xValues, mayaValues in samples:
+
+        error = float(np.max(np.abs(evaluate(valueString, xValues) - np.asarray(mayaValues, dtype=float))))
+        maxError = max(maxError, error)
+        if error > tolerance:
+            numFailed += 1
+            print("WARNING:  GRADIENT DIFFERS FROM MAYA BY " + str(error) + " - " + valueString)
+
+    print(str(len(samples)) + " gradients checked, largest difference " + str(maxError) + ", " + str(numFailed) +
+          " above " + str(tolerance))
+
+    return maxError, numFailed
@@ -0,0 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+from . import fitting
+
+# Running a command with many presets without a GUI, i.e. to regenerate assets from mayapy.
+# Each preset is run with CmdUI.runPreset(), which gets the flags' values from the preset rather than from widgets,
+#   so no controls are created.  The presets are spread across a pool of worker processes, each with its own
+#   Maya session.  Like the fitting processes, the workers are spawned and run mayapy (see fitting.getSpawnContext())
+#
+# The CmdUI is built in each worker by cmdUIFactory, a function taking no arguments that returns it.  It must be
+#   defined at the top level of a module the workers can import, since it's sent to them by reference. i.e.
+#       def makeCurveCmdUI():
+#           return cmdui.CmdUI("curve", scriptsPath, settingsPath, [...], writeCallerFile=False)
+#
+#       results = headless.runPresets(makeCurveCmdUI, ["presetA.txt", "presetB.txt"])
+
+# The CmdUI built by the worker process this is running in
+workerCmdUI = None
+
+# Start Maya in the worker process.  Does nothing if there's no maya.standalone, i.e. when maya.cmds is a stand-in
+def initializeStandalone():
+
+    try:
+        import maya.standalone
+    except ImportError:
+        return
+
+    maya.standalone.initialize(name="python")
+
+def initializeWorker(cmdUIFactory, initializer):
+
+    global workerCmdUI
+
+    if initializer is not None:
+        initializer()
+
+    workerCmdUI = cmdUIFactory()
+
+def runPresetInWorker(source):
+
+    return workerCmdUI.runPreset(source)
+
+# Run the command once for each preset and return the results in the same order.  Presets can be given as anything
+#   CmdUI.resolveParamVals() accepts that can be sent to another process: file names, paths or dictionaries.
+# A preset that fails doesn't stop the others; its result is the exception raised.
+# maxWorkers is the number of worker processes (by default, the number of CPUs).  If it's 0, the presets are run
+#   one after another in this process, with the Maya session that's already running.
+# initializer is called in each worker before the CmdUI is built.  Pass None when maya.cmds is a stand-in
+def runPresets(cmdUIFactory, presetSources, maxWorkers=None, initializer=initializeStandalone):
+
+    if maxWorkers == 0:
+
+        cmdUI = cmdUIFactory()
+        return [ runPreset(cmdUI.runPreset, source) for source in presetSources ]
+
+    with ProcessPoolExecutor(max_workers=maxWorkers, mp_context=fitting.getSpawnContext(),
+                             initializer=initializeWorker, initargs=(cmdUIFactory, initializer)) as executor:
+
+        futures = [ executor.submit(runPresetInWorker, source) for source in presetSources ]
+        return [ getResult(future, source) for future, source in zip(futures, presetSources) ]
+
+def runPreset(function, source):
+
+    try:
+        return function(source)
+    except Exception as error:
+        print("WARNING:  PRESET FAILED - " + str(source) + ": " + repr(error))
+        return error
+
+def getResult(future, source):
+
+    return runPreset(lambda _: future.result(), source)
@@ -0,0 +1,179 @@
+import time
+import numpy as np
+
+# Piecewise linear lookup tables for gradients, as an alternative to fitting them to polynomials.
+# A table is a list of x positions over [0, range] with the curve's value at each one, and the integral of the curve
+#   from 0 to each one.  Between positions the curve is linear, so evaluating it or integrating it up to any x only
+#   needs the position before x: in a uniform table that's found with one division, so both are O(1).
+# The values have the clipping the polynomials' limit intersections and min curves describe already applied: they're
+#   the running minimum of the curve, clipped at the limit.  So the integrals are already the clipped areas.
+#   UNIFORM - tableSize positions evenly spread over [0, range]
+#   ADAPTIVE - positions placed from the gradient's control points by gradient.getSampleXValues(), so the linear
+#       interpolation is within tolerance of the gradient itself, and flat and straight parts take few entries.  The
+#       points where the clipping starts are added, so it's exact.  Positions are found with a binary search
+
+POLYNOMIAL = "polynomial"
+UNIFORM = "uniform"
+ADAPTIVE = "adaptive"
+REPRESENTATIONS = (POLYNOMIAL, UNIFORM, ADAPTIVE)
+
+# Apply the running minimum and the limit to the samples of each curve (one per row)
+def clipCurves(yValues, limit=1.):
+
+    return np.minimum(np.minimum.accumulate(yValues, axis=1), limit)
+
+# The integral from the first x to each x of each piecewise linear curve.  xValues has one row per curve, or is
+#   shared by all of them
+def getCumulativeIntegrals(xValues, yValues):
+
+    xValues = np.broadcast_to(xValues, yValues.shape)
+    integrals = np.zeros(yValues.shape)
+    integrals[:, 1:] = np.cumsum(.5 * (yValues[:, 1:] + yValues[:, :-1]) * np.diff(xValues, axis=1), axis=1)
+
+    return integrals
+
+# Apply the running minimum and the limit to the piecewise linear curve through the samples.  Where a segment drops
+#   below the minimum so far part way along, the point it crosses it at is added, so the clipped curve is exactly
+#   the running minimum of the linear interpolation rather than of the samples.  Points inside runs at the same value
+#   are dropped.  Returns the new x and y arrays
+def clipPiecewiseLinear(xValues, yValues, limit=1.):
+
+    clipped = np.minimum(np.minimum.accumulate(yValues), limit)
+
+    # Segments that start above the minimum so far and end below it cross it
+    held = clipped[:-1]
+    crossings = np.nonzero((yValues[:-1] > held) & (yValues[1:] < held))[0]
+    t = (yValues[crossings] - held[crossings]) / (yValues[crossings] - yValues[crossings + 1])
+
+    xValues = np.insert(xValues, crossings + 1, xValues[crossings] + t * (xValues[crossings + 1] - xValues[crossings]))
+    yValues = np.insert(clipped, crossings + 1, held[crossings])
+
+    keep = np.ones(len(yValues), dtype=bool)
+    keep[1:-1] = (yValues[1:-1] != yValues[:-2]) | (yValues[1:-1] != yValues[2:])
+
+    return xValues[keep], yValues[keep]
+
+# Build a uniform table for each gradient.  yValues has one row of samples per gradient, taken at xGrid (evenly spread
+#   over [0, 1], including both ends).  Returns a list of (x positions, values, integrals) arrays, one per gradient
+def buildTables(yValues, xGrid, rangeValues, limit=1., clip=True):
+
+    yValues = np.atleast_2d(np.asarray(yValues, dtype=float))
+    if clip:
+        yValues = clipCurves(yValues, limit)
+
+    xValues = np.outer(rangeValues, xGrid)
+    integrals = getCumulativeIntegrals(xValues, yValues)
+
+    return list(zip(xValues, yValues, integrals))
+
+# Build an adaptive table from a gradient's samples at xValues over [0, 1], i.e. from gradient.getSampleXValues().
+#   Returns its (x positions, values, integrals) arrays
+def buildTable(xValues, yValues, rangeValue, limit=1., clip=True):
+
+    xValues = np.asarray(xValues, dtype=float) * rangeValue
+    yValues = np.asarray(yValues, dtype=float)
+    if clip:
+        xValues, yValues = clipPiecewiseLinear(xValues, yValues, limit)
+
+    return xValues, yValues, getCumulativeIntegrals(xValues, yValues[np.newaxis])[0]
+
+# Evaluates and integrates a table built by buildTables() or buildTable(), i.e. from the three parts of a gradient's value in
+#   one of the numeric output formats (see encoding.decodeParts()).  uniform says whether the positions are evenly
+#   spaced, so they can be found in O(1)
+class LookupTable:
+
+    def __init__(self, xValues, yValues, integrals, uniform=True):
+
+        self.xValues = np.asarray(xValues, dtype=float)
+        self.yValues = np.asarray(yValues, dtype=float)
+        self.integrals = np.asarray(integrals, dtype=float)
+        self.uniform = uniform
+        self.step = self.xValues[1] - self.xValues[0] if len(self.xValues) > 1 else 1.
+
+    # Index of the segment each x is in
+    def getSegments(self, x):
+
+        if self.uniform:
+            segments = np.floor((x - self.xValues[0]) / self.step).astype(int)
+        else:
+            segments = np.searchsorted(self.xValues, x, side="right") - 1
+
+        return np.clip(segments, 0, max(len(self.xValues) - 2, 0))
+
+    def evaluate(self, x):
+
+        x = np.clip(np.asarray(x, dtype=float), self.xValues[0], self.xValues[-1])
+        if len(self.xValues) == 1:
+            return np.full(x.shape, self.yValues[0])
+
+        i = self.getSegments(x)
+        t = (x - self.xValues[i]) / (self.xValues[i + 1] - self.xValues[i])
+        return self.yValues[i] + t * (self.yValues[i + 1] - self.yValues[i])
+
+    # The integral of the curve from the first position to x
+    def integrate(self, x):
+
+        x = np.clip(np.asarray(x, dtype=float), self.xValues[0], self.xValues[-1])
+        if len(self.xValues) == 1:
+            return np.zeros(x.shape)
+
+        i = self.getSegments(x)
+        return self.integrals[i] + .5 * (self.yValues[i] + self.evaluate(x)) * (x - self.xValues[i])
+
+# Compare the accuracy, size and evaluation speed of the tables with the polynomial fits, for numGradients random
+#   gradients.  Accuracy is the mean and largest difference from the gradient (unclipped, so the polynomials can be
+#   compared) over a dense grid.  Steep segments between close control points dominate the largest differences.
+#   Returns a list of (representation, setting, floats per gradient, mean error, max error, seconds per million
+#   evaluations) and prints it
+def benchmarkTables(numGradients=256, tableSizes=(26, 51, 101, 201), tolerances=(1e-2, 1e-3, 1e-4), seed=0):
+
+    from . import fitting
+    from . import gradient as gr
+
+    rng = np.random.default_rng(seed)
+    valueStrings = []
+    for _ in range(numGradients):
+        numPoints = rng.integers(2, 12)
+        points = zip(rng.random(numPoints), np.sort(rng.random(numPoints)), rng.integers(1, 4, numPoints))
+        valueStrings.append(",".join([ str(y) + "," + str(x) + "," + str(i) for y, x, i in points ]))
+
+    denseX = np.linspace(0., 1., 2001)
+    exact = gr.evaluateMany(valueStrings, denseX)
+    queries = rng.random(100000)
+
+    def timeEvaluation(evaluate):
+
+        start = time.perf_counter()
+        evaluate(queries)
+        return (time.perf_counter() - start) * 10.
+
+    results = []
+    xGrid = np.linspace(0., 1., 101)
+    samples = gr.evaluateMany(valueStrings, xGrid)
+    degrees = [ max(len(valueString.split(",")) // 3, 8) for valueString in valueStrings ]
+    coefficients = fitting.defaultFitter.fitEach(samples, degrees, 1.)
+    polyErrors = np.abs(np.array([ np.polyval(c, denseX) for c in coefficients ]) - exact)
+    results.append((POLYNOMIAL, "degree >= 8", np.mean([ len(c) for c in coefficients ]), np.mean(polyErrors),
+                    np.max(polyErrors), timeEvaluation(lambda x: np.polyval(coefficients[0], x))))
+
+    settings = [ (UNIFORM, size) for size in tableSizes ] + [ (ADAPTIVE, tolerance) for tolerance in tolerances ]
+    for representation, setting in settings:
+
+        if representation == UNIFORM:
+            xGrid = np.linspace(0., 1., setting)
+            tables = buildTables(gr.evaluateMany(valueStrings, xGrid), xGrid, np.ones(numGradients), clip=False)
+        else:
+            sampleXValues = [ gr.getSampleXValues(valueString, setting) for valueString in valueStrings ]
+            tables = [ buildTable(x, gr.evaluate(valueString, x), 1., clip=False)
+                       for valueString, x in zip(valueStrings, sampleXValues) ]
+
+        lookupTables = [ LookupTable(x, y, integral, representation == UNIFORM) for x, y, integral in tables ]
+
+        errors = np.abs(np.array([ table.evaluate(denseX) for table in lookupTables ]) - exact)
+        results.append((representation, setting, 3 * np.mean([ len(x) for x, _, _ in tables ]), np.mean(errors),
+                        np.max(errors), timeEvaluation(lookupTables[0].evaluate)))
+
+    for result in results:
+        print("%-10s %-12s %8.1f floats  mean error %.2e  max error %.2e  %.3fs per million evaluations" % result)
+
+    return results
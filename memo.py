@@ -0,0 +1,99 @@
+import hashlib
+import json
+import maya.cmds as cmds
+from collections import OrderedDict
+
+# Memoization of command calls, for expensive commands that always give the same result for the same values.
+# Results are kept by a fingerprint of the values the command is called with, and the least recently used are evicted
+#   once there are more than maxEntries.
+# Commands usually return the names of the nodes they created.  A cached result whose nodes were deleted since is
+#   stale, and the command is called again.  Otherwise, the cached nodes are returned as they are, or if duplicate is
+#   True, duplicated, so every call gives new nodes like the command would.
+# See CmdUI.enableMemo()
+class CommandCache:
+
+    def __init__(self, maxEntries=128, duplicate=False):
+
+        self.maxEntries = maxEntries
+        self.duplicate = duplicate
+        self.entries = OrderedDict() # fingerprint -> result
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+
+    # Returns the command's result for values, calling function(values) only if it isn't cached.  fingerprint can be
+    # given if it's already known
+    def call(self, function, values, fingerprint=None):
+
+        if fingerprint is None:
+            fingerprint = getFingerprint(values)
+
+        if fingerprint in self.entries:
+
+            result = self.entries[fingerprint]
+            nodes = getNodeNames(result)
+
+            if nodes is None or all([ cmds.objExists(node) for node in nodes ]):
+                self.hits += 1
+                self.entries.move_to_end(fingerprint)
+                return self.copyResult(result, nodes)
+
+            self.stale += 1
+            del self.entries[fingerprint]
+
+        self.misses += 1
+        result = function(values)
+        self.entries[fingerprint] = result
+
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+        return result
+
+    def copyResult(self, result, nodes):
+
+        if not self.duplicate or nodes is None:
+            return result
+
+        duplicates = cmds.duplicate(nodes)
+        return duplicates[0] if isinstance(result, str) else duplicates
+
+    def clear(self):
+
+        self.entries.clear()
+
+    def getStats(self):
+
+        calls = self.hits + self.misses
+        return { "hits": self.hits, "misses": self.misses, "evictions": self.evictions, "stale": self.stale,
+                 "hitRate": self.hits / calls if calls else 0., "entries": len(self.entries),
+                 "maxEntries": self.maxEntries }
+
+# Returns a hash of the values a command is called with.  Values are normalized first, so NumPy arrays and numbers
+#   hash the same as the Python lists and numbers they hold, and tuples the same as lists.  Floats are written
+#   exactly, so any difference in a value (i.e. in a gradient's coefficients) gives a different fingerprint
+def getFingerprint(values):
+
+    text = json.dumps(values, separators=(",", ":"), default=normalizeValue)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def normalizeValue(value):
+
+    if hasattr(value, "tolist"):
+        return value.tolist()
+
+    return str(value)
+
+# Returns the names of the nodes a command's result is made of, or None if it isn't node names
+def getNodeNames(result):
+
+    if isinstance(result, str):
+        return [result]
+
+    if isinstance(result, (list, tuple)) and result and all([ isinstance(r, str) for r in result ]):
+        return list(result)
+
+    return None
@@ -0,0 +1,390 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Reading and writing of preset (settings) files.
+# A preset file starts with a header line identifying the format and its version, followed by a JSON index line
+#   mapping each setting name to the byte offset of its entry.  Each entry after that is a JSON [settingName, value]
+#   line. i.e.
+#       #CMDUI_PRESET 1
+#       {"d": 0, "p00": 14, ...}
+#       ["d", "3.0"]
+#       ["p00", "0.0"]
+# The index lets each widget's value be looked up by name, so adding, removing or reordering flags doesn't shift
+#   the values of the flags after them, and only the flags that are instantiated are read.
+# Legacy presets, where each line is 'value?settingName?' and values are read in order, are converted when loaded.
+
+MAGIC = "#CMDUI_PRESET"
+VERSION = 1
+
+# Collects the values written by Flag.writeSettings() and saves them as an indexed preset file
+class PresetWriter:
+
+    def __init__(self):
+
+        self.entries = []
+
+    def writeVal(self, settingName, value):
+
+        self.entries.append((settingName, str(value)))
+
+    def save(self, path):
+
+        lines = []
+        offset = 0
+        index = {}
+        for settingName, value in self.entries:
+
+            if settingName in index:
+                print("WARNING:  DUPLICATE SETTING NAME WRITTEN - " + settingName)
+                continue
+
+            index[settingName] = offset
+            lines.append((json.dumps([settingName, value]) + "\n").encode("utf-8"))
+            offset += len(lines[-1])
+
+        with open(path, "wb") as presetFile:
+            presetFile.write((MAGIC + " " + str(VERSION) + "\n").encode("utf-8"))
+            presetFile.write((json.dumps(index) + "\n").encode("utf-8"))
+            presetFile.write(b"".join(lines))
+
+# Where Flag.loadSettings() gets the values of a preset from.  Widgets look up their values with readVal(), and
+#   only set them if needsEdit() says so
+class PresetSource:
+
+    def readVal(self, settingName):
+
+        return None
+
+    def needsEdit(self, widget, value):
+
+        return True
+
+# Looks up the values of a preset file by setting name for Flag.loadSettings().
+# Only the index is read when the file is opened; each value is read from its offset when it's asked for.
+# Legacy presets are converted in memory when opened.
+class PresetReader(PresetSource):
+
+    def __init__(self, path):
+
+        self.path = path
+        self.presetFile = open(path, "rb")
+        self.legacyValues = None
+
+        header = self.presetFile.readline().decode("utf-8").split()
+        if len(header) == 2 and header[0] == MAGIC:
+
+            if int(header[1]) > VERSION:
+                print("WARNING:  " + os.path.basename(path) + " was saved by a newer version of the preset format")
+
+            self.index = json.loads(self.presetFile.readline().decode("utf-8"))
+            self.bodyOffset = self.presetFile.tell()
+
+        else:
+
+            self.presetFile.seek(0)
+            self.legacyValues = readLegacyValues(self.presetFile.read().decode("utf-8"))
+            self.index = self.legacyValues
+            self.presetFile.close()
+
+    # Returns the value saved for settingName as a string, or None if the preset doesn't have one
+    def readVal(self, settingName):
+
+        if settingName not in self.index:
+            return None
+
+        if self.legacyValues is not None:
+            return self.legacyValues[settingName]
+
+        self.presetFile.seek(self.bodyOffset + self.index[settingName])
+        savedName, value = json.loads(self.presetFile.readline().decode("utf-8"))
+        if savedName != settingName:
+            print("WARNING:  WRONG VALUE READ - " + savedName)
+            return None
+
+        return value
+
+    def getSettingNames(self):
+
+        return list(self.index)
+
+    # Read every value in the preset.  Returns a PresetValues object, which can be loaded in place of this reader
+    def readAll(self):
+
+        if self.legacyValues is not None:
+            return PresetValues(self.legacyValues)
+
+        values = {}
+        self.presetFile.seek(self.bodyOffset)
+        for line in self.presetFile:
+            settingName, value = json.loads(line.decode("utf-8"))
+            values[settingName] = value
+
+        return PresetValues(values)
+
+    def isLegacy(self):
+
+        return self.legacyValues is not None
+
+    def close(self):
+
+        self.presetFile.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *_):
+
+        self.close()
+
+# The values of a preset that was read in full, looked up by setting name the same way as with a PresetReader
+class PresetValues(PresetSource):
+
+    def __init__(self, values):
+
+        self.values = values
+
+    def readVal(self, settingName):
+
+        return self.values.get(settingName)
+
+    def getSettingNames(self):
+
+        return list(self.values)
+
+# Wraps another PresetSource so that only the widgets whose values differ from the preset's are set.
+# When switching between similar presets most values are the same, and skipping them avoids their Maya edits,
+#   change commands and dependent toggles.  Counts how many values were set and how many were skipped.
+class DiffLoader(PresetSource):
+
+    def __init__(self, source):
+
+        self.source = source
+        self.edits = 0
+        self.skipped = 0
+
+    def readVal(self, settingName):
+
+        return self.source.readVal(settingName)
+
+    def needsEdit(self, widget, value):
+
+        if widget.valEquals(value):
+            self.skipped += 1
+            return False
+
+        self.edits += 1
+        return True
+
+# Parse the text of a legacy preset into a dictionary of settingName -> value
+def readLegacyValues(text):
+
+    values = {}
+    for line in text.splitlines():
+
+        line = line.split("?")
+        if len(line) < 2:
+            continue
+
+        if line[1] in values:
+            print("WARNING:  DUPLICATE SETTING NAME READ - " + line[1])
+            continue
+
+        values[line[1]] = line[0]
+
+    return values
+
+# Rewrite a legacy preset file in the indexed format.  Returns False if it was already indexed
+def convertLegacyPreset(path):
+
+    with PresetReader(path) as reader:
+
+        if not reader.isLegacy():
+            return False
+
+        writer = PresetWriter()
+        for settingName in reader.getSettingNames():
+            writer.writeVal(settingName, reader.readVal(settingName))
+
+    writer.save(path)
+    return True
+
+# Keeps the names of the preset files in a directory in memory, so checking if a name is taken and listing the
+#   presets don't scan the directory every time.
+# The directory is only rescanned when its modification time changes, or when the last scan is older than maxAge
+#   seconds (in case the file system's modification times are too coarse to notice a change).
+# If cachePath is given, the names are saved there after each scan and loaded at startup, so the directory isn't
+#   scanned again as long as it hasn't changed.  cachePath shouldn't be inside the directory itself, since writing
+#   it would change the directory's modification time.
+class PresetIndex:
+
+    def __init__(self, directory, cachePath=None, extension=".txt", maxAge=30.):
+
+        self.directory = os.path.normpath(os.path.abspath(directory))
+        self.cachePath = cachePath
+        self.extension = extension
+        self.maxAge = maxAge
+
+        self.names = set()
+        self.sortedNames = None
+        self.mtime = None
+        self.scanTime = None
+
+        if cachePath is not None:
+            self.loadCache()
+
+    def getMtime(self):
+
+        return os.stat(self.directory).st_mtime_ns
+
+    # Rescans the directory if it changed since it was last scanned
+    def refresh(self):
+
+        mtime = self.getMtime()
+        if mtime == self.mtime and self.scanTime is not None and time.time() - self.scanTime < self.maxAge:
+            return
+
+        self.names = set([ entry.name for entry in os.scandir(self.directory)
+                           if entry.name.endswith(self.extension) and entry.is_file() ])
+        self.sortedNames = None
+        self.mtime = mtime
+        self.scanTime = time.time()
+
+        if self.cachePath is not None:
+            self.saveCache()
+
+    def contains(self, fileName):
+
+        self.refresh()
+        return fileName in self.names
+
+    # Returns the preset file names in sorted order
+    def getNames(self):
+
+        self.refresh()
+        if self.sortedNames is None:
+            self.sortedNames = sorted(self.names)
+
+        return self.sortedNames
+
+    # Record a preset file that was just written, without rescanning.  This assumes the index was up to date
+    # before the file was written, i.e. contains() was just called
+    def add(self, fileName):
+
+        self.names.add(fileName)
+        self.sortedNames = None
+        self.mtime = self.getMtime()
+
+        if self.cachePath is not None:
+            self.saveCache()
+
+    # Record a preset file that was just removed, without rescanning
+    def remove(self, fileName):
+
+        self.names.discard(fileName)
+        self.sortedNames = None
+        self.mtime = self.getMtime()
+
+        if self.cachePath is not None:
+            self.saveCache()
+
+    def saveCache(self):
+
+        cache = { "directory": self.directory, "mtime": self.mtime, "names": sorted(self.names) }
+        with open(self.cachePath, "w") as cacheFile:
+            json.dump(cache, cacheFile)
+
+    # Load the names saved by saveCache().  They're used as long as the directory hasn't changed since
+    def loadCache(self):
+
+        try:
+            with open(self.cachePath, "r") as cacheFile:
+                cache = json.load(cacheFile)
+        except (OSError, ValueError):
+            return
+
+        if cache.get("directory") != self.directory or cache.get("mtime") != self.getMtime():
+            return
+
+        self.names = set(cache["names"])
+        self.sortedNames = None
+        self.mtime = cache["mtime"]
+        self.scanTime = time.time()
+
+# Reads and parses preset files in background threads, and keeps the parsed values in memory so that loading
+#   a preset only needs the widgets' setVal() calls.
+# Presets are returned as futures of PresetValues objects.  A cached preset is read again if its file was modified
+#   since, and the least recently used presets are evicted once there are more than maxEntries.
+class PresetCache:
+
+    def __init__(self, maxEntries=64, maxWorkers=4):
+
+        self.maxEntries = maxEntries
+        self.maxWorkers = maxWorkers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # path -> (modification time, future)
+
+    # Returns a future of the preset's PresetValues, starting to read it in the background if needed
+    def load(self, path):
+
+        mtime = os.stat(path).st_mtime_ns
+
+        with self.lock:
+
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                self.entries.move_to_end(path)
+                return entry[1]
+
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+
+            future = self.executor.submit(readPresetValues, path)
+            self.entries[path] = (mtime, future)
+
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+        return future
+
+    # Start reading the presets in the background.  Only as many as the cache holds are read
+    def prefetch(self, paths):
+
+        for path in paths[:self.maxEntries]:
+            try:
+                self.load(path)
+            except OSError:
+                pass
+
+    def clear(self):
+
+        with self.lock:
+            self.entries.clear()
+
+    def shutdown(self):
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+# Returns a PresetSource for a preset given as the path of a preset file, a dictionary of settingName -> value, or a
+#   PresetSource
+def getPresetSource(preset):
+
+    if isinstance(preset, PresetSource):
+        return preset
+
+    if isinstance(preset, dict):
+        return PresetValues(dict([ (settingName, str(value)) for settingName, value in preset.items() ]))
+
+    return readPresetValues(preset)
+
+def readPresetValues(path):
+
+    with PresetReader(path) as reader:
+        return reader.readAll()
@@ -0,0 +1,144 @@
+import json
+import os
+import numpy as np
+
+# Parameter sweeps: streams of combinations of flag values, taken from each flag's range, for calling a command
+#   with many variations of its parameters.  See CmdUI.sweep().
+# Every combination is computed from its index, so the cross product is never built, and a sweep can resume from
+#   any point without regenerating the combinations before it.
+#   cartesian - every combination of every value of each axis, in order.  The last axis changes fastest
+#   random - count combinations, each value picked uniformly from its axis
+#   latinHypercube - count combinations, where each axis's range is split into count equal strata, and each
+#       stratum is used by exactly one combination.  This spreads a small number of samples evenly over every axis
+
+CARTESIAN = "cartesian"
+RANDOM = "random"
+LATIN_HYPERCUBE = "latinHypercube"
+MODES = (CARTESIAN, RANDOM, LATIN_HYPERCUBE)
+
+# The values one flag takes in a sweep: minimum to maximum, in increments of step
+class SweepAxis:
+
+    def __init__(self, shortName, minimum, maximum, step, isInt=False):
+
+        self.shortName = shortName
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.isInt = isInt
+
+        # A small tolerance keeps the maximum when the range is a whole number of steps in floating point
+        self.numValues = int(np.floor((maximum - minimum) / step + 1e-9)) + 1
+
+    def getValue(self, index):
+
+        value = min(self.minimum + index * self.step, self.maximum)
+        return int(round(value)) if self.isInt else float(value)
+
+    # The value at u, in [0, 1), of the way along the axis
+    def getSample(self, u):
+
+        return self.getValue(min(int(u * self.numValues), self.numValues - 1))
+
+    def getSettings(self):
+
+        return [self.shortName, self.minimum, self.maximum, self.step, self.isInt]
+
+class Sweep:
+
+    # axes: (list) SweepAxis objects
+    # mode: (string) one of MODES
+    # count: (int) the number of combinations.  Required for random and latinHypercube sweeps.  A cartesian sweep
+    #   stops after count combinations if it's given
+    # seed: (int) the seed for random and latinHypercube sweeps.  One is picked if it isn't given, and kept in
+    #   getSettings() so the same combinations can be generated again.  Cartesian sweeps don't use it
+    def __init__(self, axes, mode=CARTESIAN, count=None, seed=None):
+
+        if mode not in MODES:
+            raise ValueError("sweep mode must be one of " + ", ".join(MODES) + ": " + str(mode))
+
+        total = 1
+        for axis in axes:
+            total *= axis.numValues
+
+        if mode == CARTESIAN:
+            count = total if count is None else min(count, total)
+        elif count is None:
+            raise ValueError("a " + mode + " sweep needs a count")
+
+        self.axes = axes
+        self.mode = mode
+        self.count = count
+        self.seed = seed
+        if self.seed is None and mode != CARTESIAN:
+            self.seed = int(np.random.SeedSequence().entropy % (2 ** 63))
+
+        # The permutation of strata for each axis of a latinHypercube sweep, created the first time it's needed
+        self.strata = None
+
+    def __len__(self):
+
+        return self.count
+
+    # Everything that determines the combinations, to tell whether a checkpoint belongs to this sweep
+    def getSettings(self):
+
+        return { "mode": self.mode, "count": self.count, "seed": self.seed,
+                 "axes": [ axis.getSettings() for axis in self.axes ] }
+
+    # Returns the values of the combination at index, one per axis
+    def getCombination(self, index):
+
+        if self.mode == CARTESIAN:
+
+            combination = []
+            for axis in reversed(self.axes):
+                index, valueIndex = divmod(index, axis.numValues)
+                combination.append(axis.getValue(valueIndex))
+
+            return combination[::-1]
+
+        # Each combination has its own random numbers, so any one can be generated without the ones before it
+        u = np.random.default_rng([self.seed, index]).random(len(self.axes))
+
+        if self.mode == LATIN_HYPERCUBE:
+
+            if self.strata is None:
+                rng = np.random.default_rng([self.seed, self.count])
+                self.strata = np.array([ rng.permutation(self.count) for _ in self.axes ])
+
+            u = (self.strata[:, index] + u) / self.count
+
+        return [ axis.getSample(ui) for axis, ui in zip(self.axes, u.tolist()) ]
+
+    # Yields each combination from start on, as a dictionary of shortName -> value
+    def iterate(self, start=0):
+
+        for index in range(start, self.count):
+            yield dict(zip([ axis.shortName for axis in self.axes ], self.getCombination(index)))
+
+# Returns how many combinations of the sweep the checkpoint at path says were done, or 0 if there isn't one, or it
+#   was saved for a different sweep
+def loadCheckpoint(path, settings):
+
+    try:
+        with open(path, "r") as checkpointFile:
+            checkpoint = json.load(checkpointFile)
+    except (OSError, ValueError):
+        return 0
+
+    if checkpoint.get("settings") != settings:
+        print("WARNING:  CHECKPOINT IS FOR A DIFFERENT SWEEP, STARTING OVER - " + path)
+        return 0
+
+    return checkpoint["done"]
+
+# Save the number of combinations done.  The file is replaced all at once, so a sweep that's interrupted while
+#   saving still has the previous checkpoint
+def saveCheckpoint(path, settings, done):
+
+    tempPath = path + "." + str(os.getpid()) + ".tmp"
+    with open(tempPath, "w") as checkpointFile:
+        json.dump({ "settings": settings, "done": done }, checkpointFile)
+
+    os.replace(tempPath, path)
@@ -0,0 +1,46 @@
+import importlib.util
+import os
+import sys
+import pytest
+
+import standin
+
+# The tests import the modules as the Command_UI package, whatever the directory they're in is called
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+try:
+    import maya.cmds
+except ImportError:
+    standin.install(standin.MayaStandIn())
+
+if "Command_UI" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("Command_UI", os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    sys.modules["Command_UI"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules["Command_UI"])
+
+from Command_UI import benchmarks, cmdui, flag, gradient, memo, widget
+
+# A fresh Maya stand-in for the modules to make their UI calls to, also used under mayapy, which has no UI.
+# Gradients are evaluated locally, since the stand-in can't evaluate them
+@pytest.fixture
+def maya(monkeypatch):
+
+    standIn = standin.MayaStandIn()
+    for module in (benchmarks, cmdui, flag, memo, widget):
+        monkeypatch.setattr(module, "cmds", standIn.cmds)
+
+    monkeypatch.setattr(widget, "mel", standIn.mel)
+
+    # gradient.py imports maya.cmds where it's used
+    for name in ("cmds", "mel", "utils"):
+        monkeypatch.setattr(sys.modules["maya"], name, getattr(standIn, name))
+        monkeypatch.setitem(sys.modules, "maya." + name, getattr(standIn, name))
+
+    monkeypatch.setattr(gradient, "evaluator", gradient.LOCAL)
+    monkeypatch.setattr(widget.Widget, "valueStore", None)
+    monkeypatch.setattr(widget.UIBatch, "current", None)
+    monkeypatch.setattr(widget.Gradient, "activeOptionVars", set())
+
+    return standIn
@@ -0,0 +1,201 @@
+import re
+import shlex
+import sys
+import types
+
+import numpy as np
+
+# A stand-in for maya.cmds, maya.mel and maya.utils, for testing the modules without Maya.
+# Controls are kept as dictionaries of their flags, created, queried and edited the way the widgets use them.  Every
+#   call is recorded in calls, as (command, "create" / "query" / "edit" / "call"), so tests can count Maya round trips.
+# MEL's conversion of floats to strings isn't exact, which the stand-in shows by keeping 6 significant digits when
+#   a float is returned through mel.eval() in a string[]
+
+DEFAULTS = {
+    "intField": 0, "floatField": 0., "textField": "", "checkBox": False, "intSliderGrp": 0,
+    "gradientControlNoAttr": ".5,0.,3" }
+
+CONTROLS = tuple(DEFAULTS) + ("window", "columnLayout", "rowColumnLayout", "popupMenu", "menuItem")
+
+class MayaStandIn:
+
+    def __init__(self):
+
+        self.controls = {} # name -> (command, {flag: value})
+        self.parents = {} # name -> the window or layout it was created in
+        self.parent = None
+        self.optionVars = {} # name -> list of strings
+        self.calls = []
+        self.numControls = 0
+
+        self.cmds = Commands(self)
+        self.mel = types.SimpleNamespace(eval=self.evalMel)
+        self.utils = types.SimpleNamespace(executeDeferred=lambda function, *args: function(*args),
+                                           executeInMainThreadWithResult=lambda function, *args: function(*args))
+
+    def countCalls(self, kind=None):
+
+        return len([ call for call in self.calls if kind is None or call[1] == kind ])
+
+    def getValue(self, name, flag):
+
+        command, flags = self.controls[name]
+        if flag in ("v", "asString"):
+            return flags.get("v", DEFAULTS.get(command))
+
+        return flags.get(flag, True if flag == "en" else None)
+
+    def control(self, command, *args, **flags):
+
+        query = flags.pop("q", False) or flags.pop("query", False)
+        edit = flags.pop("e", False) or flags.pop("edit", False)
+
+        if flags.get("exists"):
+            return bool(args) and args[0] in self.controls
+
+        if args and args[0] in self.controls:
+
+            if query:
+                self.calls.append((command, "query"))
+                if "vap" in flags:
+                    return self.getGradientValue(args[0], flags["vap"])
+                return self.getValue(args[0], list(flags)[0])
+
+            if edit:
+                self.calls.append((command, "edit"))
+                if "optionVar" in flags:
+                    flags["v"] = ",".join(self.optionVars[flags.pop("optionVar")])
+                self.controls[args[0]][1].update(flags)
+                return None
+
+        # Anything else that isn't a control, i.e. refresh or scriptJob, is only recorded
+        if command not in CONTROLS or query or edit:
+            self.calls.append((command, "call"))
+            return None
+
+        self.calls.append((command, "create"))
+        self.numControls += 1
+        name = command + str(self.numControls)
+        self.controls[name] = (command, dict([ (f, v) for f, v in flags.items() if f in ("v", "en") ]))
+        self.parents[name] = self.parent
+        if command in ("window", "columnLayout", "rowColumnLayout"):
+            self.parent = name
+
+        return name
+
+    def setParent(self, *args, **flags):
+
+        self.calls.append(("setParent", "query" if flags.get("q") else "edit"))
+        if flags.get("q"):
+            return self.parent
+
+        self.parent = args[0]
+        return None
+
+    # Gradients are evaluated as linear between their points, which is enough to test the code querying them
+    def getGradientValue(self, name, x):
+
+        values = [ float(v) for v in self.getValue(name, "v").split(",") ]
+        points = sorted(zip(values[1::3], values[0::3]))
+        return float(np.interp(x, [ p[0] for p in points ], [ p[1] for p in points ]))
+
+    # Deletes the controls and everything in them
+    def deleteUI(self, *names):
+
+        self.calls.append(("deleteUI", "call"))
+        for name in names:
+            for child in [ c for c, parent in self.parents.items() if parent == name ]:
+                self.deleteUI(child)
+            self.controls.pop(name, None)
+            self.parents.pop(name, None)
+            if self.parent == name:
+                self.parent = None
+
+    def optionVar(self, **flags):
+
+        self.calls.append(("optionVar", "edit"))
+
+        if "stringValue" in flags:
+            self.optionVars[flags["stringValue"][0]] = [flags["stringValue"][1]]
+        if "stringValueAppend" in flags:
+            self.optionVars[flags["stringValueAppend"][0]].append(flags["stringValueAppend"][1])
+        if "remove" in flags:
+            self.optionVars.pop(flags["remove"], None)
+        if "exists" in flags:
+            return flags["exists"] in self.optionVars
+        if flags.get("list"):
+            return list(self.optionVars)
+
+        return None
+
+    def evalMel(self, command):
+
+        self.calls.append(("mel", "query" if "cmdUIQueryVals" in command else "edit"))
+
+        # Like MEL, a string[] holds floats with 6 significant digits, while a float[] holds them exactly
+        if "cmdUIQueryVals" in command:
+            melType = re.search(r"global proc (\w+)\[\]", command).group(1)
+            values = [ self.getValue(name, "v") for name in re.findall(r'`\w+ -q -\w+ "([^"]+)"`', command) ]
+            if melType == "string":
+                return [ self.formatMel(value) for value in values ]
+
+            return [ (float if melType == "float" else int)(value) for value in values ]
+
+        tokens = shlex.split(command.rstrip(";"))
+        if tokens[0] == "optionVar":
+            for i in range(1, len(tokens), 3):
+                if tokens[i] == "-stringValue":
+                    self.optionVars[tokens[i + 1]] = [tokens[i + 2]]
+                else:
+                    self.optionVars[tokens[i + 1]].append(tokens[i + 2])
+
+        return None
+
+    def formatMel(self, value):
+
+        if isinstance(value, bool):
+            return "1" if value else "0"
+        if isinstance(value, float):
+            return "%.6g" % value
+
+        return str(value)
+
+class Commands:
+
+    def __init__(self, standIn):
+
+        self.standIn = standIn
+
+    def __getattr__(self, command):
+
+        special = { "optionVar": self.standIn.optionVar, "deleteUI": self.standIn.deleteUI,
+                    "setParent": self.standIn.setParent, "error": self.error, "about": self.about,
+                    "objectTypeUI": self.objectTypeUI }
+        if command in special:
+            return special[command]
+
+        function = lambda *args, **flags: self.standIn.control(command, *args, **flags)
+        function.__name__ = command
+        return function
+
+    def error(self, message):
+
+        raise RuntimeError(message)
+
+    # There's no UI to evaluate gradients with, as in mayapy
+    def about(self, **flags):
+
+        return True if flags.get("batch") else ""
+
+    def objectTypeUI(self, name):
+
+        return self.standIn.controls[name][0]
+
+# Make the stand-in importable as maya.cmds, maya.mel and maya.utils, for when there's no Maya to import
+def install(standIn):
+
+    maya = types.ModuleType("maya")
+    maya.cmds = standIn.cmds
+    maya.mel = standIn.mel
+    maya.utils = standIn.utils
+    sys.modules.update({ "maya": maya, "maya.cmds": maya.cmds, "maya.mel": maya.mel, "maya.utils": maya.utils })
@@ -0,0 +1,38 @@
+import array
+import numpy as np
+import pytest
+
+from Command_UI import encoding
+
+TYPES = { encoding.STRING: tuple, encoding.ARRAY: array.array, encoding.NUMPY: np.ndarray, encoding.BYTES: bytes }
+
+# Every format gives back the parts exactly, including empty parts and values that need all of a float64's digits
+@pytest.mark.parametrize("outputFormat", encoding.FORMATS)
+def test_round_trip(outputFormat):
+
+    rng = np.random.default_rng(0)
+    parts = [ rng.normal(size=7) * 10. ** rng.integers(-300, 300, size=7), [], [1. / 3., 0.1, -2.5e-320],
+              [[0., 1.], [2., 3.]] ]
+
+    value = encoding.encodeParts(parts, outputFormat)
+    decoded = encoding.decodeParts(value)
+
+    assert isinstance(value, TYPES[outputFormat])
+    assert len(decoded) == len(parts)
+    for part, decodedPart in zip(parts, decoded):
+        assert decodedPart.dtype == np.float64
+        assert np.array_equal(decodedPart, np.asarray(part, dtype=float).ravel())
+
+# BYTES are a header of 32 bit lengths followed by the values as little endian float64s
+def test_bytes_layout():
+
+    value = encoding.encodeParts([[1. / 3.], [np.pi, np.e]], encoding.BYTES)
+
+    assert len(value) == 4 * 3 + 8 * 3
+    assert value[:12] == b"\x02\x00\x00\x00\x01\x00\x00\x00\x02\x00\x00\x00"
+    assert np.frombuffer(value[12:], dtype="<f8").tolist() == [1. / 3., np.pi, np.e]
+
+def test_unknown_format():
+
+    with pytest.raises(ValueError):
+        encoding.checkFormat("json")
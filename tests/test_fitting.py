@@ -0,0 +1,142 @@
+import multiprocessing.spawn
+import numpy as np
+import os
+import pytest
+
+from Command_UI import fitting
+
+def test_batched_fit_agrees_with_polyfit():
+
+    for _, _, _, coefficientDifference, curveDifference in fitting.benchmarkFitting((10, 100, 1000), repeats=1):
+        assert coefficientDifference < 1e-6
+        assert curveDifference < 1e-6
+
+# Property check of getMinCurves() against the loop based getMinCurvesReference(), on random batches of curves:
+#   random walks, curves with plateaus and repeated values, and evaluated gradients
+def test_min_curves_match_reference():
+
+    from Command_UI import gradient as gr
+
+    rng = np.random.default_rng(0)
+    valueStrings = gr.getRandomValueStrings(200)
+
+    for batch in range(3000):
+
+        numCurves = int(rng.integers(1, 9))
+        numSamples = int(rng.integers(2, 200))
+        xValues = np.sort(rng.random(numSamples)) * rng.uniform(.5, 5.)
+
+        kind = batch % 3
+        if kind == 0:
+            yValues = np.cumsum(rng.normal(0., .1, (numCurves, numSamples)), axis=1)
+        elif kind == 1:
+            yValues = rng.integers(0, 4, (numCurves, numSamples)).astype(float)
+        else:
+            yValues = gr.evaluateMany(rng.choice(valueStrings, numCurves).tolist(), np.linspace(0., 1., numSamples))
+
+        minCurves = fitting.getMinCurves(xValues, yValues)
+
+        assert len(minCurves) == numCurves
+        for points, y in zip(minCurves, yValues):
+            assert np.array_equal(points.ravel(), np.array(fitting.getMinCurvesReference(xValues, y), dtype=float))
+
+# Under Maya's GUI the process backend's workers run mayapy, not Maya
+def test_worker_executable(monkeypatch, tmp_path):
+
+    monkeypatch.delenv("MAYA_LOCATION", raising=False)
+    assert fitting.getWorkerExecutable() == fitting.sys.executable
+
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "bin" / "maya").touch()
+    monkeypatch.setattr(fitting.sys, "executable", str(tmp_path / "bin" / "maya"))
+    with pytest.raises(RuntimeError):
+        fitting.getWorkerExecutable()
+
+    (tmp_path / "bin" / "mayapy").touch()
+    assert fitting.getWorkerExecutable() == str(tmp_path / "bin" / "mayapy")
+
+# The spawn executable is shared by the whole process, so it's only changed when the workers need a different one
+def test_spawn_context_executable(monkeypatch, tmp_path):
+
+    spawnExecutable = os.fsdecode(multiprocessing.spawn.get_executable())
+    setExecutable = []
+    monkeypatch.setattr(multiprocessing.spawn, "set_executable", setExecutable.append)
+    monkeypatch.setattr(fitting.sys, "executable", spawnExecutable)
+
+    assert fitting.getSpawnContext().get_start_method() == "spawn"
+    assert setExecutable == []
+
+    (tmp_path / "bin").mkdir()
+    for fileName in ("maya", "mayapy"):
+        (tmp_path / "bin" / fileName).touch()
+    monkeypatch.setattr(fitting.sys, "executable", str(tmp_path / "bin" / "maya"))
+
+    fitting.getSpawnContext()
+    assert setExecutable == [str(tmp_path / "bin" / "mayapy")]
+
+# The bisection in findRealRoots() finds the same crossings as np.roots, on the polynomials of random fits shifted
+#   down by the limit.  np.roots' roots where the curve doesn't cross zero are left out, since they aren't found
+def test_roots_match_np_roots():
+
+    from Command_UI import gradient as gr
+
+    rng = np.random.default_rng(1)
+    valueStrings = gr.getRandomValueStrings(2000, seed=1)
+    rangeValues = rng.uniform(.5, 5., len(valueStrings))
+    degrees = [ max(len(valueString.split(",")) // 3, 8) for valueString in valueStrings ]
+    yValues = gr.evaluateMany(valueStrings, gr.getUniformXValues(100))
+    shiftedCurves = [ c - np.eye(len(c))[-1] for c in fitting.defaultFitter.fitEach(yValues, degrees, rangeValues) ]
+
+    allRoots = fitting.findRealRoots(shiftedCurves, 0., rangeValues)
+    for curve, rangeValue, roots in zip(shiftedCurves, rangeValues, allRoots):
+
+        expected = np.roots(curve)
+        inRange = (np.abs(expected.imag) < 1e-9) & (expected.real > 0.) & (expected.real < rangeValue)
+        expected = [ root for root in np.sort(expected[inRange].real)
+                     if (np.polyval(curve, root - 1e-7) > 0.) != (np.polyval(curve, root + 1e-7) > 0.) ]
+
+        assert len(roots) == len(expected) and np.allclose(roots, expected, atol=1e-7)
+
+# Roots where the curve only touches zero, or crosses it and back within one bracket, aren't found
+def test_tangent_roots_are_not_found():
+
+    touching = np.polymul([1., -.3], [1., -.3])
+    closePair = np.polymul([1., -.6], [1., -.6001])
+    crossing = np.polymul([1., -.25], [1., -.75])
+
+    roots = fitting.findRealRoots([touching, closePair, crossing], 0., 1.)
+
+    assert len(roots[0]) == 0 and len(roots[1]) == 0
+    assert np.allclose(roots[2], [.25, .75])
+
+# Entries are evicted least recently used first, once the cache is over maxBytes
+def test_fit_cache_evicts_least_recently_used():
+
+    cache = fitting.FitCache()
+    entrySize = cache.getSize(("a", 1., 8)) + cache.getSize(("0.1,0.2", "", "0.,0.,1"))
+    cache.maxBytes = 3 * entrySize
+
+    for name in ("a", "b", "c"):
+        cache.put((name, 1., 8), ("0.1,0.2", "", "0.,0.,1"))
+    assert cache.get(("a", 1., 8)) is not None
+
+    cache.put(("d", 1., 8), ("0.1,0.2", "", "0.,0.,1"))
+
+    assert list(cache.entries) == [("c", 1., 8), ("a", 1., 8), ("d", 1., 8)]
+    assert cache.get(("b", 1., 8)) is None
+    assert cache.numBytes == 3 * entrySize
+
+    stats = cache.getStats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 1, 1, 3)
+    assert stats["hitRate"] == .5
+
+    cache.put(("d", 1., 8), ("0.1,0.2", "", "0.,0.,1"))
+    assert cache.numBytes == 3 * entrySize and cache.getStats()["evictions"] == 1
+
+def test_fit_cache_max_entries():
+
+    cache = fitting.FitCache(maxEntries=2)
+    for i in range(5):
+        cache.put(("g", float(i), 8), ("",))
+
+    assert list(cache.entries) == [("g", 3., 8), ("g", 4., 8)] and cache.evictions == 3
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pytest
+
+from conftest import DATA
+from Command_UI import gradient as gr
+from Command_UI import widget
+
+# Samples in the format gr.recordSamples() writes.  The reference samples are of step and linear gradients, whose
+#   values follow from their control points alone, and are always checked.  Samples recorded in Maya with
+#   gr.recordSamples(path) also cover the smooth and spline segments, and are checked when they're there
+REFERENCE_PATH = os.path.join(DATA, "gradientReferenceSamples.json")
+SAMPLES_PATH = os.path.join(DATA, "gradientSamples.json")
+
+def test_local_evaluation_matches_reference():
+
+    maxError, numFailed = gr.checkSamples(REFERENCE_PATH)
+    assert numFailed == 0 and maxError <= gr.TOLERANCE
+
+@pytest.mark.skipif(not os.path.isfile(SAMPLES_PATH), reason="no samples recorded from Maya, see gr.recordSamples()")
+def test_local_evaluation_matches_maya():
+
+    maxError, numFailed = gr.checkSamples(SAMPLES_PATH)
+    assert numFailed == 0 and maxError <= gr.TOLERANCE
+
+# Evaluating in Maya leaves no windows or optionVars behind
+def test_maya_evaluation_cleans_up(maya, monkeypatch):
+
+    monkeypatch.setattr(gr, "evaluator", gr.MAYA)
+    monkeypatch.setattr(gr, "mayaHasUI", True)
+    valueStrings = [ ".2,0.,1,.8,1.,1", "1.,.25,1,0.,.75,1" ]
+
+    values = gr.sampleMany(valueStrings, gr.getUniformXValues(10))
+
+    assert np.allclose(values, gr.evaluateMany(valueStrings, gr.getUniformXValues(10)))
+    assert maya.controls == {} and maya.optionVars == {}
+
+    maya.optionVars[gr.MAYA_OPTION_VAR_PREFIX + "0"] = ["1,0,1"]
+    assert widget.removeStaleGradientOptionVars() == 1
+
+# Gradients evaluated in Maya are only queried where their control points need it, and interpolated onto the grid
+def test_adaptive_sampling_queries_less(maya, monkeypatch):
+
+    monkeypatch.setattr(gr, "evaluator", gr.MAYA)
+    monkeypatch.setattr(gr, "mayaHasUI", True)
+    valueStrings = [ ".2,0.,1,.8,1.,1", "1.,.25,0,0.,.75,1", ".1,.2,2,.9,.6,3,.5,.9,1" ]
+    xValues = gr.getUniformXValues(100)
+
+    def countQueries(sampler, *args):
+
+        del maya.calls[:]
+        values = sampler(valueStrings, xValues, *args)
+        return values, maya.calls.count(("gradientControlNoAttr", "query"))
+
+    uniform, uniformQueries = countQueries(gr.sampleMany)
+    adaptive, adaptiveQueries = countQueries(gr.sampleManyAdaptive, 1e-4)
+    sampleCounts = [ len(gr.getSampleXValues(valueString, 1e-4)) for valueString in valueStrings ]
+
+    assert uniformQueries == 3 * 101
+    assert adaptiveQueries == sum(sampleCounts) and adaptiveQueries * 2 < uniformQueries
+    assert sampleCounts[:2] == [2, 5]
+
+    # The stand-in interpolates every segment linearly, so interpolating its samples agrees with it within tolerance
+    assert adaptive.shape == uniform.shape
+    assert np.abs(adaptive - uniform).max() <= 1e-4
+
+    monkeypatch.setattr(gr, "evaluator", gr.LOCAL)
+    assert np.array_equal(gr.sampleManyAdaptive(valueStrings, xValues), gr.evaluateMany(valueStrings, xValues))
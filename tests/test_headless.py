@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from Command_UI import cmdui, flag, headless, preset, widget
+
+def makeCmdUI():
+
+    cmdUI = cmdui.CmdUI("curve", "", "", [flag.FlagSingle("d", widget.FloatFld(-10., 10., .1, 2)),
+                                          flag.FlagMultiGradiToPoly("g", widget.Gradient(100, 200), asyncFit=False)],
+                        writeCallerFile=False)
+    cmdUI.commandCaller = lambda cmdUI, values: values
+    return cmdUI
+
+# With maxWorkers=0 the presets run in this process, in order, and one that fails doesn't stop the others
+def test_run_presets_in_process(maya, tmp_path):
+
+    path = str(tmp_path / "preset.txt")
+    writer = preset.PresetWriter()
+    writer.writeVal("d", 2.)
+    writer.writeVal("g0", "0.,0.,1,1.,1.,1")
+    writer.writeVal("gRange0", 2.)
+    writer.save(path)
+
+    results = headless.runPresets(makeCmdUI, [path, str(tmp_path / "missing.txt"), { "d": "3.0" }], maxWorkers=0)
+
+    assert results[0][:2] == [None, 2.] and len(results[0][2]) == 3
+    assert isinstance(results[1], OSError)
+    assert results[2] == [None, 3., []]
+
+# Legacy presets don't save the gradients' ranges, so they're fit with the flag's default range
+def test_legacy_presets_use_the_default_range(maya):
+
+    cmdUI = makeCmdUI()
+    gradientString = "0.,0.,1,1.,1.,1"
+
+    legacy = cmdUI.resolveParamVals({ "d": "1.0", "g0": gradientString })
+    assert legacy == cmdUI.resolveParamVals({ "d": "1.0", "g0": gradientString, "gRange0": "1.0" })
+    assert legacy != cmdUI.resolveParamVals({ "d": "1.0", "g0": gradientString, "gRange0": "2.0" })
+
+# Worker pools are spawned with the same context as the fitting processes
+def test_workers_are_spawned(monkeypatch):
+
+    context = object()
+    monkeypatch.setattr(headless.fitting, "getSpawnContext", lambda: context)
+    seen = []
+    monkeypatch.setattr(headless, "ProcessPoolExecutor", lambda **kwargs: seen.append(kwargs) or ThreadPoolExecutor())
+
+    assert headless.runPresets(makeCmdUI, [], maxWorkers=2) == []
+    assert seen[0]["mp_context"] is context and seen[0]["max_workers"] == 2
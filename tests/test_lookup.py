@@ -0,0 +1,29 @@
+import numpy as np
+
+from Command_UI import gradient as gr
+from Command_UI import lookup
+
+def test_clipping_adds_crossings():
+
+    x, y = lookup.clipPiecewiseLinear(np.array([0., 1., 2.]), np.array([.5, 1.5, -.5]))
+    assert x.tolist() == [0., 1.5, 2.] and y.tolist() == [.5, .5, -.5]
+
+    x, y = lookup.clipPiecewiseLinear(np.array([0., 1.]), np.array([2., 2.]))
+    assert y.tolist() == [1., 1.]
+
+# Adaptive tables stay within their tolerance of the clipped gradient
+def test_adaptive_tables_within_tolerance():
+
+    tolerance = 1e-3
+
+    for valueString in gr.getRandomValueStrings(200):
+
+        # The samples are included, so the running minimum of the dense values doesn't miss the bottoms of steps
+        xValues = gr.getSampleXValues(valueString, tolerance)
+        denseX = np.union1d(np.linspace(0., 1., 4001), xValues)
+        table = lookup.LookupTable(*lookup.buildTable(xValues, gr.evaluate(valueString, xValues), 2.), uniform=False)
+        exact = lookup.clipCurves(gr.evaluate(valueString, denseX)[np.newaxis])[0]
+
+        assert np.max(np.abs(table.evaluate(2. * denseX) - exact)) < tolerance * 1.01
+        exactIntegral = lookup.getCumulativeIntegrals(2. * denseX, exact[np.newaxis])[0, -1]
+        assert abs(table.integrate(2.) - exactIntegral) < tolerance * 2.
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+
+from Command_UI import cmdui, flag, preset, widget
+
+VALUES = { "d": "3.0", "p00": "0.5", "p01": "-1.25", "name": "a ? \"quoted\" é value" }
+
+def writePreset(path, values):
+
+    writer = preset.PresetWriter()
+    for settingName, value in values.items():
+        writer.writeVal(settingName, value)
+    writer.save(str(path))
+
+# Each value is read from its own offset, in any order
+def test_indexed_round_trip(tmp_path):
+
+    path = tmp_path / "preset.txt"
+    writePreset(path, VALUES)
+
+    with preset.PresetReader(str(path)) as reader:
+
+        assert not reader.isLegacy()
+        assert reader.getSettingNames() == list(VALUES)
+        for settingName in reversed(list(VALUES)):
+            assert reader.readVal(settingName) == VALUES[settingName]
+        assert reader.readVal("missing") is None
+        assert reader.readAll().values == VALUES
+
+def test_duplicate_names_keep_the_first_value(tmp_path):
+
+    path = tmp_path / "preset.txt"
+    writer = preset.PresetWriter()
+    writer.writeVal("d", 1.)
+    writer.writeVal("d", 2.)
+    writer.writeVal("e", 3.)
+    writer.save(str(path))
+
+    assert preset.readPresetValues(str(path)).values == { "d": "1.0", "e": "3.0" }
+
+# Resolving a command's values from a preset file only reads the values its flags ask for
+def test_resolving_reads_through_the_index(tmp_path, maya, monkeypatch):
+
+    path = tmp_path / "preset.txt"
+    writePreset(path, VALUES)
+    monkeypatch.setattr(preset.PresetReader, "readAll", None)
+
+    cmdUI = cmdui.CmdUI("curve", "", "", [flag.FlagSingle("d", widget.FloatFld(-10., 10., .1, 2))],
+                        writeCallerFile=False)
+
+    assert cmdUI.resolveParamVals(str(path)) == [None, 3.]
+
+def test_legacy_presets(tmp_path):
+
+    path = tmp_path / "legacy.txt"
+    path.write_text("3.0?d?\n0.5?p00?\n-1.25?p01?\n0.75?p00?\n")
+
+    with preset.PresetReader(str(path)) as reader:
+        assert reader.isLegacy()
+        assert reader.getSettingNames() == ["d", "p00", "p01"]
+        assert reader.readVal("p00") == "0.5"
+        assert reader.readAll().values == { "d": "3.0", "p00": "0.5", "p01": "-1.25" }
+
+    assert preset.convertLegacyPreset(str(path))
+    assert path.read_text().startswith(preset.MAGIC)
+    assert not preset.convertLegacyPreset(str(path))
+
+    with preset.PresetReader(str(path)) as reader:
+        assert not reader.isLegacy()
+        assert reader.readAll().values == { "d": "3.0", "p00": "0.5", "p01": "-1.25" }
+
+def setMtime(directory, mtime):
+
+    os.utime(str(directory), ns=(mtime, mtime))
+
+# The directory is only rescanned when its modification time changes
+def test_preset_index_rescans_when_the_directory_changes(tmp_path):
+
+    directory = tmp_path / "presets"
+    directory.mkdir()
+    (directory / "a.txt").write_text("")
+    (directory / "notes.md").write_text("")
+
+    index = preset.PresetIndex(str(directory), maxAge=1e9)
+    assert index.getNames() == ["a.txt"]
+
+    # A change that leaves the modification time as it was isn't seen
+    mtime = index.mtime
+    (directory / "b.txt").write_text("")
+    setMtime(directory, mtime)
+    assert not index.contains("b.txt")
+
+    setMtime(directory, mtime + 10 ** 9)
+    assert index.contains("b.txt") and index.getNames() == ["a.txt", "b.txt"]
+
+    # Without a maxAge, the directory is always rescanned
+    (directory / "c.txt").write_text("")
+    setMtime(directory, mtime + 10 ** 9)
+    index.maxAge = 0.
+    assert index.contains("c.txt")
+
+# The names are saved to cachePath, and loaded from it instead of scanning as long as the directory hasn't changed
+def test_preset_index_cache_file(tmp_path, monkeypatch):
+
+    directory = tmp_path / "presets"
+    directory.mkdir()
+    (directory / "a.txt").write_text("")
+    cachePath = str(tmp_path / "presetIndex.json")
+
+    # Saving a preset checks the name isn't taken, writes the file, and adds it
+    index = preset.PresetIndex(str(directory), cachePath=cachePath, maxAge=1e9)
+    assert not index.contains("b.txt")
+    (directory / "b.txt").write_text("")
+    index.add("b.txt")
+    mtime = index.mtime
+
+    with monkeypatch.context() as scanless:
+        scanless.setattr(preset.os, "scandir", None)
+        assert preset.PresetIndex(str(directory), cachePath=cachePath, maxAge=1e9).getNames() == ["a.txt", "b.txt"]
+
+    (directory / "c.txt").write_text("")
+    setMtime(directory, mtime + 10 ** 9)
+    index = preset.PresetIndex(str(directory), cachePath=cachePath, maxAge=1e9)
+    assert index.mtime is None
+    assert index.getNames() == ["a.txt", "b.txt", "c.txt"]
+
+    with open(cachePath) as cacheFile:
+        assert json.load(cacheFile)["names"] == ["a.txt", "b.txt", "c.txt"]
+
+# Each preset is read once, and again only when its file changes
+def test_preset_cache_hits_and_invalidation(tmp_path, monkeypatch):
+
+    reads = []
+    readPresetValues = preset.readPresetValues
+    monkeypatch.setattr(preset, "readPresetValues", lambda path: reads.append(path) or readPresetValues(path))
+
+    path = tmp_path / "preset.txt"
+    writePreset(path, { "d": "1.0" })
+    cache = preset.PresetCache(maxEntries=2)
+
+    first = cache.load(str(path))
+    assert cache.load(str(path)) is first
+    assert first.result().values == { "d": "1.0" } and len(reads) == 1
+
+    mtime = os.stat(str(path)).st_mtime_ns
+    writePreset(path, { "d": "2.0" })
+    os.utime(str(path), ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+    second = cache.load(str(path))
+    assert second is not first and second.result().values == { "d": "2.0" } and len(reads) == 2
+
+    # The least recently used preset is evicted
+    for name in ("b.txt", "c.txt"):
+        writePreset(tmp_path / name, { "d": "3.0" })
+        cache.load(str(tmp_path / name)).result()
+    third = cache.load(str(path))
+    assert third is not second and third.result().values == { "d": "2.0" } and len(reads) == 5
+
+    cache.shutdown()
+
+# A preset that's still being read when it's selected is applied on the main thread, through executeDeferred, once
+#   the worker thread has read it
+def test_preset_read_in_the_background_is_applied_deferred(tmp_path, maya, monkeypatch):
+
+    readStarted = threading.Event()
+    finishRead = threading.Event()
+    readPresetValues = preset.readPresetValues
+
+    def slowRead(path):
+
+        readStarted.set()
+        finishRead.wait(5.)
+        return readPresetValues(path)
+
+    monkeypatch.setattr(preset, "readPresetValues", slowRead)
+    writePreset(tmp_path / "slow.txt", { "d": "4.0" })
+
+    distance = flag.FlagSingle("d", widget.FloatFld(-10., 10., .1, 2))
+    cmdUI = cmdui.CmdUI("curve", "", str(tmp_path) + os.sep, [distance], writeCallerFile=False)
+    distance.createUI(1.)
+    deferred = []
+    handedOff = threading.Event()
+    cmdUI.executeDeferred = lambda function: deferred.append(function) or handedOff.set()
+
+    cmdUI.loadSettings("slow.txt")
+    assert readStarted.wait(5.) and deferred == []
+
+    finishRead.set()
+    assert handedOff.wait(5.)
+    assert len(deferred) == 1 and distance.widget.getVal() == 1.
+
+    deferred[0]()
+    assert distance.widget.getVal() == 4. and cmdUI.currentPreset == "slow"
+
+    cmdUI.getPresetCache().shutdown()
@@ -0,0 +1,66 @@
+import itertools
+
+from Command_UI import cmdui, flag, sweep, widget
+
+def makeAxes():
+
+    return [ sweep.SweepAxis("a", 0, 1, 1, isInt=True), sweep.SweepAxis("b", 0., 1., .5) ]
+
+# The last axis changes fastest, and every combination can be computed from its index alone
+def test_cartesian_order():
+
+    parameterSweep = sweep.Sweep(makeAxes())
+
+    expected = [ [0, 0.], [0, .5], [0, 1.], [1, 0.], [1, .5], [1, 1.] ]
+    assert len(parameterSweep) == 6
+    assert [ parameterSweep.getCombination(i) for i in range(6) ] == expected
+    assert [ list(c.values()) for c in parameterSweep.iterate(4) ] == expected[4:]
+    assert len(sweep.Sweep(makeAxes(), count=4)) == 4
+
+# Each of the count strata of every axis is used by exactly one combination
+def test_latin_hypercube_strata():
+
+    count = 20
+    axes = [ sweep.SweepAxis("a", 0, count - 1, 1, isInt=True), sweep.SweepAxis("b", 0., 1., 1. / (3 * count - 1)) ]
+    parameterSweep = sweep.Sweep(axes, sweep.LATIN_HYPERCUBE, count, seed=5)
+
+    combinations = [ parameterSweep.getCombination(i) for i in range(count) ]
+
+    assert sorted([ a for a, _ in combinations ]) == list(range(count))
+    assert sorted([ int(round(b / axes[1].step)) // 3 for _, b in combinations ]) == list(range(count))
+
+    # The same seed gives the same combinations
+    again = sweep.Sweep(axes, sweep.LATIN_HYPERCUBE, count, seed=5)
+    assert [ again.getCombination(i) for i in range(count) ] == combinations
+
+def test_random_sweeps_are_reproducible():
+
+    first = sweep.Sweep(makeAxes(), sweep.RANDOM, 10)
+    second = sweep.Sweep(makeAxes(), sweep.RANDOM, 10, seed=first.getSettings()["seed"])
+
+    assert list(first.iterate()) == list(second.iterate())
+
+# A sweep that's stopped resumes from its checkpoint, and a checkpoint of a different sweep is ignored
+def test_sweep_resumes_from_checkpoint(maya, tmp_path):
+
+    cmdUI = cmdui.CmdUI("curve", "", "", [flag.FlagSingle("a", widget.IntFld(0, 3, 1)),
+                                          flag.FlagSingle("b", widget.FloatFld(0., 1., .5, 2))],
+                        writeCallerFile=False)
+    calls = []
+    cmdUI.commandCaller = lambda cmdUI, values: calls.append(values[1:]) or len(calls)
+    checkpointPath = str(tmp_path / "sweep.json")
+
+    firstRun = cmdUI.sweep(["a", "b"], base={ "a": 0, "b": 0. }, checkpointPath=checkpointPath)
+    assert len(list(itertools.islice(firstRun, 5))) == 5
+    firstRun.close()
+
+    settings = sweep.Sweep([ cmdUI.getSweepAxis("a"), cmdUI.getSweepAxis("b") ]).getSettings()
+    assert sweep.loadCheckpoint(checkpointPath, settings) == 5
+
+    secondRun = list(cmdUI.sweep(["a", "b"], base={ "a": 0, "b": 0. }, checkpointPath=checkpointPath))
+    assert len(secondRun) == 12 - 5
+    assert calls == [ [a, b] for a in range(4) for b in (0., .5, 1.) ]
+    assert sweep.loadCheckpoint(checkpointPath, settings) == 12
+
+    assert sweep.loadCheckpoint(checkpointPath, sweep.Sweep(makeAxes()).getSettings()) == 0
+    assert sweep.loadCheckpoint(str(tmp_path / "missing.json"), settings) == 0
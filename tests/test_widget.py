@@ -0,0 +1,285 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import pytest
+
+from Command_UI import benchmarks, cmdui, flag, preset, widget
+
+def makeCmdUI(flags):
+
+    return cmdui.CmdUI("curve", "", "", flags, writeCallerFile=False)
+
+def loadPreset(cmdUI, values):
+
+    presetFuture = Future()
+    presetFuture.set_result(preset.PresetValues(values))
+    cmdUI.applySettings("preset.txt", presetFuture)
+
+# Loading a preset edits the controls in a UIBatch, so change commands have to wait until the batch is flushed to see
+#   the loaded values
+def test_change_commands_run_after_batched_edits(maya):
+
+    seen = []
+    readField = lambda *_: seen.append(maya.cmds.floatField(points.widgets[0].widgets[0].uiID, q=True, v=True))
+
+    points = flag.FlagMulti("p", widget.EquiGrp(widget.FloatFld(-10., 10., .1, 2, readField), 1))
+    cmdUI = makeCmdUI([points])
+    points.createUI([3.])
+
+    loadPreset(cmdUI, { "p00": "1.0" })
+
+    assert seen == [1.0]
+
+def test_ui_batch_saves_round_trips(maya):
+
+    results = benchmarks.benchmarkUIBatch(numGroups=20, widgetsPerGroup=3, numLoads=4)
+
+    # Unbatched, each group edits its checkbox's value, queries it back to enable its fields, and edits each float
+    #   field's value and enabled state separately.  Batched, the query is answered by the pending edit, each field's
+    #   two edits are made together, and refresh is suspended and resumed once per load
+    assert results["unbatched"][0] == 4 * 20 * (1 + 1 + 3 + 3)
+    assert results["batched"][0] == 4 * (20 * (1 + 3) + 2)
+
+def test_gradient_option_vars_stay_flat(maya):
+
+    numBefore, numCreated, numAfter, _ = benchmarks.benchmarkGradientOptionVars(numSets=10000)
+
+    # A gradient alternates between a pool of two optionVars, the first of which it uses when it's made
+    assert numCreated == numBefore + 1
+    assert numAfter == numBefore + 2
+
+# A paged flag keeps its rows as numbers, however its groups format their values
+def test_paged_string_groups_sync(maya):
+
+    points = flag.FlagMultiPaged("p", widget.EquiGrp(widget.FloatFld(-10., 10., .1, 2), 2, paramType="string"))
+    makeCmdUI([points])
+    for row in range(3):
+        points.createUI([float(row), 0.])
+    points.showPage(0)
+
+    points.widgets[1].widgets[1].setVal(5.)
+
+    assert points.getParamVal() == [ "0.0,0.0,", "1.0,5.0,", "2.0,0.0," ]
+
+# A clone shares its settings and change command with the widget it's cloned from, but none of its state
+def test_clone_shares_settings_only(maya):
+
+    owner = [ 0. ] * 1000
+    changeCommand = lambda *_: len(owner)
+    group = widget.EquiGrp(widget.FloatFld(-10., 10., .1, 2, changeCommand), 3)
+    group.create([1., 2., 3.])
+    group.widgets[0].setVal(5.)
+
+    groupClone = group.clone()
+    assert groupClone.baseWidget is group.baseWidget and groupClone.widgetsPerGrp == 3
+    assert groupClone.widgets == [] and groupClone.widgets is not group.widgets
+
+    groupClone.create(None)
+    fieldClone = groupClone.widgets[0]
+    assert fieldClone.changeCommand is changeCommand
+    assert (fieldClone.min, fieldClone.max, fieldClone.step, fieldClone.precision) == (-10., 10., .1, 2)
+    assert fieldClone.uiID != group.widgets[0].uiID and fieldClone.version == 0
+    assert fieldClone.getVal() == -10. and group.widgets[0].getVal() == 5.
+
+    # Sharing rather than deep copying what the change command is bound to is what makes clones small
+    results = benchmarks.benchmarkClone(numWidgets=200)
+    assert results["clone"][1] < results["deepcopy"][1]
+
+# A gradient's range can be given as the name of a control rather than a widget.  Reading the flags mustn't try to
+#   read it as a widget
+def test_range_controls_given_by_name(maya):
+
+    rangeField = maya.cmds.floatField(v=2.)
+    gradients = flag.FlagMultiGradiToPoly("g", widget.Gradient(100, 200), asyncFit=False)
+    cmdUI = makeCmdUI([gradients])
+    gradients.createUI(rangeField)
+
+    values = cmdUI.getParamVals()
+
+    assert len(values[1]) == 3
+
+# Reading widgets together must give the same values as reading them one at a time
+def test_batched_float_reads_are_exact(maya):
+
+    fields = [ widget.FloatFld(-10., 10., .1, 2) for _ in range(3) ]
+    for field in fields:
+        field.create(1.23456789)
+    intFields = [ widget.IntFld(0, 10, 1) for _ in range(2) ]
+    for intField in intFields:
+        intField.create(3)
+
+    del maya.calls[:]
+    with widget.BatchRead(fields + intFields):
+        values = [ w.getVal() for w in fields + intFields ]
+
+    # A float[] and an int[], with no field queried on its own
+    assert maya.calls == [("mel", "query"), ("mel", "query")]
+    assert values == [ w.queryVal() for w in fields + intFields ] == [1.23456789] * 3 + [3] * 2
+
+# Loading only the values that differ compares every widget with the preset, reading them from Maya together first
+def test_diff_apply_reads_together(maya, capsys):
+
+    fields = [ flag.FlagSingle("i" + str(i), widget.IntFld(0, 10, 1)) for i in range(4) ]
+    cmdUI = makeCmdUI(fields)
+    cmdUI.diffApply = True
+    for field in fields:
+        field.createUI(3)
+
+    del maya.calls[:]
+    loadPreset(cmdUI, { "i0": "3", "i1": "5", "i2": "3", "i3": "3" })
+
+    assert maya.calls.count(("mel", "query")) == 1 and maya.calls.count(("intField", "query")) == 0
+    assert maya.calls.count(("intField", "edit")) == 1
+    assert "(1 values set, 3 unchanged values skipped)" in capsys.readouterr().out
+    assert [ field.widget.getVal() for field in fields ] == [3, 5, 3, 3]
+
+# Groups whose controls were never created read their preset values as their slotWidgets, and can't be read without
+def test_uncreated_group_preset_vals(maya):
+
+    typed = widget.CheckBoxGrp("on", slotWidgets=[widget.FloatFld(-10., 10., .1, 2), widget.IntFld(0, 10, 1)])
+    cmdUI = makeCmdUI([flag.FlagSingle("c", typed)])
+
+    assert cmdUI.resolveParamVals({ "c0": "1", "c1": "2.5", "c2": "3" })[1] == [True, 2.5, 3]
+
+    untyped = makeCmdUI([flag.FlagSingle("e", widget.EmptyGrp())])
+
+    with pytest.raises(RuntimeError):
+        untyped.resolveParamVals({ "e0": "1", "e1": "2.5" })
+
+# Range controls given by name don't report a version when they change, so memoization can't rely on versions
+def test_memo_sees_named_range_changes(maya):
+
+    rangeField = maya.cmds.floatField(v=2.)
+    gradients = flag.FlagMultiGradiToPoly("g", widget.Gradient(100, 200), asyncFit=False)
+    cmdUI = makeCmdUI([gradients])
+    gradients.createUI(rangeField)
+
+    calls = []
+    cmdUI.commandCaller = lambda cmdUI, values: calls.append(values) or len(calls)
+    cmdUI.enableMemo()
+
+    cmdUI.invoke()
+    maya.cmds.floatField(rangeField, e=True, v=5.)
+    cmdUI.invoke()
+
+    assert len(calls) == 2 and calls[0] != calls[1]
+    assert cmdUI.getMemoStats()["misses"] == 2
+
+# A gradient is only refit when its value string, range or degree changes, and flags share fits through their cache
+def test_fit_cache_keys(maya):
+
+    from Command_UI import fitting
+
+    cache = fitting.FitCache()
+    rangeField = maya.cmds.floatField(v=2.)
+    gradients = flag.FlagMultiGradiToPoly("g", widget.Gradient(100, 200), fitCache=cache, asyncFit=False)
+    cmdUI = makeCmdUI([gradients])
+    gradients.createUI(rangeField)
+
+    def getCounts():
+
+        cmdUI.getParamVals()
+        return cache.getStats()["misses"], len(cache.entries)
+
+    assert getCounts() == (1, 1)
+    assert getCounts() == (1, 1)
+
+    maya.cmds.floatField(rangeField, e=True, v=5.)
+    assert getCounts() == (2, 2)
+
+    # More control points raise the degree
+    gradients.widgets[0].setVal(",".join([ "%g,%g,1" % (i / 10., i / 10.) for i in range(10) ]))
+    assert getCounts() == (3, 3)
+    assert [ key[1:] for key in cache.entries ] == [ (2., 8), (5., 8), (5., 10) ]
+
+    # The same gradient and range in another flag is a hit
+    others = flag.FlagMultiGradiToPoly("h", widget.Gradient(100, 200), fitCache=cache, asyncFit=False)
+    otherUI = makeCmdUI([others])
+    others.createUI(rangeField)
+    others.widgets[0].setVal(gradients.widgets[0].getVal())
+    otherUI.getParamVals()
+    assert cache.getStats()["misses"] == 3 and cache.getStats()["hits"] >= 1
+
+# Fits gradients in a single thread that's kept busy until the returned event is set, so submitted fits stay pending
+def holdFitExecutor(monkeypatch):
+
+    from Command_UI import fitting
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    busy = threading.Event()
+    executor.submit(busy.wait, 5.)
+    monkeypatch.setattr(fitting, "getFitExecutor", lambda: executor)
+
+    return executor, busy
+
+def makeReferenceVal(rangeField, valueString):
+
+    from Command_UI import fitting
+
+    reference = flag.FlagMultiGradiToPoly("r", widget.Gradient(100, 200), fitCache=fitting.FitCache(), asyncFit=False)
+    referenceUI = makeCmdUI([reference])
+    reference.createUI(rangeField)
+    reference.widgets[0].setVal(valueString)
+
+    return referenceUI.getParamVals()[1]
+
+# While a gradient is edited, each edit supersedes the fit submitted for the last one: a fit that hasn't started is
+#   cancelled, and reading the flag waits for the fit of the latest edit rather than fitting it again
+def test_edits_supersede_pending_fits(maya, monkeypatch):
+
+    from Command_UI import fitting
+
+    executor, busy = holdFitExecutor(monkeypatch)
+    rangeField = maya.cmds.floatField(v=2.)
+    gradients = flag.FlagMultiGradiToPoly("g", widget.Gradient(100, 200), fitCache=fitting.FitCache())
+    cmdUI = makeCmdUI([gradients])
+    gradients.createUI(rangeField)
+    firstKey, firstFit = gradients.pendingFits[0]
+
+    valueString = "0.,0.,1,1.,1.,1"
+    gradients.widgets[0].setVal(valueString)
+    gradients.handleGradientChange(0, None)
+    latestKey, latestFit = gradients.pendingFits[0]
+    assert firstFit.cancelled() and latestKey != firstKey and not latestFit.done()
+
+    # The same edit again doesn't submit another fit
+    gradients.handleGradientChange(0, None)
+    assert gradients.pendingFits[0][1] is latestFit
+
+    busy.set()
+    values = cmdUI.getParamVals()[1]
+    assert gradients.pendingFits == {} and gradients.paramVals[0] is latestFit.result()[0]
+    assert values == makeReferenceVal(rangeField, valueString)
+
+    # A fit for a key that's no longer the gradient's is dropped
+    gradients.handleGradientChange(0, None)
+    assert gradients.joinFit(0, firstKey) is None and gradients.pendingFits == {}
+
+    executor.shutdown()
+
+# Gradients evaluated in Maya are sampled on the main thread when they're edited, and only fit in the background
+def test_maya_gradients_are_sampled_on_the_main_thread(maya, monkeypatch):
+
+    from Command_UI import fitting
+    from Command_UI import gradient as gr
+
+    monkeypatch.setattr(gr, "evaluator", gr.MAYA)
+    monkeypatch.setattr(gr, "mayaHasUI", True)
+    sampleThreads = []
+    evaluateEachInMaya = gr.evaluateEachInMaya
+    monkeypatch.setattr(gr, "evaluateEachInMaya", lambda *args: sampleThreads.append(threading.current_thread())
+                        or evaluateEachInMaya(*args))
+
+    executor, busy = holdFitExecutor(monkeypatch)
+    rangeField = maya.cmds.floatField(v=2.)
+    gradients = flag.FlagMultiGradiToPoly("g", widget.Gradient(100, 200), fitCache=fitting.FitCache())
+    cmdUI = makeCmdUI([gradients])
+    gradients.createUI(rangeField)
+
+    assert sampleThreads == [threading.main_thread()] and not gradients.pendingFits[0][1].done()
+
+    busy.set()
+    values = cmdUI.getParamVals()[1]
+    assert sampleThreads == [threading.main_thread()]
+    assert values == makeReferenceVal(rangeField, gradients.widgets[0].getVal())
+
+    executor.shutdown()
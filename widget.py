@@ -1,21 +1,375 @@
 import maya.cmds as cmds
-import time, copy
+import maya.mel as mel
+import re
+from collections import OrderedDict
+from functools import partial
+from . import gradient as gr
 
+# Mirrors the values of widgets in memory so that getVal() doesn't need to query Maya.
+# Widgets keep it up to date from their change callbacks and setVal().  Values that can't be mirrored exactly
+#   (i.e. a gradient's value string, which Maya reformats) are dropped from the store instead, and queried again
+#   on the next read.
+# Since Maya can change a control without going through either of those, every verifyEvery reads (if given) the
+#   value being read is checked against Maya, and verify() checks all of them.  Any that drifted are corrected.
+class ValueStore:
+
+    def __init__(self, verifyEvery=None):
+
+        self.verifyEvery = verifyEvery
+        self.entries = {} # uiID -> [widget, value]
+
+        self.reads = 0
+        self.queries = 0
+        self.drifts = 0
+
+    def read(self, widget):
+
+        self.reads += 1
+        entry = self.entries.get(widget.uiID)
+
+        if entry is None:
+            self.queries += 1
+            entry = self.entries[widget.uiID] = [widget, widget.queryVal()]
+        elif self.verifyEvery and self.reads % self.verifyEvery == 0:
+            self.verifyEntry(entry)
+
+        return entry[1]
+
+    def write(self, widget, value):
+
+        self.entries[widget.uiID] = [widget, value]
+
+    def forget(self, widget):
+
+        self.entries.pop(widget.uiID, None)
+
+    def clear(self):
+
+        self.entries.clear()
+
+    # Query every stored widget and correct any values that drifted from Maya's.  Returns the uiIDs that drifted
+    def verify(self):
+
+        return [ uiID for uiID, entry in list(self.entries.items()) if self.verifyEntry(entry) ]
+
+    def verifyEntry(self, entry):
+
+        self.queries += 1
+        widget, value = entry
+        mayaValue = widget.queryVal()
+        if mayaValue == value:
+            return False
+
+        print("WARNING:  value store drifted for " + widget.uiID + " - " + str(value) + " != " + str(mayaValue))
+        self.drifts += 1
+        entry[1] = mayaValue
+        return True
+
+# Collects the edits made to widgets' Maya controls (values and enabled states) while it's open, and makes them
+#   all when it's closed.  Edits to the same control are combined into one call with only their final values, so
+#   a widget that's enabled and disabled several times is only edited once.
+# Use it as a context manager: with UIBatch(): ...
+# Nested batches are part of the outermost one.  Values set during the batch are returned by getVal() before they're
+#   flushed, except for gradients, whose values Maya formats itself.
+# Change commands recorded with recordCallback() run once all the edits are made, since they may query the controls.
+# If suspendRefresh is True, Maya's UI refresh is suspended while the edits are made
+class UIBatch:
+
+    # The open batch, or None
+    current = None
+
+    def __init__(self, suspendRefresh=False):
+
+        self.suspendRefresh = suspendRefresh
+        self.edits = OrderedDict() # uiID -> [Maya command, {flag: value}]
+        self.calls = OrderedDict() # key -> function, for edits that aren't a single flag
+        self.callbacks = OrderedDict() # key -> function, run after the edits
+        self.outer = False
+
+        # The number of edits requested, and the number of Maya calls made to flush them
+        self.requested = 0
+        self.issued = 0
+
+    def __enter__(self):
+
+        if UIBatch.current is None:
+            UIBatch.current = self
+            self.outer = True
+
+        return UIBatch.current
+
+    def __exit__(self, *_):
+
+        if self.outer:
+            UIBatch.current = None
+            self.flush()
+
+    def recordEdit(self, uiID, command, **flags):
+
+        self.requested += 1
+        if uiID not in self.edits:
+            self.edits[uiID] = [command, {}]
+
+        self.edits[uiID][1].update(flags)
+
+    # Record a function making an edit that doesn't fit recordEdit().  A later call with the same key replaces it
+    def recordCall(self, key, function):
+
+        self.requested += 1
+        self.calls.pop(key, None)
+        self.calls[key] = function
+
+    # Record a function to run once the edits have been made, i.e. a change command.  A later call with the same key
+    # replaces it
+    def recordCallback(self, key, function):
+
+        self.callbacks.pop(key, None)
+        self.callbacks[key] = function
+
+    # Returns the value set on the widget during the batch, as getVal() would return it, or None if there isn't one
+    def getPendingVal(self, widget):
+
+        edit = self.edits.get(getattr(widget, "uiID", None))
+        if edit is None or "v" not in edit[1]:
+            return None
+
+        return widget.normalizeVal(edit[1]["v"])
+
+    def flush(self):
+
+        if self.suspendRefresh:
+            cmds.refresh(suspend=True)
+
+        try:
+            for uiID, (command, flags) in self.edits.items():
+                command(uiID, e=True, **flags)
+                self.issued += 1
+
+            for function in self.calls.values():
+                function()
+                self.issued += 1
+
+        finally:
+            self.edits.clear()
+            self.calls.clear()
+
+            if self.suspendRefresh:
+                cmds.refresh(suspend=False)
+
+        callbacks = list(self.callbacks.values())
+        self.callbacks.clear()
+        for function in callbacks:
+            function()
+
+# Reads the values of many widgets from Maya at once when it's opened, so that getVal() calls made while it's open
+#   don't each query Maya.  Groups are read as their widgets.
+# The values are put in the shared ValueStore, or if there isn't one, in a store that only lasts until it's closed.
+#   Widgets already in the store, and those with values pending in a UIBatch, aren't read again, so nested
+#   BatchReads only query what the outer ones didn't.
+# Use it as a context manager: with BatchRead(widgets): ...
+# melEval is the function the generated MEL is run with, mel.eval by default
+class BatchRead:
+
+    def __init__(self, widgets, melEval=None):
+
+        self.widgets = widgets
+        self.melEval = melEval
+        self.tempStore = None
+
+    def __enter__(self):
+
+        store = Widget.valueStore
+        if store is None:
+            store = self.tempStore = Widget.valueStore = ValueStore()
+
+        # Widgets whose controls haven't been created yet have nothing to read
+        unread = [ widget for widget in getLeafWidgets(self.widgets) if getattr(widget, "uiID", None) is not None
+                   and widget.uiID not in store.entries
+                   and (UIBatch.current is None or UIBatch.current.getPendingVal(widget) is None) ]
+
+        for widget, value in queryVals(unread, self.melEval).items():
+            store.write(widget, value)
+
+        return self
+
+    def __exit__(self, *_):
+
+        if self.tempStore is not None and Widget.valueStore is self.tempStore:
+            Widget.valueStore = None
+
+# Returns the widgets in a list of widgets and groups, with each group replaced by its widgets
+def getLeafWidgets(widgets):
+
+    leaves = []
+    for widget in widgets:
+
+        if hasattr(widget, "widgets"):
+            leaves.extend(getLeafWidgets(widget.widgets))
+        else:
+            leaves.append(widget)
+
+    return leaves
+
+# Query the values of the widgets with a mel.eval() call per MEL type rather than one Maya call per widget, and
+#   return a dictionary of widget -> value, as queryVal() would return it.
+# The generated MEL defines a procedure for each melType returning the values of that type as an array of it, so
+#   numbers aren't converted to strings on the way.  Each widget's parseVal() converts its value back.  Widgets
+#   without a melQuery are queried one at a time.
+# melEval is the function the MEL is run with, mel.eval by default
+def queryVals(widgets, melEval=None):
+
+    values = {}
+    batchable = []
+    for widget in widgets:
+
+        if widget.melQuery is None:
+            values[widget] = widget.queryVal()
+        else:
+            batchable.append(widget)
+
+    byType = OrderedDict()
+    for widget in batchable:
+        byType.setdefault(widget.melType, []).append(widget)
+
+    for melType, typeWidgets in byType.items():
+
+        # There's nothing to gain from generating MEL for one widget
+        if len(typeWidgets) < 2:
+            for widget in typeWidgets:
+                values[widget] = widget.queryVal()
+
+            continue
+
+        procName = "cmdUIQueryVals_" + melType
+        lines = [ "global proc " + melType + "[] " + procName + "() {", melType + " $values[];" ]
+        for i, widget in enumerate(typeWidgets):
+            lines.append("$values[" + str(i) + "] = `" + widget.melQuery + ' "' + widget.uiID + '"`;')
+        lines.append("return $values; }")
+        lines.append(procName + "();")
+
+        results = (melEval or mel.eval)("\n".join(lines))
+
+        for widget, result in zip(typeWidgets, results):
+            values[widget] = widget.parseVal(result)
+
+    return values
+
+# Widgets use __slots__ rather than a __dict__ per instance, since flags with many rows create a lot of them.
+# New instances for flags and groups are made with clone(), which builds a new, not yet created widget with the
+#   same settings. It's much cheaper than copy.deepcopy(), and shares callbacks such as changeCommand rather than
+#   deep copying whatever they're bound to
 class Widget:
+
+    # version is incremented whenever the widget's value may have changed, either by the user through the Maya
+    # control's change callback or by setVal().  Flags compare it with the version they last read, so they only
+    # query and recompute the values of widgets that changed
+    __slots__ = ("uiID", "version")
+
+    # The ValueStore shared by all widgets, or None to always query Maya
+    valueStore = None
+
+    # The MEL command, without the control name, that queries the widget's value, i.e. "intField -q -v".
+    # Widgets that have one can be read together with others of the same melType in one mel.eval() call.  See queryVals()
+    melQuery = None
+
+    # The MEL type melQuery returns, "string", "int" or "float"
+    melType = "string"
     
     def __init__(self, *_):
 
-        pass
+        self.version = 0
+
+    def clone(self):
+
+        return type(self)()
 
+    def getVal(self, *_):
+
+        if UIBatch.current is not None:
+            pendingVal = UIBatch.current.getPendingVal(self)
+            if pendingVal is not None:
+                return pendingVal
+
+        if self.valueStore is None:
+            return self.queryVal()
+
+        return self.valueStore.read(self)
+
+    # Edit the widget's Maya control, i.e. self.editControl(cmds.intField, v=1), or record the edit if there's
+    # an open UIBatch
+    def editControl(self, command, **flags):
+
+        if UIBatch.current is not None:
+            UIBatch.current.recordEdit(self.uiID, command, **flags)
+        else:
+            command(self.uiID, e=True, **flags)
+
+    def markDirty(self, *_):
+
+        self.version += 1
+
+    # Called by the Maya control's change callback, and by setVal(), with the widget's new value
+    def valueChanged(self, *args):
+
+        self.markDirty()
+
+        if self.valueStore is not None:
+            newVal = self.normalizeVal(args[0]) if args else None
+            if newVal is None:
+                self.valueStore.forget(self)
+            else:
+                self.valueStore.write(self, newVal)
+
+    # Convert the string a MEL query returns for the widget, or the string a preset saved for it, to what
+    # queryVal() would return
+    def parseVal(self, value):
+
+        return value
+
+    # Returns the value saved for the widget in file (a PresetSource from preset.py) as getVal() would return it,
+    # or None if there isn't one.  This doesn't need the widget's control to exist, so it's used to get the values
+    # of a command's flags without a GUI
+    def getPresetVal(self, file, settingName):
+
+        value = file.readVal(settingName)
+        return None if value is None else self.parseVal(value)
+
+    # Convert a value given to setVal() or a change callback to what queryVal() would return, or None if that
+    # isn't known
+    def normalizeVal(self, value):
+
+        return value
+
+    def clampVal(self, value):
+
+        return min(max(value, self.min), self.max)
+
+    # file is a PresetWriter (from preset.py)
     def writeVal(self, file, settingName):
 
-        file.write(str(self.getVal()) + "?" + settingName + "?\n")
+        file.writeVal(settingName, self.getVal())
 
+    # file is a PresetReader, PresetValues or DiffLoader (from preset.py).  Widgets with no value saved in the
+    # preset are left as they are, and so are widgets the file says don't need editing.
+    # Returns whether the widget's value was set
     def loadVal(self, file, settingName):
 
-        line = file.readline().split("?")
-        if line[1] != settingName: print("WARNING:  WRONG VALUE READ - " + line[1])
-        self.setVal(line[0])
+        value = file.readVal(settingName)
+        if value is None:
+            print("WARNING:  NO VALUE SAVED FOR - " + settingName)
+            return False
+
+        if not file.needsEdit(self, value):
+            return False
+
+        self.setVal(value)
+        return True
+
+    # Whether a value given to setVal() is the same as the widget's current value
+    def valEquals(self, value):
+
+        newVal = self.normalizeVal(value)
+        return newVal is not None and newVal == self.getVal()
 
     def initValIsGood(self, initVal, type):
 
@@ -39,94 +393,153 @@ class Widget:
 
 class IntFld(Widget):
 
+    __slots__ = ("min", "max", "step")
+
     def __init__(self, min, max, step):
 
+        Widget.__init__(self)
         self.min = min
         self.max = max
         self.step = step
 
+    def clone(self):
+
+        return IntFld(self.min, self.max, self.step)
+
     def create(self, initVal):
 
         if not self.initValIsGood(initVal, "int"): initVal = self.min
 
-        self.uiID = cmds.intField(v=initVal,min=self.min,max=self.max,s=self.step)
+        self.uiID = cmds.intField(v=initVal,min=self.min,max=self.max,s=self.step,cc=self.valueChanged)
         return self.uiID
 
-    def getVal(self, *_):
+    melQuery = "intField -q -v"
+    melType = "int"
+
+    def queryVal(self, *_):
        
         return cmds.intField(self.uiID, q=True, v=True)
 
+    def parseVal(self, value):
+
+        return int(value)
+
     def setVal(self, newVal):
 
-        cmds.intField(self.uiID, e=True, v=int(newVal))
+        self.editControl(cmds.intField, v=int(newVal))
+        self.valueChanged(newVal)
+
+    def normalizeVal(self, value):
+
+        return self.clampVal(int(value))
     
     def enable(self, enabled):
 
-        cmds.intField(self.uiID, e=True, en=enabled)
+        self.editControl(cmds.intField, en=enabled)
 
 class FloatFld(Widget):
 
+    __slots__ = ("min", "max", "step", "precision", "changeCommand")
+
     def __init__(self, min, max, step, precision, changeCommand = None):
         
+        Widget.__init__(self)
         self.min = min
         self.max = max
         self.step = step
         self.precision = precision
         self.changeCommand = changeCommand
 
+    def clone(self):
+
+        return FloatFld(self.min, self.max, self.step, self.precision, self.changeCommand)
+
     def create(self, initVal):
 
         if not self.initValIsGood(initVal, "float"): initVal = self.min
 
-        if (self.changeCommand):
-            self.uiID = cmds.floatField(v=initVal,min=self.min,max=self.max,s=self.step,pre=self.precision,cc=self.changeCommand)
-        else:
-            self.uiID = cmds.floatField(v=initVal,min=self.min,max=self.max,s=self.step,pre=self.precision)
+        self.uiID = cmds.floatField(v=initVal,min=self.min,max=self.max,s=self.step,pre=self.precision,cc=self.handleChange)
         
         return self.uiID
 
-    def getVal(self, *_):
+    def handleChange(self, *args):
+
+        self.valueChanged(*args)
+        if (self.changeCommand):
+            self.changeCommand(*args)
+
+    # MEL converts floats to strings with only 6 significant digits, so float fields are read through a float[],
+    # which keeps the doubles cmds would return
+    melQuery = "floatField -q -v"
+    melType = "float"
+
+    def queryVal(self, *_):
        
         return cmds.floatField(self.uiID, q=True, v=True)
 
+    def parseVal(self, value):
+
+        return float(value)
+
     def setVal(self, newVal):
 
-        cmds.floatField(self.uiID, e=True, v=float(newVal))
+        self.editControl(cmds.floatField, v=float(newVal))
+        self.valueChanged(newVal)
+
+    def normalizeVal(self, value):
+
+        return self.clampVal(float(value))
     
     def enable(self, enabled):
 
-        cmds.floatField(self.uiID, e=True, en=enabled)
+        self.editControl(cmds.floatField, en=enabled)
 
 class TextFld(Widget):
 
+    __slots__ = ()
+
     def __init__(self, *_):
         
-        pass
+        Widget.__init__(self)
 
     def create(self, *_):
 
-        self.uiID = cmds.textField()
+        self.uiID = cmds.textField(cc=self.valueChanged)
         return self.uiID
 
-    def getVal(self, *_):
+    melQuery = "textField -q -v"
+
+    def queryVal(self, *_):
        
         return cmds.textField(self.uiID, q=True, v=True)
 
     def setVal(self, newText):
 
-        cmds.textField(self.uiID, e=True, v=newText)
+        self.editControl(cmds.textField, v=newText)
+        self.valueChanged(newText)
+
+    def normalizeVal(self, value):
+
+        return str(value)
 
     def enable(self, enabled):
 
-        cmds.floatField(self.uiID, e=True, en=enabled)
+        self.editControl(cmds.textField, en=enabled)
 
 class CheckBox(Widget):
 
+    __slots__ = ("label", "dependents")
+
     def __init__(self, label):
         
+        Widget.__init__(self)
         self.label = label
         self.dependents = []
 
+    def clone(self):
+
+        return CheckBox(self.label)
+
     def create(self, *_):
 
         self.uiID = cmds.checkBox(l=self.label,v=0,cc=self.toggleDependents)
@@ -142,60 +555,116 @@ class CheckBox(Widget):
     
     def toggleDependents(self, enabled):
         
+        self.valueChanged(enabled)
         e = False if enabled else True
         for d in self.dependents:
 
             d.enable(e)
 
-    def getVal(self, *_):
+    melQuery = "checkBox -q -v"
+    melType = "int"
+
+    def queryVal(self, *_):
        
         value = cmds.checkBox(self.uiID, q=True, v=True)
         return 1 if value else 0
 
+    def parseVal(self, value):
+
+        return 1 if int(value) else 0
+
     def setVal(self, newVal):
 
-        cmds.checkBox(self.uiID, e=True, v=int(newVal))
+        self.editControl(cmds.checkBox, v=int(newVal))
+        self.valueChanged(newVal)
+
+    def normalizeVal(self, value):
+
+        return 1 if int(value) else 0
     
     def enable(self, enabled):
 
-        cmds.checkBox(self.uiID, e=True, en=enabled)
+        self.editControl(cmds.checkBox, en=enabled)
 
 class IntSliderFld(Widget):
 
+    __slots__ = ("label", "min", "max", "columnWidths")
+
     def __init__(self, label, min, max, columnWidths):
         
+        Widget.__init__(self)
         self.label = label
         self.min = min
         self.max = max
         self.columnWidths = columnWidths
 
+    def clone(self):
+
+        return IntSliderFld(self.label, self.min, self.max, self.columnWidths)
+
     def create(self, *_):
 
-        self.uiID = cmds.intSliderGrp(v=self.min,min=self.min,max=self.max,f=True,l=self.label,cw3=self.columnWidths)
+        self.uiID = cmds.intSliderGrp(v=self.min,min=self.min,max=self.max,f=True,l=self.label,cw3=self.columnWidths,
+            cc=self.valueChanged)
         return self.uiID
 
-    def getVal(self, *_):
+    melQuery = "intSliderGrp -q -v"
+    melType = "int"
+
+    def queryVal(self, *_):
         
         return cmds.intSliderGrp(self.uiID, q=True, v=True)
 
+    def parseVal(self, value):
+
+        return int(value)
+
     def setVal(self, newVal):
 
-        cmds.intSliderGrp(self.uiID, e=True, v=int(newVal))
+        self.editControl(cmds.intSliderGrp, v=int(newVal))
+        self.valueChanged(newVal)
+
+    def normalizeVal(self, value):
+
+        return self.clampVal(int(value))
 
 class Gradient(Widget):
 
-    def __init__(self, height, width):
+    # The names of the optionVars used by all gradients that currently exist
+    activeOptionVars = set()
 
+    __slots__ = ("height", "width", "changeCommand", "optionVarNames", "optionVarIndex")
+
+    # changeCommand is called whenever the user edits the gradient, both while dragging a point and once it's released
+    def __init__(self, height, width, changeCommand=None):
+
+        Widget.__init__(self)
         self.height = height
         self.width = width
+        self.changeCommand = changeCommand
+
+    def clone(self):
+
+        return Gradient(self.height, self.width, self.changeCommand)
 
     def create(self, *_):
 
-        self.uiID = cmds.gradientControlNoAttr(h=self.height, w=self.width, cc=self.printVals)
+        self.uiID = cmds.gradientControlNoAttr(h=self.height, w=self.width, cc=self.printVals, dc=self.handleChange)
+
+        # The gradient only reloads its points when it's given a different optionVar than the one it has, so each
+        # gradient alternates between a pool of two, named after its control.  They're removed when it's deleted
+        optionVarPrefix = "gradientOptionVar_" + re.sub(r"\W", "_", self.uiID) + "_"
+        self.optionVarNames = [ optionVarPrefix + "0", optionVarPrefix + "1" ]
+        self.optionVarIndex = 0
+        Gradient.activeOptionVars.update(self.optionVarNames)
+        cmds.scriptJob(uiDeleted=[self.uiID, self.removeOptionVars], runOnce=True)
+
         self.setVal('.5,0.,3')
 
+    melQuery = "gradientControlNoAttr -q -asString"
+
     # Return value is a single string.  It is a concatenation of all its optionvar point values
-    def getVal(self, *_):
+    def queryVal(self, *_):
 
         return cmds.gradientControlNoAttr(self.uiID, q=True, asString=True)
 
@@ -212,56 +681,121 @@ class Gradient(Widget):
             if i%3 != 2: ovStringValues[-1] += values[i] + ","
             else: ovStringValues[-1] += values[i]
 
-        # setting a gradient's value requires a new, uniquely named optionVar
-        ovName = "gradientOptionVar" + str(round(time.clock(), 4))
+        if UIBatch.current is not None:
+            UIBatch.current.recordCall((self.uiID, "optionVar"), partial(self.setOptionVar, ovStringValues))
+        else:
+            self.setOptionVar(ovStringValues)
 
-        # the first optionVar call creates the curve/line on the gradient
-        # if one already exists with this name, it is replaced
-        cmds.optionVar(stringValue=[ovName, ovStringValues[0]])
+        self.valueChanged()
 
-        # further optionVar calls append more points to the gradient using the stringValueAppend parameter
+    # Set the gradient's points from a list of optionVar string values
+    def setOptionVar(self, ovStringValues):
+
+        # setting a gradient's value requires a different optionVar than the one it currently has
+        self.optionVarIndex = 1 - self.optionVarIndex
+        ovName = self.optionVarNames[self.optionVarIndex]
+
+        # -stringValue replaces the optionVar with the first point, and each -stringValueAppend adds another.
+        # MEL applies the flags in order, so the whole list is written with a single command
+        command = 'optionVar -stringValue "' + ovName + '" "' + ovStringValues[0] + '"'
         for value in ovStringValues[1:]:
-            cmds.optionVar(stringValueAppend=[ovName, value])
+            command += ' -stringValueAppend "' + ovName + '" "' + value + '"'
+        mel.eval(command + ";")
             
         cmds.gradientControlNoAttr(self.uiID, e=True, optionVar=ovName)
 
+    # Called when the gradient's control is deleted
+    def removeOptionVars(self, *_):
+
+        for ovName in self.optionVarNames:
+            cmds.optionVar(remove=ovName)
+            Gradient.activeOptionVars.discard(ovName)
+
+    # Maya formats the gradient's value string itself, so it's queried again rather than mirrored
+    def normalizeVal(self, value):
+
+        return None
+
+    # Saved values come from getVal(), so they're already formatted the way Maya formats them
+    def valEquals(self, value):
+
+        return value == self.getVal()
+
+    def handleChange(self, *args):
+
+        self.valueChanged()
+        if (self.changeCommand):
+            self.changeCommand(*args)
+
     def printVals(self, pointValues):
 
+        self.handleChange(pointValues)
         print(pointValues)
 
+# Remove the optionVars left behind by gradients that no longer exist, including those from earlier versions
+#   which created a new optionVar every time a gradient's value was set, and those left by gradient.py's hidden
+#   control when evaluating in Maya was interrupted.  Returns the number removed
+def removeStaleGradientOptionVars():
+
+    staleNames = [ name for name in (cmds.optionVar(list=True) or [])
+                   if name.startswith("gradientOptionVar") and name not in Gradient.activeOptionVars
+                   or name.startswith(gr.MAYA_OPTION_VAR_PREFIX) ]
+
+    for name in staleNames:
+        cmds.optionVar(remove=name)
+
+    return len(staleNames)
+
 # Group classes behave like single widgets, but are actually groups of widgets.
 # They can be used for the widget parameter for FlagSingle and FlagMulti.
 # By default their getVal() returns a list of all the widgets' values.  If the paramType is specified
 #   as 'string', it will return a single string containing each widget value separated by commas
 # Note that createUI() calls on flag objects with Grps will create multiple widgets at once, so
 #   the calling code must provide the appropriate layout to account for this.
+# slotWidgets is an optional list of uncreated widgets like the ones the group will be given, one per slot.  They're
+#   only used to read the group's values from a preset when its controls were never created, i.e. without a GUI
 class EmptyGrp:
 
-    def __init__(self, paramType="list"):
+    __slots__ = ("widgets", "paramType", "slotWidgets")
+
+    def __init__(self, paramType="list", slotWidgets=None):
 
         self.widgets = []
         self.paramType = paramType
+        self.slotWidgets = slotWidgets
+
+    # Returns a new group with the same settings and no widgets
+    def clone(self):
+
+        return type(self)(self.paramType, self.slotWidgets)
+
+    # A group's value changes whenever one of its widgets' values does.  Widget versions only ever increase, so
+    # their sum does too
+    @property
+    def version(self):
+
+        return sum([ widget.version for widget in self.widgets ])
 
     def nextWidget(self, newWidget, initVal=None):
 
         newWidget.create(initVal)
         return newWidget
 
+    # The widgets are read from Maya together, with a mel.eval() per value type
     def getVal(self, *_):
 
-        if self.paramType == "list":
+        with BatchRead(self.widgets):
+            values = [ widget.getVal() for widget in self.widgets ]
 
-            value = []
-            for widget in self.widgets:
-                value.append(widget.getVal())
+        if self.paramType == "list":
 
-            return value
+            return values
         
         elif self.paramType == "string":
 
             value = "" 
-            for widget in self.widgets:
-                value += str(widget.getVal()) + ','
+            for widgetVal in values:
+                value += str(widgetVal) + ','
 
             return value
 
@@ -270,46 +804,108 @@ class EmptyGrp:
         for i in range(len(self.widgets)):
             self.widgets[i].writeVal(file, settingName + str(i))
 
+    # The widgets a group reads its preset values as: its own, or its slotWidgets if it was never created.  Returns
+    # None if it has neither
+    def getPresetWidgets(self):
+
+        return self.widgets if self.widgets else self.slotWidgets
+
+    # Returns the group's value from the values saved for its widgets, as getVal() would return it, or None if there
+    # aren't any.  See Widget.getPresetVal()
+    def getPresetVal(self, file, settingName):
+
+        # Without widgets, there's no way to know what types the saved strings should be
+        presetWidgets = self.getPresetWidgets()
+        if presetWidgets is None:
+            cmds.error(settingName + " group has no widgets to read its preset values as.  Give it slotWidgets")
+
+        values = [ presetWidgets[i].getPresetVal(file, settingName + str(i)) for i in range(len(presetWidgets)) ]
+        if not values or None in values:
+            return None
+
+        if self.paramType == "string":
+            return "".join([ str(value) + "," for value in values ])
+
+        return values
+
+    # Returns whether any of the widgets' values were set
     def loadVal(self, file, settingName):
 
+        return any(self.loadWidgetVals(file, settingName))
+
+    # Returns a list of whether each widget's value was set.  Change commands only run for those that were
+    def loadWidgetVals(self, file, settingName):
+
+        valuesSet = []
         for i in range(len(self.widgets)):
 
-            self.widgets[i].loadVal(file, settingName + str(i))
+            valuesSet.append(self.widgets[i].loadVal(file, settingName + str(i)))
 
-            if type(self.widgets[i]) is FloatFld:
+            if valuesSet[-1] and type(self.widgets[i]) is FloatFld:
 
                 if (self.widgets[i].changeCommand is not None):
 
-                    self.widgets[i].changeCommand()
+                    # In a UIBatch the control doesn't have its new value until the batch is flushed
+                    if UIBatch.current is not None:
+                        UIBatch.current.recordCallback((self.widgets[i].uiID, "changeCommand"),
+                                                       self.widgets[i].changeCommand)
+                    else:
+                        self.widgets[i].changeCommand()
+
+        return valuesSet
 
 class EquiGrp(EmptyGrp):
 
+    __slots__ = ("baseWidget", "widgetsPerGrp")
+
     def __init__(self, baseWidget, widgetsPerGrp, paramType="list"):
 
         EmptyGrp.__init__(self, paramType)
         self.baseWidget = baseWidget
         self.widgetsPerGrp = widgetsPerGrp
 
+    def clone(self):
+
+        return EquiGrp(self.baseWidget, self.widgetsPerGrp, self.paramType)
+
+    def getPresetWidgets(self):
+
+        return self.widgets if self.widgets else [self.baseWidget] * self.widgetsPerGrp
+
     def create(self, initValues):
 
         if isinstance(initValues, list) and len(initValues) == self.widgetsPerGrp:
             
             for i in range(self.widgetsPerGrp):
-                self.widgets.append(self.nextWidget(copy.deepcopy(self.baseWidget), initValues[i]))
+                self.widgets.append(self.nextWidget(self.baseWidget.clone(), initValues[i]))
 
         else:
 
             for i in range(self.widgetsPerGrp):
-                self.widgets.append(self.nextWidget(copy.deepcopy(self.baseWidget)))
+                self.widgets.append(self.nextWidget(self.baseWidget.clone()))
 
-# Contains method for creating a checkbox widget.  Assumes this is always the first widget in the group
+# Contains method for creating a checkbox widget.  Assumes this is always the first widget in the group, so
+#   slotWidgets are the widgets after it
 class CheckBoxGrp(EmptyGrp):
 
-    def __init__(self, cbLabel, paramType="list"):
+    __slots__ = ("cbLabel",)
 
-        EmptyGrp.__init__(self, paramType)
+    def __init__(self, cbLabel, paramType="list", slotWidgets=None):
+
+        EmptyGrp.__init__(self, paramType, slotWidgets)
         self.cbLabel = cbLabel
 
+    def clone(self):
+
+        return CheckBoxGrp(self.cbLabel, self.paramType, self.slotWidgets)
+
+    def getPresetWidgets(self):
+
+        if self.widgets or self.slotWidgets is None:
+            return EmptyGrp.getPresetWidgets(self)
+
+        return [CheckBox(self.cbLabel)] + self.slotWidgets
+
     def nextCheckBox(self, *_):
 
         nextCheckBox = CheckBox(self.cbLabel)
@@ -318,13 +914,20 @@ class CheckBoxGrp(EmptyGrp):
 
     def handleCheckBox(self, cbValue):
 
+        self.widgets[0].valueChanged(cbValue)
         for widget in self.widgets[1:]:
             widget.enable(cbValue)
 
     def loadVal(self, file, settingName):
 
-        super().loadVal(file, settingName)
-        cbValue = self.widgets[0].getVal()
+        valuesSet = self.loadWidgetVals(file, settingName)
 
-        for widget in self.widgets[1:]:
-            widget.enable(cbValue)
+        # The dependents' enabled states only need updating if the checkbox's value was set
+        if valuesSet[0]:
+
+            cbValue = self.widgets[0].getVal()
+
+            for widget in self.widgets[1:]:
+                widget.enable(cbValue)
+
+        return any(valuesSet)